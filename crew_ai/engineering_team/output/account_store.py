@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+from urllib.parse import quote
+
+from accounts import Account, AccountError, Transaction
+from exporters import transaction_from_row, transaction_row
+
+
+class AccountStore:
+    """
+    Shared in-process registry of accounts keyed by user_id.
+
+    UI handlers and API endpoints only pass the key around; the `Account` objects
+    live here, so every tab or client using the same user_id sees the same ledger.
+    Each account has its own lock, taken by `session()`, so check-then-append
+    operations (withdraw, buy, sell) stay consistent under concurrent requests.
+
+    With `persist_dir`, each ledger is kept as an append-only JSONL file
+    (a header line, then one `exporters.transaction_row` per transaction) and
+    reloaded lazily on first access after a restart.
+    """
+
+    def __init__(self, persist_dir: Optional[str] = None) -> None:
+        self._persist_dir = persist_dir
+        self._accounts: Dict[str, Account] = {}
+        self._locks: Dict[str, threading.RLock] = {}
+        self._registry_lock = threading.Lock()
+        if persist_dir:
+            os.makedirs(persist_dir, exist_ok=True)
+
+    @property
+    def persist_dir(self) -> Optional[str]:
+        return self._persist_dir
+
+    def keys(self) -> List[str]:
+        with self._registry_lock:
+            return sorted(self._accounts)
+
+    def __len__(self) -> int:
+        with self._registry_lock:
+            return len(self._accounts)
+
+    def get(self, user_id: str) -> Account:
+        """Return the account for `user_id`, loading or creating it on first use."""
+        key = self._key(user_id)
+        with self._registry_lock:
+            acct = self._accounts.get(key)
+        if acct is not None:
+            return acct
+        # Cold load under the account's own lock, so reading one large ledger
+        # does not stall lookups of every other account.
+        with self._lock_for(key):
+            with self._registry_lock:
+                acct = self._accounts.get(key)
+            if acct is None:
+                acct = self._load(key) or self._new(key)
+                with self._registry_lock:
+                    self._accounts[key] = acct
+            return acct
+
+    def create(self, user_id: str) -> Account:
+        """Replace any existing account for `user_id` with a new empty one."""
+        key = self._key(user_id)
+        with self._lock_for(key):
+            acct = self._new(key)
+            with self._registry_lock:
+                self._accounts[key] = acct
+            return acct
+
+    @contextmanager
+    def session(self, user_id: str) -> Iterator[Account]:
+        """Hold the account's lock for a read-modify-write sequence."""
+        key = self._key(user_id)
+        with self._lock_for(key):
+            yield self.get(key)
+
+    def record(self, user_id: str, *txs: Transaction) -> None:
+        """Persist transactions just applied to the account for `user_id` (no-op in memory-only mode)."""
+        key = self._key(user_id)
+        path = self._path(key)
+        if path is None or not txs:
+            return
+        with self._lock_for(key), open(path, "a", encoding="utf-8") as fh:
+            for tx in txs:
+                fh.write(json.dumps(transaction_row(tx), ensure_ascii=False))
+                fh.write("\n")
+
+    # -----------------------
+    # Internal helpers
+    # -----------------------
+
+    def _key(self, user_id: str) -> str:
+        key = (user_id or "").strip()
+        if not key:
+            raise ValueError("user_id must be a non-empty string.")
+        return key
+
+    def _lock_for(self, key: str) -> threading.RLock:
+        with self._registry_lock:
+            return self._locks.setdefault(key, threading.RLock())
+
+    def _path(self, key: str) -> Optional[str]:
+        if not self._persist_dir:
+            return None
+        return os.path.join(self._persist_dir, quote(key, safe="") + ".jsonl")
+
+    def _new(self, key: str) -> Account:
+        acct = Account(user_id=key)
+        path = self._path(key)
+        if path is not None:
+            header = {
+                "user_id": acct.user_id,
+                "account_id": acct.account_id,
+                "created_at": acct.created_at.isoformat(),
+            }
+            tmp = path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as fh:
+                fh.write(json.dumps(header) + "\n")
+            os.replace(tmp, path)
+        return acct
+
+    def _load(self, key: str) -> Optional[Account]:
+        path = self._path(key)
+        if path is None or not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as fh:
+            try:
+                header = json.loads(fh.readline())
+            except json.JSONDecodeError as e:
+                raise AccountError(f"Corrupt account file header: {path}") from e
+            txs = (transaction_from_row(json.loads(line)) for line in fh if line.strip())
+            return Account.from_transactions(
+                header["user_id"],
+                txs,
+                account_id=header["account_id"],
+                created_at=datetime.fromisoformat(header["created_at"]),
+            )
@@ -4,8 +4,9 @@ from dataclasses import dataclass, field
 from datetime import datetime, timezone
 from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
 from enum import Enum
-from typing import Dict, Iterable, List, Optional, Tuple, Union
+from typing import Any, Collection, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple, Union
 from uuid import uuid4
+from bisect import bisect_left, bisect_right
 from collections import defaultdict
 import re
 
@@ -33,6 +34,10 @@ class InvalidSymbolError(AccountError):
     """Raised when a symbol is empty/invalid or a price cannot be obtained."""
 
 
+_TEST_PRICES: Dict[str, float] = {"AAPL": 180.00, "TSLA": 250.00, "GOOGL": 140.00}
+_price_version = 0
+
+
 def get_share_price(symbol: str) -> float:
     """
     Test implementation returning fixed prices.
@@ -43,10 +48,25 @@ def get_share_price(symbol: str) -> float:
     if symbol is None:
         raise InvalidSymbolError("Symbol cannot be None.")
     sym = str(symbol).strip().upper()
-    prices = {"AAPL": 180.00, "TSLA": 250.00, "GOOGL": 140.00}
-    if sym not in prices:
+    if sym not in _TEST_PRICES:
         raise InvalidSymbolError(f"Unknown symbol: {sym!r}")
-    return float(prices[sym])
+    return float(_TEST_PRICES[sym])
+
+
+def set_share_price(symbol: str, price: float) -> None:
+    """Override a test price (e.g. to simulate a market move); bumps `price_version()`."""
+    global _price_version
+    if symbol is None or str(symbol).strip() == "":
+        raise InvalidSymbolError("Symbol cannot be empty.")
+    if price is None or float(price) <= 0:
+        raise InvalidSymbolError(f"Non-positive price for symbol {symbol!r}: {price}")
+    _TEST_PRICES[str(symbol).strip().upper()] = float(price)
+    _price_version += 1
+
+
+def price_version() -> int:
+    """Counter that changes whenever `get_share_price` may return different values."""
+    return _price_version
 
 
 class TransactionType(Enum):
@@ -68,6 +88,85 @@ class Transaction:
     note: Optional[str] = None
 
 
+@dataclass(frozen=True)
+class GBMModel:
+    """
+    Correlated geometric Brownian motion used by `Account.simulate`.
+
+    `drift` and `cov` are annualized and ordered like `symbols`; one simulation step is
+    1 / `steps_per_year` of a year.
+    """
+
+    symbols: Tuple[str, ...]
+    drift: Tuple[float, ...]
+    cov: Tuple[Tuple[float, ...], ...]
+    steps_per_year: int = 252
+
+    def __post_init__(self) -> None:
+        symbols = tuple(str(s).strip().upper() for s in self.symbols)
+        drift = tuple(float(d) for d in self.drift)
+        cov = tuple(tuple(float(c) for c in row) for row in self.cov)
+        n = len(symbols)
+        if n == 0 or len(set(symbols)) != n:
+            raise ValueError("symbols must be a non-empty sequence of unique symbols.")
+        if len(drift) != n:
+            raise ValueError(f"drift must have {n} entries, got {len(drift)}.")
+        if len(cov) != n or any(len(row) != n for row in cov):
+            raise ValueError(f"cov must be a {n}x{n} matrix.")
+        if any(cov[i][j] != cov[j][i] for i in range(n) for j in range(i)):
+            raise ValueError("cov must be symmetric.")
+        if self.steps_per_year <= 0:
+            raise ValueError("steps_per_year must be > 0.")
+        object.__setattr__(self, "symbols", symbols)
+        object.__setattr__(self, "drift", drift)
+        object.__setattr__(self, "cov", cov)
+
+    @classmethod
+    def from_volatility(
+        cls,
+        symbols: Sequence[str],
+        drift: Sequence[float],
+        vol: Sequence[float],
+        corr: Optional[Sequence[Sequence[float]]] = None,
+        *,
+        steps_per_year: int = 252,
+    ) -> "GBMModel":
+        """Build a model from annualized volatilities and an optional correlation matrix."""
+        n = len(vol)
+        if corr is None:
+            corr = [[1.0 if i == j else 0.0 for j in range(n)] for i in range(n)]
+        cov = tuple(tuple(float(corr[i][j]) * vol[i] * vol[j] for j in range(n)) for i in range(n))
+        return cls(tuple(symbols), tuple(drift), cov, steps_per_year)
+
+
+@dataclass(frozen=True)
+class SimulationResult:
+    """
+    Outcome of `Account.simulate`.
+
+    `var` and `cvar` are losses of equity at the horizon (positive = loss) at `confidence`;
+    `bands` maps each requested percentile to equity values at the step indices in `steps`.
+    """
+
+    paths: int
+    horizon: int
+    confidence: float
+    start_value: Decimal
+    expected_value: Decimal
+    var: Decimal
+    cvar: Decimal
+    steps: Tuple[int, ...]
+    bands: Dict[float, Tuple[Decimal, ...]] = field(default_factory=dict)
+
+
+@dataclass
+class BatchResult:
+    """Outcome of `Account.apply_batch`: applied transactions and (row number, message) errors."""
+
+    applied: List[Transaction] = field(default_factory=list)
+    errors: List[Tuple[int, str]] = field(default_factory=list)
+
+
 class Account:
     """
     Simple account management system for a trading simulation platform.
@@ -91,6 +190,30 @@ class Account:
         self._account_id: str = account_id if account_id is not None else str(uuid4())
         self._created_at: datetime = self._ensure_utc(created_at) if created_at else self._now_utc()
         self._transactions: List[Transaction] = []
+        self._version: int = 0
+        # (version, cash, positions) left by the last apply_batch, reused by the next one.
+        self._batch_state: Optional[Tuple[int, Decimal, Dict[str, Decimal]]] = None
+
+    @classmethod
+    def from_transactions(
+        cls,
+        user_id: str,
+        transactions: Iterable[Transaction],
+        *,
+        account_id: Optional[str] = None,
+        created_at: Optional[datetime] = None,
+    ) -> "Account":
+        """
+        Rebuild an account from a previously recorded ledger (e.g. loaded from disk).
+
+        Transactions are trusted as-is; they are only re-ordered chronologically.
+        """
+        acct = cls(user_id, account_id=account_id, created_at=created_at)
+        for tx in transactions:
+            if not isinstance(tx, Transaction):
+                raise TypeError(f"Expected Transaction, got {type(tx).__name__}.")
+            acct._append_transaction(tx)
+        return acct
 
     @property
     def user_id(self) -> str:
@@ -104,6 +227,11 @@ class Account:
     def created_at(self) -> datetime:
         return self._created_at
 
+    @property
+    def version(self) -> int:
+        """Ledger version; increases with every recorded transaction (for cache keys)."""
+        return self._version
+
     def deposit(self, amount: Number, *, timestamp: Optional[datetime] = None, note: Optional[str] = None) -> Transaction:
         ts = self._ensure_utc(timestamp) if timestamp else self._now_utc()
         amt = self._to_decimal(amount)
@@ -208,18 +336,125 @@ class Account:
         self._append_transaction(tx)
         return tx
 
+    def apply_batch(self, rows: Iterable[Mapping[str, Any]], *, start: int = 1) -> BatchResult:
+        """
+        Validate and apply many deposit/withdraw/buy/sell rows in one pass.
+
+        Each row has a `type` and either `amount` (DEPOSIT/WITHDRAW) or `symbol` and
+        `quantity` (BUY/SELL), plus optional `timestamp` (aware datetime or ISO string,
+        not earlier than the ledger's last transaction) and `note`. Rows are checked
+        against a running cash/holdings state built from a single replay (or carried
+        over from the previous batch if the ledger has not changed since), rather than
+        replaying the ledger per trade. Invalid rows are skipped and reported with their
+        row number, counting from `start`.
+        """
+        result = BatchResult()
+        if self._batch_state is not None and self._batch_state[0] == self._version:
+            _, cash, pos = self._batch_state
+        else:
+            cash, pos = self._replay()
+        last_ts = self._transactions[-1].timestamp if self._transactions else None
+        prices: Dict[str, Decimal] = {}
+
+        for n, row in enumerate(rows, start):
+            try:
+                tx = self._batch_transaction(row, cash, pos, last_ts, prices)
+            except (AccountError, ValueError, TypeError, ArithmeticError) as e:
+                result.errors.append((n, str(e) or type(e).__name__))
+                continue
+            if tx.type == TransactionType.DEPOSIT:
+                cash += tx.amount
+            elif tx.type == TransactionType.WITHDRAW:
+                cash -= tx.amount
+            elif tx.type == TransactionType.BUY:
+                cash -= tx.price * tx.quantity
+                pos[tx.symbol] = pos.get(tx.symbol, Decimal("0")) + tx.quantity
+            else:
+                cash += tx.price * tx.quantity
+                pos[tx.symbol] = pos.get(tx.symbol, Decimal("0")) - tx.quantity
+            self._append_transaction(tx)
+            last_ts = tx.timestamp
+            result.applied.append(tx)
+
+        self._batch_state = (self._version, cash, pos)
+        return result
+
     def transactions(self, *, start: Optional[datetime] = None, end: Optional[datetime] = None) -> List[Transaction]:
+        return list(self.iter_transactions(start=start, end=end))
+
+    def iter_transactions(
+        self,
+        *,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        symbols: Optional[Collection[str]] = None,
+        types: Optional[Collection[TransactionType]] = None,
+    ) -> Iterator[Transaction]:
+        """
+        Lazily yield transactions in chronological order, optionally filtered.
+
+        The [start, end] window is located by binary search on the time-ordered ledger,
+        so only matching rows are visited and nothing is copied.
+        """
         s = self._ensure_utc(start) if start else None
         e = self._ensure_utc(end) if end else None
+        syms = {str(sym).strip().upper() for sym in symbols} if symbols is not None else None
+        kinds = set(types) if types is not None else None
+
+        lo = bisect_left(self._transactions, s, key=self._tx_timestamp) if s is not None else 0
+        hi = bisect_right(self._transactions, e, key=self._tx_timestamp) if e is not None else len(self._transactions)
+        for i in range(lo, hi):
+            tx = self._transactions[i]
+            if syms is not None and tx.symbol not in syms:
+                continue
+            if kinds is not None and tx.type not in kinds:
+                continue
+            yield tx
 
-        result: List[Transaction] = []
-        for tx in self._transactions:
-            if s is not None and tx.timestamp < s:
+    def transactions_page(
+        self,
+        *,
+        limit: int,
+        cursor: Optional[str] = None,
+        symbols: Optional[Collection[str]] = None,
+        types: Optional[Collection[TransactionType]] = None,
+    ) -> Tuple[List[Transaction], Optional[str]]:
+        """
+        One page of transactions, newest first, plus the cursor for the next (older) page.
+
+        `cursor` is the opaque value returned by the previous call; it pins a position in
+        the time-ordered ledger, so appends between calls do not shift later pages. The
+        returned cursor is None when no older matching transactions remain.
+        """
+        if not isinstance(limit, int) or limit <= 0:
+            raise InvalidQuantityError(f"limit must be a positive integer. Got: {limit!r}")
+        syms = {str(sym).strip().upper() for sym in symbols} if symbols is not None else None
+        kinds = set(types) if types is not None else None
+
+        i = len(self._transactions) - 1
+        if cursor is not None:
+            ts, tx_id = self._parse_cursor(cursor)
+            i = bisect_left(self._transactions, ts, key=self._tx_timestamp) - 1
+            j = bisect_right(self._transactions, ts, key=self._tx_timestamp) - 1
+            while j > i:
+                if self._transactions[j].id == tx_id:
+                    i = j - 1
+                    break
+                j -= 1
+
+        page: List[Transaction] = []
+        while i >= 0:
+            tx = self._transactions[i]
+            i -= 1
+            if syms is not None and tx.symbol not in syms:
                 continue
-            if e is not None and tx.timestamp > e:
+            if kinds is not None and tx.type not in kinds:
                 continue
-            result.append(tx)
-        return list(result)
+            if len(page) == limit:
+                last = page[-1]
+                return page, f"{last.timestamp.isoformat()}|{last.id}"
+            page.append(tx)
+        return page, None
 
     def cash_balance(self, *, as_of: Optional[datetime] = None) -> Decimal:
         cash, _pos = self._replay(as_of=as_of)
@@ -268,6 +503,138 @@ class Account:
         pct = (pl / contrib) * Decimal("100")
         return pct.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
 
+    def iter_equity_curve(self, *, as_of: Optional[datetime] = None) -> Iterator[Tuple[datetime, Decimal]]:
+        """
+        Yield (timestamp, equity) after every transaction up to `as_of`, in one ledger sweep.
+
+        Positions are valued at current prices (as in `portfolio_value`), so cash and
+        market value are updated incrementally instead of replaying per point.
+        """
+        ts = self._ensure_utc(as_of) if as_of else None
+        prices: Dict[str, Decimal] = {}
+        cash = Decimal("0")
+        market = Decimal("0")
+        for tx in self._iter_tx_up_to(ts):
+            t = tx.type
+            if t == TransactionType.DEPOSIT:
+                cash += (tx.amount or Decimal("0"))
+            elif t == TransactionType.WITHDRAW:
+                cash -= (tx.amount or Decimal("0"))
+            elif t in (TransactionType.BUY, TransactionType.SELL):
+                if tx.symbol is None or tx.quantity is None or tx.price is None:
+                    raise AccountError(f"Corrupt {t.value} transaction: {tx}")
+                price = prices.get(tx.symbol)
+                if price is None:
+                    price = prices[tx.symbol] = self._get_price_decimal(tx.symbol)
+                sign = 1 if t == TransactionType.BUY else -1
+                cash -= sign * tx.price * tx.quantity
+                market += sign * price * tx.quantity
+            else:
+                raise AccountError(f"Unknown transaction type: {t}")
+            yield tx.timestamp, self._quantize_money(cash + market)
+
+    def simulate(
+        self,
+        paths: int,
+        horizon: int,
+        model: GBMModel,
+        *,
+        confidence: float = 0.95,
+        percentiles: Sequence[float] = (5.0, 25.0, 50.0, 75.0, 95.0),
+        band_points: int = 20,
+        chunk_size: int = 25_000,
+        seed: Optional[int] = None,
+        as_of: Optional[datetime] = None,
+    ) -> SimulationResult:
+        """
+        Monte Carlo projection of equity `horizon` steps ahead from the holdings as of `as_of`.
+
+        Cash is held constant and positions start at current prices. Paths are generated
+        `chunk_size` at a time and only sampled at `band_points` evenly spaced steps (GBM
+        increments between those steps are drawn exactly), so memory is bounded by
+        `(band_points + 1) * paths` floats plus one chunk of shocks.
+        """
+        try:
+            import numpy as np
+        except ImportError as e:
+            raise ImportError("Account.simulate requires numpy (pip install numpy).") from e
+
+        if not isinstance(paths, int) or paths <= 0:
+            raise InvalidQuantityError(f"paths must be a positive integer. Got: {paths!r}")
+        if not isinstance(horizon, int) or horizon <= 0:
+            raise InvalidQuantityError(f"horizon must be a positive integer. Got: {horizon!r}")
+        if not 0 < confidence < 1:
+            raise InvalidQuantityError(f"confidence must be in (0, 1). Got: {confidence!r}")
+        if band_points <= 0 or chunk_size <= 0:
+            raise InvalidQuantityError("band_points and chunk_size must be > 0.")
+
+        cash, pos = self._replay(as_of=as_of)
+        held = sorted(sym for sym, qty in pos.items() if qty != 0)
+        try:
+            idx = [model.symbols.index(sym) for sym in held]
+        except ValueError:
+            missing = [sym for sym in held if sym not in model.symbols]
+            raise InvalidSymbolError(f"Model has no parameters for held symbols: {missing}") from None
+
+        steps = np.unique(np.linspace(0, horizon, min(band_points, horizon) + 1).round().astype(np.int64))
+        start = float(cash)
+        # Step-major so percentile reductions run over contiguous memory.
+        out = np.empty((len(steps), paths), dtype=np.float64)
+        out[0] = start
+
+        if held:
+            exposure = np.array([float(pos[sym] * self._get_price_decimal(sym)) for sym in held])
+            start += float(exposure.sum())
+            out[0] = start
+            cov = np.asarray(model.cov, dtype=np.float64)[np.ix_(idx, idx)]
+            mu = np.asarray(model.drift, dtype=np.float64)[idx]
+            try:
+                chol = np.linalg.cholesky(cov)
+            except np.linalg.LinAlgError:
+                # Singular but positive semi-definite (e.g. a zero-volatility asset).
+                w, v = np.linalg.eigh(cov)
+                if w.min() < -1e-12 * max(1.0, float(np.abs(w).max())):
+                    raise AccountError("Model covariance matrix is not positive semi-definite.") from None
+                chol = v * np.sqrt(np.clip(w, 0.0, None))
+
+            dt = 1.0 / model.steps_per_year
+            span = np.diff(steps).astype(np.float64) * dt
+            drift = (mu - 0.5 * np.diag(cov))[None, None, :] * span[None, :, None]
+            scale = np.sqrt(span)[None, :, None]
+            rng = np.random.default_rng(seed)
+            for lo in range(0, paths, chunk_size):
+                hi = min(lo + chunk_size, paths)
+                n_rows = (hi - lo) * len(span)
+                shocks = (rng.standard_normal((n_rows, len(held))) @ chol.T).reshape(hi - lo, len(span), len(held))
+                shocks *= scale
+                shocks += drift
+                growth = np.exp(np.cumsum(shocks, axis=1, out=shocks), out=shocks)
+                out[1:, lo:hi] = (growth.reshape(n_rows, len(held)) @ exposure).reshape(hi - lo, len(span)).T
+                out[1:, lo:hi] += float(cash)
+        else:
+            out[1:] = start
+
+        losses = start - out[-1]
+        var = float(np.quantile(losses, confidence))
+        cvar = float(losses[losses >= var].mean())
+        pcts = tuple(float(p) for p in percentiles)
+        band_values = np.percentile(out, pcts, axis=1) if pcts else np.empty((0, len(steps)))
+
+        def money(x: float) -> Decimal:
+            return self._quantize_money(Decimal(repr(float(x))))
+
+        return SimulationResult(
+            paths=paths,
+            horizon=horizon,
+            confidence=confidence,
+            start_value=money(start),
+            expected_value=money(out[-1].mean()),
+            var=money(var),
+            cvar=money(cvar),
+            steps=tuple(int(s) for s in steps),
+            bands={p: tuple(money(x) for x in row) for p, row in zip(pcts, band_values)},
+        )
+
     # -----------------------
     # Internal helpers
     # -----------------------
@@ -285,20 +652,27 @@ class Account:
         return dt.astimezone(timezone.utc)
 
     def _to_decimal(self, value: Number) -> Decimal:
-        if isinstance(value, Decimal):
-            return value
         try:
             # Use str() to reduce float binary artifacts
-            return Decimal(str(value))
+            d = value if isinstance(value, Decimal) else Decimal(str(value))
         except (InvalidOperation, ValueError, TypeError) as e:
             raise InvalidQuantityError(f"Invalid numeric value: {value!r}") from e
+        if not d.is_finite():
+            raise InvalidQuantityError(f"Numeric value must be finite: {value!r}")
+        return d
 
     def _quantize_money(self, amount: Decimal) -> Decimal:
-        return amount.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+        try:
+            return amount.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+        except InvalidOperation as e:
+            raise InvalidQuantityError(f"Amount out of range: {amount!r}") from e
 
     def _quantize_quantity(self, qty: Decimal) -> Decimal:
         # Support fractional shares with up to 8 decimal places by default.
-        return qty.quantize(Decimal("0.00000001"), rounding=ROUND_HALF_UP)
+        try:
+            return qty.quantize(Decimal("0.00000001"), rounding=ROUND_HALF_UP)
+        except InvalidOperation as e:
+            raise InvalidQuantityError(f"Quantity out of range: {qty!r}") from e
 
     def _normalize_symbol(self, symbol: str) -> str:
         if symbol is None:
@@ -339,6 +713,80 @@ class Account:
         if amount <= 0:
             raise InvalidQuantityError(f"{what} must be > 0. Got: {amount}")
 
+    def _batch_transaction(
+        self,
+        row: Mapping[str, Any],
+        cash: Decimal,
+        pos: Dict[str, Decimal],
+        last_ts: Optional[datetime],
+        prices: Dict[str, Decimal],
+    ) -> Transaction:
+        if not isinstance(row, Mapping):
+            raise AccountError(f"Row must be a mapping, got {type(row).__name__}.")
+        kind = str(row.get("type") or "").strip().upper()
+        try:
+            t = TransactionType(kind)
+        except ValueError:
+            raise AccountError(f"Unknown transaction type: {row.get('type')!r}") from None
+
+        raw_ts = row.get("timestamp")
+        if raw_ts is None or str(raw_ts).strip() == "":
+            ts = self._now_utc()
+            if last_ts is not None and ts < last_ts:
+                ts = last_ts
+        else:
+            if not isinstance(raw_ts, datetime):
+                raw_ts = datetime.fromisoformat(str(raw_ts).strip())
+            ts = self._ensure_utc(raw_ts)
+            if last_ts is not None and ts < last_ts:
+                raise AccountError(f"Timestamp {ts.isoformat()} is earlier than the ledger's last transaction.")
+        note = row.get("note") or None
+
+        if t in (TransactionType.DEPOSIT, TransactionType.WITHDRAW):
+            amt = self._to_decimal(row.get("amount"))
+            self._validate_positive_amount(amt, what=f"{t.value.lower()} amount")
+            amt = self._quantize_money(amt)
+            if t == TransactionType.WITHDRAW and self._quantize_money(cash) < amt:
+                raise InsufficientFundsError(
+                    f"Insufficient cash for withdrawal. Cash={self._quantize_money(cash)}, requested={amt}"
+                )
+            return Transaction(id=str(uuid4()), timestamp=ts, type=t, amount=amt, note=note)
+
+        sym = str(row.get("symbol") or "").strip().upper()
+        price = prices.get(sym)
+        if price is None:
+            sym = self._normalize_symbol(sym)
+            price = prices[sym] = self._get_price_decimal(sym)
+        qty = self._to_decimal(row.get("quantity"))
+        self._validate_positive_quantity(qty)
+        qty = self._quantize_quantity(qty)
+        value = self._quantize_money(price * qty)
+        if t == TransactionType.BUY and self._quantize_money(cash) < value:
+            raise InsufficientFundsError(
+                f"Insufficient cash to buy {qty} {sym}. Cash={self._quantize_money(cash)}, cost={value}"
+            )
+        if t == TransactionType.SELL and pos.get(sym, Decimal("0")) < qty:
+            raise InsufficientHoldingsError(
+                f"Insufficient holdings to sell. Held={pos.get(sym, Decimal('0'))} {sym}, requested={qty}"
+            )
+        return Transaction(
+            id=str(uuid4()), timestamp=ts, type=t, symbol=sym, quantity=qty, price=price, amount=value, note=note
+        )
+
+    def _parse_cursor(self, cursor: str) -> Tuple[datetime, str]:
+        ts_s, sep, tx_id = str(cursor).partition("|")
+        try:
+            ts = datetime.fromisoformat(ts_s)
+        except ValueError:
+            ts = None
+        if not sep or ts is None:
+            raise ValueError(f"Invalid transactions cursor: {cursor!r}")
+        return self._ensure_utc(ts), tx_id
+
+    @staticmethod
+    def _tx_timestamp(tx: Transaction) -> datetime:
+        return tx.timestamp
+
     def _iter_tx_up_to(self, as_of: Optional[datetime]) -> Iterable[Transaction]:
         if as_of is None:
             yield from self._transactions
@@ -348,6 +796,7 @@ class Account:
                 yield tx
 
     def _append_transaction(self, tx: Transaction) -> None:
+        self._version += 1
         # Keep chronological order; if backdated timestamps are used, insert and keep stable.
         if not self._transactions or self._transactions[-1].timestamp <= tx.timestamp:
             self._transactions.append(tx)
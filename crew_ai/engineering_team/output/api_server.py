@@ -0,0 +1,220 @@
+"""
+Headless JSON API over the `Account` core, for scripting and load testing.
+
+A small asyncio HTTP/1.1 server (keep-alive, Content-Length bodies) sharing the
+same `AccountStore` model as the Gradio app. Run:
+    python api_server.py --port 8765 [--store-dir ./ledgers]
+
+Routes (user_id is the account key):
+    GET  /health
+    POST /accounts/{user_id}                       create / replace the account
+    POST /accounts/{user_id}/deposit               {"amount": "100", "note": "..."}
+    POST /accounts/{user_id}/withdraw              {"amount": "100"}
+    POST /accounts/{user_id}/buy                   {"symbol": "AAPL", "quantity": "1"}
+    POST /accounts/{user_id}/sell                  {"symbol": "AAPL", "quantity": "1"}
+    GET  /accounts/{user_id}/snapshot
+    GET  /accounts/{user_id}/transactions?limit=50&cursor=...&symbol=AAPL&type=BUY
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+from decimal import Decimal
+from http import HTTPStatus
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from account_store import AccountStore
+from accounts import Account, AccountError, TransactionType
+from exporters import transaction_row
+
+
+MAX_BODY_BYTES = 1 << 20
+MAX_PAGE_SIZE = 500
+DEFAULT_PAGE_SIZE = 50
+
+
+class ApiError(Exception):
+    def __init__(self, status: HTTPStatus, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+def _snapshot(acct: Account) -> Dict[str, Any]:
+    pl_pct = acct.profit_loss_pct()
+    return {
+        "user_id": acct.user_id,
+        "account_id": acct.account_id,
+        "version": acct.version,
+        "cash": str(acct.cash_balance()),
+        "portfolio_value": str(acct.portfolio_value()),
+        "equity": str(acct.equity_value()),
+        "profit_loss": str(acct.profit_loss()),
+        "profit_loss_pct": None if pl_pct is None else str(pl_pct),
+        "holdings": {sym: str(qty) for sym, qty in sorted(acct.holdings().items())},
+    }
+
+
+class TradingApi:
+    """Routes requests to store operations; transport-agnostic so it can be driven directly."""
+
+    def __init__(self, store: AccountStore) -> None:
+        self.store = store
+
+    def handle(self, method: str, target: str, body: Dict[str, Any]) -> Tuple[HTTPStatus, Dict[str, Any]]:
+        try:
+            return HTTPStatus.OK, self._dispatch(method, target, body)
+        except ApiError as e:
+            return e.status, {"error": str(e)}
+        except (AccountError, ValueError, TypeError, ArithmeticError) as e:
+            return HTTPStatus.BAD_REQUEST, {"error": str(e), "type": type(e).__name__}
+
+    def _dispatch(self, method: str, target: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        url = urlsplit(target)
+        parts = [unquote(p) for p in url.path.strip("/").split("/") if p]
+        if parts == ["health"] and method == "GET":
+            return {"status": "ok", "accounts": len(self.store)}
+        if len(parts) < 2 or parts[0] != "accounts":
+            raise ApiError(HTTPStatus.NOT_FOUND, f"No route for {url.path}")
+        key = parts[1]
+        action = parts[2] if len(parts) == 3 else None
+        if len(parts) > 3:
+            raise ApiError(HTTPStatus.NOT_FOUND, f"No route for {url.path}")
+
+        if action is None and method == "POST":
+            acct = self.store.create(key)
+            return {"user_id": acct.user_id, "account_id": acct.account_id}
+        if action in ("deposit", "withdraw", "buy", "sell") and method == "POST":
+            with self.store.session(key) as acct:
+                if action in ("deposit", "withdraw"):
+                    tx = getattr(acct, action)(body.get("amount"), note=body.get("note") or None)
+                else:
+                    tx = getattr(acct, action)(body.get("symbol"), body.get("quantity"), note=body.get("note") or None)
+                self.store.record(key, tx)
+                return {"transaction": transaction_row(tx), "cash": str(acct.cash_balance())}
+        if action == "snapshot" and method == "GET":
+            with self.store.session(key) as acct:
+                return _snapshot(acct)
+        if action == "transactions" and method == "GET":
+            query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+            limit = int(query.get("limit", DEFAULT_PAGE_SIZE))
+            if not 0 < limit <= MAX_PAGE_SIZE:
+                raise ApiError(HTTPStatus.BAD_REQUEST, f"limit must be in 1..{MAX_PAGE_SIZE}")
+            symbol = query.get("symbol")
+            kind = query.get("type")
+            with self.store.session(key) as acct:
+                txs, cursor = acct.transactions_page(
+                    limit=limit,
+                    cursor=query.get("cursor") or None,
+                    symbols=[symbol] if symbol else None,
+                    types=[TransactionType(kind.upper())] if kind else None,
+                )
+                return {"transactions": [transaction_row(tx) for tx in txs], "next_cursor": cursor}
+        raise ApiError(HTTPStatus.NOT_FOUND, f"No route for {method} {url.path}")
+
+
+def _json_default(o: Any) -> Any:
+    if isinstance(o, Decimal):
+        return str(o)
+    raise TypeError(f"Not JSON serializable: {type(o).__name__}")
+
+
+async def _read_request(reader: asyncio.StreamReader) -> Optional[Tuple[str, str, Dict[str, str], bytes]]:
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, target, _version = line.decode("latin-1").split()
+    except ValueError:
+        raise ApiError(HTTPStatus.BAD_REQUEST, "Malformed request line") from None
+    headers: Dict[str, str] = {}
+    while True:
+        h = await reader.readline()
+        if h in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = h.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    raw_length = headers.get("content-length") or "0"
+    if not (raw_length.isascii() and raw_length.isdigit()):
+        raise ApiError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length")
+    length = int(raw_length)
+    if length > MAX_BODY_BYTES:
+        raise ApiError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Request body too large")
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), target, headers, body
+
+
+def _response(status: HTTPStatus, payload: Dict[str, Any], keep_alive: bool) -> bytes:
+    body = json.dumps(payload, default=_json_default, separators=(",", ":")).encode("utf-8")
+    head = (
+        f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+        "Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    )
+    return head.encode("latin-1") + body
+
+
+async def serve(api: TradingApi, host: str = "127.0.0.1", port: int = 8765) -> asyncio.AbstractServer:
+    """Start the HTTP server; the caller owns the returned server (close() to stop).
+
+    Requests are handled in worker threads: a cold account replays its ledger and
+    every write appends to it, and that file I/O must not stall other connections.
+    The store's per-account locks keep concurrent requests consistent.
+    """
+
+    async def on_client(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    request = await _read_request(reader)
+                except ApiError as e:
+                    writer.write(_response(e.status, {"error": str(e)}, keep_alive=False))
+                    break
+                if request is None:
+                    break
+                method, target, headers, raw = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+                try:
+                    body = json.loads(raw) if raw else {}
+                    if not isinstance(body, dict):
+                        raise ValueError("JSON body must be an object")
+                except ValueError as e:
+                    status, payload = HTTPStatus.BAD_REQUEST, {"error": f"Invalid JSON body: {e}"}
+                else:
+                    status, payload = await asyncio.to_thread(api.handle, method, target, body)
+                writer.write(_response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(on_client, host, port)
+
+
+async def _main(args: argparse.Namespace) -> None:
+    server = await serve(TradingApi(AccountStore(args.store_dir)), args.host, args.port)
+    addrs = ", ".join(str(s.getsockname()) for s in server.sockets)
+    print(f"Trading JSON API listening on {addrs}")
+    async with server:
+        await server.serve_forever()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--store-dir", default=os.getenv("TRADING_SIM_STORE_DIR") or None)
+    try:
+        asyncio.run(_main(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,17 @@
 from __future__ import annotations
 
-from dataclasses import asdict
+import csv
+import json
+import os
+import threading
+from collections import OrderedDict
 from datetime import datetime, timezone
 from decimal import Decimal
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Optional, Tuple
 
 import gradio as gr
+import numpy as np
+import pandas as pd
 
 from accounts import (
     Account,
@@ -14,13 +20,28 @@ from accounts import (
     InsufficientHoldingsError,
     InvalidQuantityError,
     InvalidSymbolError,
+    TransactionType,
     get_share_price,
+    price_version,
 )
+from account_store import AccountStore
 
 
 APP_TITLE = "Trading Sim Account (Demo)"
 DEFAULT_USER_ID = "demo_user"
 
+# Accounts live server-side; Gradio state only carries the user_id key.
+# Set TRADING_SIM_STORE_DIR to persist ledgers across restarts.
+STORE = AccountStore(os.getenv("TRADING_SIM_STORE_DIR") or None)
+
+TX_HEADERS = ["timestamp", "type", "symbol", "quantity", "price", "amount", "note", "id"]
+TX_PAGE_SIZES = [25, 50, 100, 200]
+DEFAULT_TX_PAGE_SIZE = 50
+TX_FILTER_ALL = "ALL"
+EQUITY_CHART_POINTS = 400
+BULK_CHUNK_ROWS = 1_000
+BULK_MAX_ERRORS_SHOWN = 500
+
 
 def _now_iso_utc() -> str:
     return datetime.now(timezone.utc).isoformat(timespec="seconds")
@@ -43,34 +64,71 @@ def _safe_decimal_str(x: Any) -> str:
         return str(x)
 
 
-def _make_account(user_id: str) -> Account:
+def _session_key(user_id: str) -> str:
     user_id = (user_id or "").strip()
     if not user_id:
         user_id = DEFAULT_USER_ID
-    return Account(user_id=user_id)
+    return user_id
 
 
 def _tx_to_row(tx) -> Dict[str, Any]:
-    d = asdict(tx)
-    # Convert Enum and datetime and Decimal to display-friendly strings
-    d["type"] = getattr(tx.type, "value", str(tx.type))
-    d["timestamp"] = tx.timestamp.isoformat(timespec="seconds")
-    for k in ("quantity", "price", "amount"):
-        if d.get(k) is not None:
-            d[k] = _safe_decimal_str(d[k])
+    # Read fields directly; dataclasses.asdict deep-copies every row.
     return {
-        "timestamp": d.get("timestamp", ""),
-        "type": d.get("type", ""),
-        "symbol": d.get("symbol", "") or "",
-        "quantity": d.get("quantity", "") or "",
-        "price": d.get("price", "") or "",
-        "amount": d.get("amount", "") or "",
-        "note": d.get("note", "") or "",
-        "id": d.get("id", "") or "",
+        "timestamp": tx.timestamp.isoformat(timespec="seconds"),
+        "type": getattr(tx.type, "value", str(tx.type)),
+        "symbol": tx.symbol or "",
+        "quantity": "" if tx.quantity is None else _safe_decimal_str(tx.quantity),
+        "price": "" if tx.price is None else _safe_decimal_str(tx.price),
+        "amount": "" if tx.amount is None else _safe_decimal_str(tx.amount),
+        "note": tx.note or "",
+        "id": tx.id or "",
     }
 
 
+class _ViewCache:
+    """
+    Small thread-safe LRU of rendered view models.
+
+    Keys start with (kind, account_id, ledger version[, price version]), so an entry is
+    reused until the ledger or prices change and stale entries simply age out.
+    """
+
+    def __init__(self, max_entries: int = 512) -> None:
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+        value = compute()
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = value
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+
+VIEW_CACHE = _ViewCache()
+
+
 def _holdings_table(acct: Account) -> List[Dict[str, Any]]:
+    key = ("holdings", acct.account_id, acct.version, price_version())
+    return VIEW_CACHE.get_or_compute(key, lambda: _compute_holdings_table(acct))
+
+
+def _compute_holdings_table(acct: Account) -> List[Dict[str, Any]]:
     rows: List[Dict[str, Any]] = []
     h = acct.holdings()
     for sym in sorted(h.keys()):
@@ -90,11 +148,100 @@ def _holdings_table(acct: Account) -> List[Dict[str, Any]]:
     return rows
 
 
-def _transactions_table(acct: Account) -> List[Dict[str, Any]]:
-    return [_tx_to_row(tx) for tx in acct.transactions()]
+def _tx_filters(symbol: str, tx_type: str) -> Dict[str, Any]:
+    sym = (symbol or "").strip().upper()
+    kind = (tx_type or "").strip().upper()
+    return {
+        "symbols": None if sym in ("", TX_FILTER_ALL) else [sym],
+        "types": None if kind in ("", TX_FILTER_ALL) else [TransactionType(kind)],
+    }
+
+
+def _transactions_page(
+    acct: Account, page_size: Any, symbol: str, tx_type: str, cursor: Optional[str]
+) -> Tuple[List[List[str]], Optional[str]]:
+    """One server-side page (newest first) as Dataframe rows, plus the cursor of the next page."""
+    try:
+        limit = int(page_size)
+    except (TypeError, ValueError):
+        limit = DEFAULT_TX_PAGE_SIZE
+    limit = max(1, min(limit, max(TX_PAGE_SIZES)))
+    filters = _tx_filters(symbol, tx_type)
+
+    def compute() -> Tuple[List[List[str]], Optional[str]]:
+        txs, next_cursor = acct.transactions_page(limit=limit, cursor=cursor, **filters)
+        rows = []
+        for tx in txs:
+            row = _tx_to_row(tx)
+            rows.append([row[c] for c in TX_HEADERS])
+        return rows, next_cursor
+
+    # Rows do not depend on prices, so only the ledger version is part of the key.
+    key = ("tx_page", acct.account_id, acct.version, limit, cursor, str(filters))
+    return VIEW_CACHE.get_or_compute(key, compute)
+
+
+def _tx_page_outputs(
+    acct: Account, page_size: Any, symbol: str, tx_type: str, stack: List[Optional[str]]
+) -> Tuple[List[List[str]], Dict[str, Any], str]:
+    rows, next_cursor = _transactions_page(acct, page_size, symbol, tx_type, stack[-1])
+    info = f"Page {len(stack)} • {len(rows)} row(s) shown, newest first"
+    if next_cursor is None:
+        info += " • no older transactions"
+    return rows, {"stack": stack, "next": next_cursor}, info
+
+
+def _lttb(xs: np.ndarray, ys: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets downsampling; returns indices of the points to keep.
+
+    Keeps the first and last points and, per bucket, the point forming the largest
+    triangle with the previously kept point and the next bucket's average, which
+    preserves peaks and troughs far better than striding.
+    """
+    n = len(xs)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    every = (n - 2) / (threshold - 2)
+    keep = np.empty(threshold, dtype=np.int64)
+    keep[0] = a = 0
+    for i in range(threshold - 2):
+        lo = int(i * every) + 1
+        hi = int((i + 1) * every) + 1
+        nxt_hi = min(int((i + 2) * every) + 1, n)
+        avg_x = xs[hi:nxt_hi].mean()
+        avg_y = ys[hi:nxt_hi].mean()
+        area = np.abs((xs[a] - avg_x) * (ys[lo:hi] - ys[a]) - (xs[a] - xs[lo:hi]) * (avg_y - ys[a]))
+        a = lo + int(area.argmax())
+        keep[i + 1] = a
+    keep[-1] = n - 1
+    return keep
+
+
+def _equity_chart(acct: Account) -> pd.DataFrame:
+    key = ("equity", acct.account_id, acct.version, price_version())
+    return VIEW_CACHE.get_or_compute(key, lambda: _compute_equity_chart(acct))
+
+
+def _compute_equity_chart(acct: Account) -> pd.DataFrame:
+    points = list(acct.iter_equity_curve())
+    xs = np.fromiter((ts.timestamp() for ts, _ in points), dtype=np.float64, count=len(points))
+    ys = np.fromiter((float(eq) for _, eq in points), dtype=np.float64, count=len(points))
+    keep = _lttb(xs, ys, EQUITY_CHART_POINTS)
+    return pd.DataFrame(
+        {
+            "timestamp": pd.to_datetime(xs[keep], unit="s", utc=True),
+            "equity": ys[keep],
+        }
+    )
 
 
 def _build_snapshot(acct: Account) -> Tuple[str, str, str, str, str]:
+    key = ("snapshot", acct.account_id, acct.version, price_version())
+    return VIEW_CACHE.get_or_compute(key, lambda: _compute_snapshot(acct))
+
+
+def _compute_snapshot(acct: Account) -> Tuple[str, str, str, str, str]:
     cash = acct.cash_balance()
     port = acct.portfolio_value()
     eq = acct.equity_value()
@@ -112,90 +259,219 @@ def _status_err(msg: str) -> str:
     return f"ERROR • {msg} • { _now_iso_utc() }"
 
 
-def ui_create_account(user_id: str) -> Tuple[Account, str, str, str, str, str, List[Dict[str, Any]], List[Dict[str, Any]]]:
+def ui_create_account(user_id: str) -> Tuple[str, str, str, str, str, str, str, List[Dict[str, Any]]]:
     try:
-        acct = _make_account(user_id)
-        cash, port, eq, pl, pl_pct = _build_snapshot(acct)
-        status = _status_ok(f"Created account for user_id={acct.user_id} (account_id={acct.account_id})")
-        return acct, status, cash, port, eq, pl, pl_pct, _holdings_table(acct), _transactions_table(acct)
+        key = _session_key(user_id)
+        STORE.create(key)
+        with STORE.session(key) as acct:
+            cash, port, eq, pl, pl_pct = _build_snapshot(acct)
+            status = _status_ok(f"Created account for user_id={acct.user_id} (account_id={acct.account_id})")
+            return key, status, cash, port, eq, pl, pl_pct, _holdings_table(acct)
     except Exception as e:
-        acct = _make_account(DEFAULT_USER_ID)
-        cash, port, eq, pl, pl_pct = _build_snapshot(acct)
-        return acct, _status_err(str(e)), cash, port, eq, pl, pl_pct, _holdings_table(acct), _transactions_table(acct)
-
+        with STORE.session(DEFAULT_USER_ID) as acct:
+            cash, port, eq, pl, pl_pct = _build_snapshot(acct)
+            return DEFAULT_USER_ID, _status_err(str(e)), cash, port, eq, pl, pl_pct, _holdings_table(acct)
 
-def _require_account(acct: Optional[Account]) -> Account:
-    if acct is None:
-        return _make_account(DEFAULT_USER_ID)
-    return acct
 
-
-def ui_deposit(acct: Optional[Account], amount: str, note: str) -> Tuple[Account, str, str, str, str, str, List[Dict[str, Any]], List[Dict[str, Any]]]:
-    acct = _require_account(acct)
-    try:
-        tx = acct.deposit(amount, note=(note or None))
+def ui_open_account(user_id: str) -> Tuple[str, str, str, str, str, str, str, List[Dict[str, Any]]]:
+    key = _session_key(user_id)
+    with STORE.session(key) as acct:
         cash, port, eq, pl, pl_pct = _build_snapshot(acct)
-        status = _status_ok(f"Deposit {_fmt_money(tx.amount or Decimal('0'))}")
-        return acct, status, cash, port, eq, pl, pl_pct, _holdings_table(acct), _transactions_table(acct)
-    except (InvalidQuantityError, AccountError) as e:
+        status = _status_ok(f"Opened account for user_id={acct.user_id} (account_id={acct.account_id})")
+        return key, status, cash, port, eq, pl, pl_pct, _holdings_table(acct)
+
+
+def _require_session(session_key: Optional[str]) -> str:
+    if not session_key:
+        return DEFAULT_USER_ID
+    return session_key
+
+
+def ui_deposit(session_key: Optional[str], amount: str, note: str) -> Tuple[str, str, str, str, str, str, str, List[Dict[str, Any]]]:
+    key = _require_session(session_key)
+    with STORE.session(key) as acct:
+        try:
+            tx = acct.deposit(amount, note=(note or None))
+            STORE.record(key, tx)
+            cash, port, eq, pl, pl_pct = _build_snapshot(acct)
+            status = _status_ok(f"Deposit {_fmt_money(tx.amount or Decimal('0'))}")
+            return key, status, cash, port, eq, pl, pl_pct, _holdings_table(acct)
+        except (InvalidQuantityError, AccountError) as e:
+            cash, port, eq, pl, pl_pct = _build_snapshot(acct)
+            return key, _status_err(str(e)), cash, port, eq, pl, pl_pct, _holdings_table(acct)
+
+
+def ui_withdraw(session_key: Optional[str], amount: str, note: str) -> Tuple[str, str, str, str, str, str, str, List[Dict[str, Any]]]:
+    key = _require_session(session_key)
+    with STORE.session(key) as acct:
+        try:
+            tx = acct.withdraw(amount, note=(note or None))
+            STORE.record(key, tx)
+            cash, port, eq, pl, pl_pct = _build_snapshot(acct)
+            status = _status_ok(f"Withdraw {_fmt_money(tx.amount or Decimal('0'))}")
+            return key, status, cash, port, eq, pl, pl_pct, _holdings_table(acct)
+        except (InsufficientFundsError, InvalidQuantityError, AccountError) as e:
+            cash, port, eq, pl, pl_pct = _build_snapshot(acct)
+            return key, _status_err(str(e)), cash, port, eq, pl, pl_pct, _holdings_table(acct)
+
+
+def ui_buy(session_key: Optional[str], symbol: str, quantity: str, note: str) -> Tuple[str, str, str, str, str, str, str, List[Dict[str, Any]]]:
+    key = _require_session(session_key)
+    sym = (symbol or "").strip().upper()
+    with STORE.session(key) as acct:
+        try:
+            tx = acct.buy(sym, quantity, note=(note or None))
+            STORE.record(key, tx)
+            cash, port, eq, pl, pl_pct = _build_snapshot(acct)
+            status = _status_ok(
+                f"Buy {tx.symbol} x{_fmt_qty(tx.quantity or Decimal('0'))} @ {_fmt_money(tx.price or Decimal('0'))} (amount {_fmt_money(tx.amount or Decimal('0'))})"
+            )
+            return key, status, cash, port, eq, pl, pl_pct, _holdings_table(acct)
+        except (InvalidSymbolError, InvalidQuantityError, InsufficientFundsError, AccountError) as e:
+            cash, port, eq, pl, pl_pct = _build_snapshot(acct)
+            return key, _status_err(str(e)), cash, port, eq, pl, pl_pct, _holdings_table(acct)
+
+
+def ui_sell(session_key: Optional[str], symbol: str, quantity: str, note: str) -> Tuple[str, str, str, str, str, str, str, List[Dict[str, Any]]]:
+    key = _require_session(session_key)
+    sym = (symbol or "").strip().upper()
+    with STORE.session(key) as acct:
+        try:
+            tx = acct.sell(sym, quantity, note=(note or None))
+            STORE.record(key, tx)
+            cash, port, eq, pl, pl_pct = _build_snapshot(acct)
+            status = _status_ok(
+                f"Sell {tx.symbol} x{_fmt_qty(tx.quantity or Decimal('0'))} @ {_fmt_money(tx.price or Decimal('0'))} (amount {_fmt_money(tx.amount or Decimal('0'))})"
+            )
+            return key, status, cash, port, eq, pl, pl_pct, _holdings_table(acct)
+        except (InvalidSymbolError, InvalidQuantityError, InsufficientHoldingsError, AccountError) as e:
+            cash, port, eq, pl, pl_pct = _build_snapshot(acct)
+            return key, _status_err(str(e)), cash, port, eq, pl, pl_pct, _holdings_table(acct)
+
+
+def ui_refresh(session_key: Optional[str]) -> Tuple[str, str, str, str, str, str, str, List[Dict[str, Any]]]:
+    key = _require_session(session_key)
+    with STORE.session(key) as acct:
         cash, port, eq, pl, pl_pct = _build_snapshot(acct)
-        return acct, _status_err(str(e)), cash, port, eq, pl, pl_pct, _holdings_table(acct), _transactions_table(acct)
+        status = _status_ok("Refreshed")
+        return key, status, cash, port, eq, pl, pl_pct, _holdings_table(acct)
 
 
-def ui_withdraw(acct: Optional[Account], amount: str, note: str) -> Tuple[Account, str, str, str, str, str, List[Dict[str, Any]], List[Dict[str, Any]]]:
-    acct = _require_account(acct)
-    try:
-        tx = acct.withdraw(amount, note=(note or None))
-        cash, port, eq, pl, pl_pct = _build_snapshot(acct)
-        status = _status_ok(f"Withdraw {_fmt_money(tx.amount or Decimal('0'))}")
-        return acct, status, cash, port, eq, pl, pl_pct, _holdings_table(acct), _transactions_table(acct)
-    except (InsufficientFundsError, InvalidQuantityError, AccountError) as e:
+def ui_reset_demo() -> Tuple[str, str, str, str, str, str, str, List[Dict[str, Any]]]:
+    STORE.create(DEFAULT_USER_ID)
+    with STORE.session(DEFAULT_USER_ID) as acct:
         cash, port, eq, pl, pl_pct = _build_snapshot(acct)
-        return acct, _status_err(str(e)), cash, port, eq, pl, pl_pct, _holdings_table(acct), _transactions_table(acct)
+        status = _status_ok("Reset demo state (new empty account)")
+        return DEFAULT_USER_ID, status, cash, port, eq, pl, pl_pct, _holdings_table(acct)
 
 
-def ui_buy(acct: Optional[Account], symbol: str, quantity: str, note: str) -> Tuple[Account, str, str, str, str, str, List[Dict[str, Any]], List[Dict[str, Any]]]:
-    acct = _require_account(acct)
-    sym = (symbol or "").strip().upper()
+def ui_tx_first_page(session_key: Optional[str], page_size: Any, symbol: str, tx_type: str) -> Tuple[List[List[str]], Dict[str, Any], str]:
+    key = _require_session(session_key)
     try:
-        tx = acct.buy(sym, quantity, note=(note or None))
-        cash, port, eq, pl, pl_pct = _build_snapshot(acct)
-        status = _status_ok(
-            f"Buy {tx.symbol} x{_fmt_qty(tx.quantity or Decimal('0'))} @ {_fmt_money(tx.price or Decimal('0'))} (amount {_fmt_money(tx.amount or Decimal('0'))})"
-        )
-        return acct, status, cash, port, eq, pl, pl_pct, _holdings_table(acct), _transactions_table(acct)
-    except (InvalidSymbolError, InvalidQuantityError, InsufficientFundsError, AccountError) as e:
-        cash, port, eq, pl, pl_pct = _build_snapshot(acct)
-        return acct, _status_err(str(e)), cash, port, eq, pl, pl_pct, _holdings_table(acct), _transactions_table(acct)
-
-
-def ui_sell(acct: Optional[Account], symbol: str, quantity: str, note: str) -> Tuple[Account, str, str, str, str, str, List[Dict[str, Any]], List[Dict[str, Any]]]:
-    acct = _require_account(acct)
-    sym = (symbol or "").strip().upper()
+        with STORE.session(key) as acct:
+            return _tx_page_outputs(acct, page_size, symbol, tx_type, [None])
+    except (ValueError, AccountError) as e:
+        return [], {"stack": [None], "next": None}, _status_err(str(e))
+
+
+def ui_tx_older(session_key: Optional[str], page_size: Any, symbol: str, tx_type: str, nav: Optional[Dict[str, Any]]) -> Tuple[List[List[str]], Dict[str, Any], str]:
+    key = _require_session(session_key)
+    nav = nav or {"stack": [None], "next": None}
+    stack = list(nav["stack"])
+    if nav.get("next") is not None:
+        stack.append(nav["next"])
     try:
-        tx = acct.sell(sym, quantity, note=(note or None))
-        cash, port, eq, pl, pl_pct = _build_snapshot(acct)
-        status = _status_ok(
-            f"Sell {tx.symbol} x{_fmt_qty(tx.quantity or Decimal('0'))} @ {_fmt_money(tx.price or Decimal('0'))} (amount {_fmt_money(tx.amount or Decimal('0'))})"
-        )
-        return acct, status, cash, port, eq, pl, pl_pct, _holdings_table(acct), _transactions_table(acct)
-    except (InvalidSymbolError, InvalidQuantityError, InsufficientHoldingsError, AccountError) as e:
-        cash, port, eq, pl, pl_pct = _build_snapshot(acct)
-        return acct, _status_err(str(e)), cash, port, eq, pl, pl_pct, _holdings_table(acct), _transactions_table(acct)
-
-
-def ui_refresh(acct: Optional[Account]) -> Tuple[Account, str, str, str, str, str, List[Dict[str, Any]], List[Dict[str, Any]]]:
-    acct = _require_account(acct)
-    cash, port, eq, pl, pl_pct = _build_snapshot(acct)
-    status = _status_ok("Refreshed")
-    return acct, status, cash, port, eq, pl, pl_pct, _holdings_table(acct), _transactions_table(acct)
+        with STORE.session(key) as acct:
+            return _tx_page_outputs(acct, page_size, symbol, tx_type, stack)
+    except (ValueError, AccountError):
+        return ui_tx_first_page(key, page_size, symbol, tx_type)
 
 
-def ui_reset_demo() -> Tuple[Account, str, str, str, str, str, List[Dict[str, Any]], List[Dict[str, Any]]]:
-    acct = _make_account(DEFAULT_USER_ID)
-    cash, port, eq, pl, pl_pct = _build_snapshot(acct)
-    status = _status_ok("Reset demo state (new empty account)")
-    return acct, status, cash, port, eq, pl, pl_pct, _holdings_table(acct), _transactions_table(acct)
+def ui_tx_newer(session_key: Optional[str], page_size: Any, symbol: str, tx_type: str, nav: Optional[Dict[str, Any]]) -> Tuple[List[List[str]], Dict[str, Any], str]:
+    key = _require_session(session_key)
+    stack = list((nav or {}).get("stack") or [None])
+    if len(stack) > 1:
+        stack.pop()
+    try:
+        with STORE.session(key) as acct:
+            return _tx_page_outputs(acct, page_size, symbol, tx_type, stack)
+    except (ValueError, AccountError):
+        return ui_tx_first_page(key, page_size, symbol, tx_type)
+
+
+def ui_ledger_views(session_key: Optional[str], page_size: Any, symbol: str, tx_type: str) -> Tuple[List[List[str]], Dict[str, Any], str, pd.DataFrame]:
+    rows, nav, info = ui_tx_first_page(session_key, page_size, symbol, tx_type)
+    with STORE.session(_require_session(session_key)) as acct:
+        return rows, nav, info, _equity_chart(acct)
+
+
+def _iter_upload_rows(path: str) -> Iterator[Dict[str, Any]]:
+    """Stream rows from an uploaded CSV (header row) or JSONL file without loading it whole."""
+    with open(path, "r", encoding="utf-8-sig", newline="") as fh:
+        first = fh.read(1)
+        fh.seek(0)
+        if path.lower().endswith((".jsonl", ".ndjson")) or first == "{":
+            for line in fh:
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield {"_error": f"Invalid JSON: {e.msg}"}
+                    continue
+                yield row if isinstance(row, dict) else {"_error": "Each JSON line must be an object"}
+        else:
+            for row in csv.DictReader(fh):
+                yield {(k or "").strip().lower(): v for k, v in row.items() if k is not None}
+
+
+def _chunks(rows: Iterator[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    chunk: List[Dict[str, Any]] = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def ui_bulk_upload(session_key: Optional[str], file_path: Optional[str]) -> Iterator[Tuple[str, List[List[Any]]]]:
+    """
+    Apply an uploaded CSV/JSONL of trades in BULK_CHUNK_ROWS chunks, streaming progress.
+
+    Each chunk is validated and applied with Account.apply_batch under the account lock,
+    which is released between chunks so other tabs stay responsive.
+    """
+    key = _require_session(session_key)
+    if not file_path:
+        yield _status_err("Choose a CSV or JSONL file first"), []
+        return
+    errors: List[List[Any]] = []
+    applied = failed = 0
+    row_no = 1
+    try:
+        for chunk in _chunks(_iter_upload_rows(file_path), BULK_CHUNK_ROWS):
+            row_numbers = [n for n, row in enumerate(chunk, row_no) if "_error" not in row]
+            chunk_errors = [(n, row["_error"]) for n, row in enumerate(chunk, row_no) if "_error" in row]
+            with STORE.session(key) as acct:
+                result = acct.apply_batch([row for row in chunk if "_error" not in row], start=0)
+                STORE.record(key, *result.applied)
+            chunk_errors.extend((row_numbers[i], msg) for i, msg in result.errors)
+            row_no += len(chunk)
+            applied += len(result.applied)
+            failed += len(chunk_errors)
+            for n, msg in sorted(chunk_errors):
+                if len(errors) < BULK_MAX_ERRORS_SHOWN:
+                    errors.append([n, msg])
+            yield f"Processing… {row_no - 1} row(s) read • {applied} applied • {failed} rejected", errors
+    except (OSError, UnicodeDecodeError, csv.Error) as e:
+        yield _status_err(f"Upload stopped after {row_no - 1} row(s): {e}"), errors
+        return
+    summary = f"{applied} applied • {failed} rejected of {row_no - 1} row(s)"
+    if failed > len(errors):
+        summary += f" (first {len(errors)} errors shown)"
+    yield (_status_ok(f"Bulk upload done: {summary}") if not failed else _status_err(f"Bulk upload done: {summary}")), errors
 
 
 def _price_hint(symbol: str) -> str:
@@ -211,7 +487,7 @@ def _price_hint(symbol: str) -> str:
 
 def build_app() -> gr.Blocks:
     with gr.Blocks(title=APP_TITLE, theme=gr.themes.Soft(), fill_height=True) as demo:
-        acct_state = gr.State(value=_make_account(DEFAULT_USER_ID))
+        session_state = gr.State(value=DEFAULT_USER_ID)
 
         gr.Markdown(
             f"# {APP_TITLE}\n"
@@ -220,7 +496,8 @@ def build_app() -> gr.Blocks:
         )
 
         with gr.Row():
-            user_id = gr.Textbox(label="User ID (single-user demo)", value=DEFAULT_USER_ID, scale=2)
+            user_id = gr.Textbox(label="User ID", value=DEFAULT_USER_ID, scale=2)
+            open_btn = gr.Button("Open Account", variant="secondary", scale=1)
             create_btn = gr.Button("Create / Replace Account", variant="primary", scale=1)
             reset_btn = gr.Button("Reset Demo", variant="secondary", scale=1)
 
@@ -266,6 +543,26 @@ def build_app() -> gr.Blocks:
                     buy_btn = gr.Button("Buy", variant="primary")
                     sell_btn = gr.Button("Sell", variant="secondary")
 
+            with gr.Tab("Bulk Upload"):
+                gr.Markdown(
+                    "Upload a CSV (with header) or JSONL file of rows with `type` "
+                    "(DEPOSIT/WITHDRAW/BUY/SELL), `amount` or `symbol` + `quantity`, "
+                    "and optional `timestamp` (ISO 8601 with offset) and `note`."
+                )
+                with gr.Row():
+                    bulk_file = gr.File(label="Trades file", file_types=[".csv", ".jsonl", ".ndjson"], type="filepath")
+                    bulk_btn = gr.Button("Apply Upload", variant="primary")
+                bulk_status = gr.Textbox(label="Upload Progress", interactive=False)
+                bulk_errors = gr.Dataframe(
+                    label="Rejected Rows",
+                    headers=["row", "error"],
+                    datatype=["number", "str"],
+                    interactive=False,
+                    wrap=True,
+                    row_count=(1, "dynamic"),
+                    col_count=(2, "fixed"),
+                )
+
             with gr.Tab("Holdings"):
                 holdings_df = gr.Dataframe(
                     label="Current Holdings",
@@ -278,21 +575,56 @@ def build_app() -> gr.Blocks:
                 )
 
             with gr.Tab("Transactions"):
+                with gr.Row():
+                    tx_page_size = gr.Dropdown(
+                        label="Page size",
+                        choices=TX_PAGE_SIZES,
+                        value=DEFAULT_TX_PAGE_SIZE,
+                        interactive=True,
+                    )
+                    tx_symbol = gr.Dropdown(
+                        label="Symbol",
+                        choices=[TX_FILTER_ALL, "AAPL", "TSLA", "GOOGL"],
+                        value=TX_FILTER_ALL,
+                        allow_custom_value=True,
+                        interactive=True,
+                    )
+                    tx_type = gr.Dropdown(
+                        label="Type",
+                        choices=[TX_FILTER_ALL] + [t.value for t in TransactionType],
+                        value=TX_FILTER_ALL,
+                        interactive=True,
+                    )
+                with gr.Row():
+                    tx_newest_btn = gr.Button("Newest", variant="secondary")
+                    tx_newer_btn = gr.Button("← Newer", variant="secondary")
+                    tx_older_btn = gr.Button("Older →", variant="secondary")
+                tx_page_info = gr.Markdown()
                 tx_df = gr.Dataframe(
-                    label="Transactions (append-only)",
-                    headers=["timestamp", "type", "symbol", "quantity", "price", "amount", "note", "id"],
-                    datatype=["str", "str", "str", "str", "str", "str", "str", "str"],
+                    label="Transactions (append-only, newest first)",
+                    headers=TX_HEADERS,
+                    datatype=["str"] * len(TX_HEADERS),
                     interactive=False,
                     wrap=True,
                     row_count=(1, "dynamic"),
-                    col_count=(8, "fixed"),
+                    col_count=(len(TX_HEADERS), "fixed"),
+                )
+                tx_nav_state = gr.State(value={"stack": [None], "next": None})
+
+            with gr.Tab("Equity"):
+                equity_plot = gr.LinePlot(
+                    x="timestamp",
+                    y="equity",
+                    label=f"Equity after each transaction (≤ {EQUITY_CHART_POINTS} points, LTTB-downsampled)",
+                    x_title="Time (UTC)",
+                    y_title="Equity",
                 )
 
         def _apply_outputs(result):
             return result
 
         outputs = [
-            acct_state,
+            session_state,
             status,
             cash_out,
             portfolio_out,
@@ -300,62 +632,89 @@ def build_app() -> gr.Blocks:
             pl_out,
             pl_pct_out,
             holdings_df,
-            tx_df,
         ]
+        # Only one page of transactions and a fixed-size equity chart are sent per
+        # interaction; every event that can change the ledger re-renders them afterwards.
+        tx_inputs = [session_state, tx_page_size, tx_symbol, tx_type]
+        tx_outputs = [tx_df, tx_nav_state, tx_page_info]
+        ledger_outputs = tx_outputs + [equity_plot]
 
         create_btn.click(
             fn=ui_create_account,
             inputs=[user_id],
             outputs=outputs,
             api_name="create_account",
-        )
+        ).then(fn=ui_ledger_views, inputs=tx_inputs, outputs=ledger_outputs)
+
+        open_btn.click(
+            fn=ui_open_account,
+            inputs=[user_id],
+            outputs=outputs,
+            api_name="open_account",
+        ).then(fn=ui_ledger_views, inputs=tx_inputs, outputs=ledger_outputs)
 
         reset_btn.click(
             fn=ui_reset_demo,
             inputs=[],
             outputs=outputs,
             api_name="reset_demo",
-        )
+        ).then(fn=ui_ledger_views, inputs=tx_inputs, outputs=ledger_outputs)
 
         dep_btn.click(
             fn=ui_deposit,
-            inputs=[acct_state, dep_amount, dep_note],
+            inputs=[session_state, dep_amount, dep_note],
             outputs=outputs,
             api_name="deposit",
-        )
+        ).then(fn=ui_ledger_views, inputs=tx_inputs, outputs=ledger_outputs)
 
         wd_btn.click(
             fn=ui_withdraw,
-            inputs=[acct_state, wd_amount, wd_note],
+            inputs=[session_state, wd_amount, wd_note],
             outputs=outputs,
             api_name="withdraw",
-        )
+        ).then(fn=ui_ledger_views, inputs=tx_inputs, outputs=ledger_outputs)
 
         buy_btn.click(
             fn=ui_buy,
-            inputs=[acct_state, symbol, qty, trade_note],
+            inputs=[session_state, symbol, qty, trade_note],
             outputs=outputs,
             api_name="buy",
-        )
+        ).then(fn=ui_ledger_views, inputs=tx_inputs, outputs=ledger_outputs)
 
         sell_btn.click(
             fn=ui_sell,
-            inputs=[acct_state, symbol, qty, trade_note],
+            inputs=[session_state, symbol, qty, trade_note],
             outputs=outputs,
             api_name="sell",
-        )
+        ).then(fn=ui_ledger_views, inputs=tx_inputs, outputs=ledger_outputs)
 
         refresh_btn.click(
             fn=ui_refresh,
-            inputs=[acct_state],
+            inputs=[session_state],
             outputs=outputs,
             api_name="refresh",
+        ).then(fn=ui_ledger_views, inputs=tx_inputs, outputs=ledger_outputs)
+
+        bulk_btn.click(
+            fn=ui_bulk_upload,
+            inputs=[session_state, bulk_file],
+            outputs=[bulk_status, bulk_errors],
+        ).then(fn=ui_refresh, inputs=[session_state], outputs=outputs).then(
+            fn=ui_ledger_views, inputs=tx_inputs, outputs=ledger_outputs
         )
 
         symbol.change(fn=_price_hint, inputs=[symbol], outputs=[price_hint])
 
+        tx_newest_btn.click(fn=ui_tx_first_page, inputs=tx_inputs, outputs=tx_outputs)
+        tx_older_btn.click(fn=ui_tx_older, inputs=tx_inputs + [tx_nav_state], outputs=tx_outputs)
+        tx_newer_btn.click(fn=ui_tx_newer, inputs=tx_inputs + [tx_nav_state], outputs=tx_outputs)
+        for control in (tx_page_size, tx_symbol, tx_type):
+            control.change(fn=ui_tx_first_page, inputs=tx_inputs, outputs=tx_outputs)
+
         # Initialize displayed metrics/tables from initial state
-        demo.load(fn=ui_refresh, inputs=[acct_state], outputs=outputs)
+        demo.load(fn=ui_refresh, inputs=[session_state], outputs=outputs).then(
+            fn=ui_ledger_views, inputs=tx_inputs, outputs=ledger_outputs
+        )
 
     return demo
 
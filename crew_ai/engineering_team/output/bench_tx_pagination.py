@@ -0,0 +1,75 @@
+"""
+Response size / latency of the Transactions tab as the ledger grows.
+
+Compares the old full-history table with one server-side page. Page timings clear
+VIEW_CACHE before every repeat so they measure the paging itself; "hit ms" is the
+same page served from the cache. Run:
+    python bench_tx_pagination.py
+"""
+from __future__ import annotations
+
+import json
+import time
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+from accounts import Account, Transaction, TransactionType
+from app import DEFAULT_TX_PAGE_SIZE, TX_FILTER_ALL, VIEW_CACHE, _transactions_page, _tx_to_row
+
+LEDGER_SIZES = [100, 1_000, 10_000, 100_000]
+REPEATS = 5
+
+
+def _build_account(n: int) -> Account:
+    acct = Account("bench")
+    t0 = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    acct.deposit(Decimal("1000000000"), timestamp=t0)
+    for i in range(1, n):
+        # Append directly: the public trade path replays the ledger per call.
+        acct._append_transaction(
+            Transaction(
+                id=f"tx-{i}",
+                timestamp=t0 + timedelta(seconds=i),
+                type=TransactionType.BUY,
+                symbol="AAPL",
+                quantity=Decimal("1.00000000"),
+                price=Decimal("180.00"),
+                amount=Decimal("180.00"),
+            )
+        )
+    return acct
+
+
+def _measure(fn, cold: bool = False) -> tuple[float, int]:
+    best = float("inf")
+    size = 0
+    for _ in range(REPEATS):
+        if cold:
+            VIEW_CACHE.clear()
+        start = time.perf_counter()
+        payload = json.dumps(fn())
+        best = min(best, time.perf_counter() - start)
+        size = len(payload)
+    return best * 1000, size
+
+
+def main() -> None:
+    print(
+        f"{'ledger':>8} | {'full ms':>9} {'full bytes':>12} | {'page ms':>8} {'page bytes':>11} | "
+        f"{'filtered page ms':>16} | {'hit ms':>7}"
+    )
+    for n in LEDGER_SIZES:
+        acct = _build_account(n)
+        full_ms, full_bytes = _measure(lambda: [_tx_to_row(tx) for tx in acct.transactions()])
+        page = lambda: _transactions_page(acct, DEFAULT_TX_PAGE_SIZE, TX_FILTER_ALL, TX_FILTER_ALL, None)[0]
+        page_ms, page_bytes = _measure(page, cold=True)
+        filt_ms, _ = _measure(lambda: _transactions_page(acct, DEFAULT_TX_PAGE_SIZE, "AAPL", "BUY", None)[0], cold=True)
+        hit_ms, _ = _measure(page)
+        print(
+            f"{n:>8} | {full_ms:>9.2f} {full_bytes:>12} | {page_ms:>8.3f} {page_bytes:>11} | "
+            f"{filt_ms:>16.3f} | {hit_ms:>7.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
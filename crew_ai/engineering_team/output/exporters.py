@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+import csv
+import json
+import struct
+import sys
+from array import array
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal, InvalidOperation
+from typing import IO, Collection, Dict, Iterator, List, Optional, Union
+
+from accounts import Account, AccountError, Transaction, TransactionType
+
+
+PathOrFile = Union[str, "IO[str]", "IO[bytes]"]
+
+COLUMNS = ("timestamp", "type", "symbol", "quantity", "price", "amount", "note", "id")
+
+# Columnar layout: MAGIC, then chunks of
+#   uint32 row count (0 terminates the file)
+#   timestamp column: int64 microseconds since the epoch, one per row
+#   every other column: uint32 byte offsets (rows + 1) followed by the UTF-8 blob they index
+COLUMNAR_MAGIC = b"TXCOL\x01"
+DEFAULT_CHUNK_ROWS = 16_384
+
+_U32 = struct.Struct("<I")
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def transaction_row(tx: Transaction) -> Dict[str, str]:
+    """Flatten a transaction into export strings (Decimals kept exact, None as "")."""
+    return {
+        "timestamp": tx.timestamp.isoformat(),
+        "type": getattr(tx.type, "value", str(tx.type)),
+        "symbol": tx.symbol or "",
+        "quantity": "" if tx.quantity is None else str(tx.quantity),
+        "price": "" if tx.price is None else str(tx.price),
+        "amount": "" if tx.amount is None else str(tx.amount),
+        "note": tx.note or "",
+        "id": tx.id,
+    }
+
+
+def transaction_from_row(row: Dict[str, str]) -> Transaction:
+    """Inverse of `transaction_row`."""
+    try:
+        return Transaction(
+            id=row["id"],
+            timestamp=datetime.fromisoformat(row["timestamp"]).astimezone(timezone.utc),
+            type=TransactionType(row["type"]),
+            symbol=row.get("symbol") or None,
+            quantity=Decimal(row["quantity"]) if row.get("quantity") else None,
+            price=Decimal(row["price"]) if row.get("price") else None,
+            amount=Decimal(row["amount"]) if row.get("amount") else None,
+            note=row.get("note") or None,
+        )
+    except (KeyError, ValueError, InvalidOperation) as e:
+        raise AccountError(f"Invalid transaction row: {row!r}") from e
+
+
+def iter_rows(
+    acct: Account,
+    *,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    symbols: Optional[Collection[str]] = None,
+) -> Iterator[Dict[str, str]]:
+    for tx in acct.iter_transactions(start=start, end=end, symbols=symbols):
+        yield transaction_row(tx)
+
+
+@contextmanager
+def _open(target: PathOrFile, mode: str):
+    if isinstance(target, str):
+        kwargs = {} if "b" in mode else {"encoding": "utf-8", "newline": ""}
+        with open(target, mode, **kwargs) as fh:
+            yield fh
+    else:
+        yield target
+
+
+def export_csv(
+    acct: Account,
+    dest: PathOrFile,
+    *,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    symbols: Optional[Collection[str]] = None,
+) -> int:
+    """Stream matching transactions to CSV (header included). Returns rows written."""
+    n = 0
+    with _open(dest, "w") as fh:
+        writer = csv.writer(fh)
+        writer.writerow(COLUMNS)
+        for row in iter_rows(acct, start=start, end=end, symbols=symbols):
+            writer.writerow([row[c] for c in COLUMNS])
+            n += 1
+    return n
+
+
+def export_jsonl(
+    acct: Account,
+    dest: PathOrFile,
+    *,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    symbols: Optional[Collection[str]] = None,
+) -> int:
+    """Stream matching transactions as one JSON object per line. Returns rows written."""
+    n = 0
+    with _open(dest, "w") as fh:
+        for row in iter_rows(acct, start=start, end=end, symbols=symbols):
+            fh.write(json.dumps(row, ensure_ascii=False))
+            fh.write("\n")
+            n += 1
+    return n
+
+
+def export_columnar(
+    acct: Account,
+    dest: PathOrFile,
+    *,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    symbols: Optional[Collection[str]] = None,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+) -> int:
+    """
+    Stream matching transactions to a chunked columnar binary file (see COLUMNAR_MAGIC).
+
+    At most `chunk_rows` rows are buffered at a time. Returns rows written.
+    """
+    if chunk_rows <= 0:
+        raise ValueError("chunk_rows must be > 0.")
+    n = 0
+    with _open(dest, "wb") as fh:
+        fh.write(COLUMNAR_MAGIC)
+        chunk: List[Transaction] = []
+        for tx in acct.iter_transactions(start=start, end=end, symbols=symbols):
+            chunk.append(tx)
+            if len(chunk) >= chunk_rows:
+                _write_chunk(fh, chunk)
+                n += len(chunk)
+                chunk = []
+        if chunk:
+            _write_chunk(fh, chunk)
+            n += len(chunk)
+        fh.write(_U32.pack(0))
+    return n
+
+
+def read_columnar(src: PathOrFile) -> Iterator[Dict[str, str]]:
+    """Yield rows (as produced by `transaction_row`) back from a columnar export, chunk by chunk."""
+    with _open(src, "rb") as fh:
+        if fh.read(len(COLUMNAR_MAGIC)) != COLUMNAR_MAGIC:
+            raise ValueError("Not a transaction columnar file.")
+        while True:
+            (rows,) = _U32.unpack(_read_exact(fh, _U32.size))
+            if rows == 0:
+                return
+            micros = array("q")
+            micros.frombytes(_read_exact(fh, 8 * rows))
+            cols: Dict[str, List[str]] = {
+                "timestamp": [(_EPOCH + timedelta(microseconds=us)).isoformat() for us in _to_le(micros)]
+            }
+            for name in COLUMNS[1:]:
+                offsets = array("I")
+                offsets.frombytes(_read_exact(fh, 4 * (rows + 1)))
+                offsets = _to_le(offsets)
+                blob = _read_exact(fh, offsets[-1])
+                cols[name] = [blob[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(rows)]
+            for i in range(rows):
+                yield {name: cols[name][i] for name in COLUMNS}
+
+
+def _write_chunk(fh: IO[bytes], chunk: List[Transaction]) -> None:
+    fh.write(_U32.pack(len(chunk)))
+    fh.write(_to_le(array("q", (_to_micros(tx.timestamp) for tx in chunk))).tobytes())
+    rows = [transaction_row(tx) for tx in chunk]
+    for name in COLUMNS[1:]:
+        values = [r[name].encode("utf-8") for r in rows]
+        offsets = array("I", [0])
+        for v in values:
+            offsets.append(offsets[-1] + len(v))
+        fh.write(_to_le(offsets).tobytes())
+        fh.write(b"".join(values))
+
+
+def _to_micros(ts: datetime) -> int:
+    delta = ts - _EPOCH
+    return (delta.days * 86_400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+def _to_le(arr: array) -> array:
+    if sys.byteorder != "little":
+        arr = array(arr.typecode, arr)
+        arr.byteswap()
+    return arr
+
+
+def _read_exact(fh: IO[bytes], n: int) -> bytes:
+    data = fh.read(n)
+    if len(data) != n:
+        raise ValueError("Truncated transaction columnar file.")
+    return data
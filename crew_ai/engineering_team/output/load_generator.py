@@ -0,0 +1,156 @@
+"""
+Load generator for api_server.py: reports requests/s and p50/p99 latency.
+
+Runs N keep-alive connections, each driving its own account through a mix of
+deposit/buy/sell/snapshot/transactions requests. Examples:
+    python load_generator.py --inprocess --connections 32 --duration 10
+    python load_generator.py --host 127.0.0.1 --port 8765 --requests 20000
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+# (weight, method, path suffix, body factory)
+WORKLOAD = [
+    (10, "POST", "deposit", lambda rnd: {"amount": "1000"}),
+    (25, "POST", "buy", lambda rnd: {"symbol": rnd.choice(["AAPL", "TSLA", "GOOGL"]), "quantity": "0.5"}),
+    (15, "POST", "sell", lambda rnd: {"symbol": rnd.choice(["AAPL", "TSLA", "GOOGL"]), "quantity": "0.25"}),
+    (30, "GET", "snapshot", None),
+    (20, "GET", "transactions?limit=50", None),
+]
+
+
+class Connection:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, host: str) -> None:
+        self.reader = reader
+        self.writer = writer
+        self.host = host
+
+    @classmethod
+    async def open(cls, host: str, port: int) -> "Connection":
+        reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer, host)
+
+    async def request(self, method: str, path: str, body: Optional[Dict[str, Any]] = None) -> Tuple[int, bytes]:
+        data = json.dumps(body).encode("utf-8") if body is not None else b""
+        head = f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\nContent-Length: {len(data)}\r\n"
+        if data:
+            head += "Content-Type: application/json\r\n"
+        self.writer.write(head.encode("latin-1") + b"\r\n" + data)
+        await self.writer.drain()
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError("Server closed the connection")
+        status = int(status_line.split()[1])
+        length = 0
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            if name.strip().lower() == "content-length":
+                length = int(value.strip())
+        return status, await self.reader.readexactly(length)
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[idx]
+
+
+async def _worker(
+    n: int, args: argparse.Namespace, deadline: float, budget: List[int], latencies: List[float], statuses: Counter
+) -> None:
+    rnd = random.Random(args.seed + n)
+    conn = await Connection.open(args.host, args.port)
+    user = f"load-{n}"
+    weights = [w for w, *_ in WORKLOAD]
+    try:
+        await conn.request("POST", f"/accounts/{user}")
+        while time.perf_counter() < deadline:
+            if args.requests:
+                if budget[0] <= 0:
+                    break
+                budget[0] -= 1
+            _, method, suffix, body = rnd.choices(WORKLOAD, weights=weights)[0]
+            start = time.perf_counter()
+            status, _ = await conn.request(method, f"/accounts/{user}/{suffix}", body(rnd) if body else None)
+            latencies.append(time.perf_counter() - start)
+            statuses[status] += 1
+    finally:
+        conn.close()
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    server = None
+    if args.inprocess:
+        from account_store import AccountStore
+        from api_server import TradingApi, serve
+
+        server = await serve(TradingApi(AccountStore()), args.host, 0)
+        args.port = server.sockets[0].getsockname()[1]
+
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    budget = [args.requests]
+    deadline = time.perf_counter() + (args.duration if not args.requests else float("inf"))
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(
+            *(_worker(n, args, deadline, budget, latencies, statuses) for n in range(args.connections))
+        )
+    finally:
+        if server is not None:
+            server.close()
+            await server.wait_closed()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "connections": args.connections,
+        "requests": len(latencies),
+        "elapsed_s": round(elapsed, 3),
+        "requests_per_s": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(_percentile(latencies, 50) * 1000, 3),
+        "p99_ms": round(_percentile(latencies, 99) * 1000, 3),
+        "max_ms": round((latencies[-1] if latencies else 0.0) * 1000, 3),
+        "status_counts": dict(sorted(statuses.items())),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load generator for api_server.py")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--connections", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds to run (ignored with --requests)")
+    parser.add_argument("--requests", type=int, default=0, help="total requests instead of a duration")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--inprocess", action="store_true", help="start a throwaway server in this process")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(report))
+        return
+    print(
+        f"{report['requests']} requests over {report['connections']} connections in {report['elapsed_s']}s: "
+        f"{report['requests_per_s']} req/s, p50 {report['p50_ms']} ms, p99 {report['p99_ms']} ms, "
+        f"max {report['max_ms']} ms, statuses {report['status_counts']}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import os
+import tempfile
+import threading
+import unittest
+from decimal import Decimal
+
+from account_store import AccountStore
+from accounts import InsufficientFundsError
+
+
+class TestAccountStore(unittest.TestCase):
+    def test_same_key_shares_one_account(self):
+        store = AccountStore()
+        a = store.get(" alice ")
+        self.assertIs(store.get("alice"), a)
+        self.assertIsNot(store.get("bob"), a)
+        self.assertEqual(store.keys(), ["alice", "bob"])
+        with self.assertRaises(ValueError):
+            store.get("  ")
+
+    def test_create_replaces_account(self):
+        store = AccountStore()
+        old = store.get("alice")
+        old.deposit("10")
+        new = store.create("alice")
+        self.assertIsNot(new, old)
+        self.assertIs(store.get("alice"), new)
+        self.assertEqual(new.cash_balance(), Decimal("0.00"))
+
+    def test_persisted_ledger_survives_restart(self):
+        with tempfile.TemporaryDirectory() as d:
+            store = AccountStore(d)
+            with store.session("alice/1") as acct:
+                store.record("alice/1", acct.deposit("1000", note="seed"), acct.buy("AAPL", "2"))
+            account_id = acct.account_id
+
+            reloaded = AccountStore(d).get("alice/1")
+            self.assertEqual(reloaded.account_id, account_id)
+            self.assertEqual(reloaded.cash_balance(), Decimal("640.00"))
+            self.assertEqual(reloaded.holdings(), {"AAPL": Decimal("2.00000000")})
+            self.assertEqual([tx.note for tx in reloaded.transactions()], ["seed", None])
+
+            store.create("alice/1")
+            self.assertEqual(AccountStore(d).get("alice/1").transactions(), [])
+            self.assertEqual(os.listdir(d), ["alice%2F1.jsonl"])
+
+    def test_session_serializes_concurrent_withdrawals(self):
+        store = AccountStore()
+        store.get("alice").deposit("100")
+        failures = []
+
+        def withdraw():
+            try:
+                with store.session("alice") as acct:
+                    acct.withdraw("10")
+            except InsufficientFundsError:
+                failures.append(1)
+
+        threads = [threading.Thread(target=withdraw) for _ in range(15)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(store.get("alice").cash_balance(), Decimal("0.00"))
+        self.assertEqual(len(failures), 5)
+
+    def test_cold_load_does_not_block_other_accounts(self):
+        store = AccountStore()
+        store.get("bob")
+        loading, release = threading.Event(), threading.Event()
+        load = store._load
+
+        def slow_load(key):
+            if key == "alice":
+                loading.set()
+                release.wait(5)
+            return load(key)
+
+        store._load = slow_load
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(store.get("alice"))) for _ in range(2)]
+        for t in threads:
+            t.start()
+        self.assertTrue(loading.wait(5))
+        # Another account and the registry stay available while alice loads.
+        self.assertEqual(store.get("bob").user_id, "bob")
+        self.assertEqual(store.keys(), ["bob"])
+        release.set()
+        for t in threads:
+            t.join()
+        self.assertIs(results[0], results[1])
+        self.assertEqual(store.keys(), ["alice", "bob"])
+
+
+if __name__ == "__main__":
+    unittest.main()
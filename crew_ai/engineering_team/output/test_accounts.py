@@ -6,6 +6,7 @@ import accounts
 from accounts import (
     Account,
     AccountError,
+    GBMModel,
     InsufficientFundsError,
     InsufficientHoldingsError,
     InvalidQuantityError,
@@ -13,6 +14,11 @@ from accounts import (
     TransactionType,
 )
 
+try:
+    import numpy
+except ImportError:  # pragma: no cover - simulate() is optional
+    numpy = None
+
 
 class TestAccountInitialization(unittest.TestCase):
     def test_init_requires_non_empty_user_id(self):
@@ -100,6 +106,17 @@ class TestSymbolsAndPricing(unittest.TestCase):
         self.assertEqual(accounts.get_share_price("tsla"), 250.0)
         self.assertEqual(accounts.get_share_price(" GOOGL "), 140.0)
 
+    def test_set_share_price_overrides_and_bumps_price_version(self):
+        before = accounts.price_version()
+        try:
+            accounts.set_share_price("aapl", 200)
+            self.assertEqual(accounts.get_share_price("AAPL"), 200.0)
+            self.assertGreater(accounts.price_version(), before)
+            with self.assertRaises(InvalidSymbolError):
+                accounts.set_share_price("AAPL", 0)
+        finally:
+            accounts.set_share_price("AAPL", 180.00)
+
     def test_get_share_price_unknown_symbol_raises(self):
         with self.assertRaises(InvalidSymbolError):
             accounts.get_share_price("MSFT")
@@ -186,6 +203,69 @@ class TestTradingAndReporting(unittest.TestCase):
         acct2 = Account("u2")
         self.assertIsNone(acct2.profit_loss_pct())
 
+    def test_version_tracks_recorded_transactions_only(self):
+        self.assertEqual(self.acct.version, 0)
+        self.acct.deposit("100", timestamp=self.t0)
+        self.assertEqual(self.acct.version, 1)
+        with self.assertRaises(InsufficientFundsError):
+            self.acct.withdraw("500", timestamp=self.t1)
+        self.assertEqual(self.acct.version, 1)
+
+    def test_equity_curve_matches_equity_value_at_each_point(self):
+        self.acct.deposit("1000.00", timestamp=self.t0)
+        self.acct.buy("AAPL", "2", timestamp=self.t1)
+        self.acct.sell("AAPL", "1", timestamp=self.t2)
+        self.acct.withdraw("200.00", timestamp=self.t3)
+        curve = list(self.acct.iter_equity_curve())
+        self.assertEqual([ts for ts, _ in curve], [self.t0, self.t1, self.t2, self.t3])
+        self.assertEqual([eq for _, eq in curve], [self.acct.equity_value(as_of=ts) for ts, _ in curve])
+        self.assertEqual(len(list(self.acct.iter_equity_curve(as_of=self.t1))), 2)
+
+    def test_apply_batch_validates_against_running_state(self):
+        rows = [
+            {"type": "deposit", "amount": "1000", "timestamp": self.t0.isoformat()},
+            {"type": "BUY", "symbol": "aapl", "quantity": "5", "timestamp": self.t1},  # 900
+            {"type": "BUY", "symbol": "TSLA", "quantity": "1"},  # cost 250 > cash 100
+            {"type": "SELL", "symbol": "AAPL", "quantity": "6"},  # only 5 held
+            {"type": "SELL", "symbol": "AAPL", "quantity": "2", "note": "trim"},
+            {"type": "WITHDRAW", "amount": "460"},
+            {"type": "TRANSFER", "amount": "1"},
+            {"type": "DEPOSIT", "amount": "1", "timestamp": self.t0.isoformat()},  # earlier than ledger
+            {"type": "DEPOSIT", "amount": "1", "timestamp": "2025-01-01T10:00:00"},  # naive
+        ]
+        result = self.acct.apply_batch(rows, start=2)
+        self.assertEqual(len(result.applied), 4)
+        self.assertEqual([n for n, _ in result.errors], [4, 5, 8, 9, 10])
+        self.assertIn("Insufficient cash", result.errors[0][1])
+        self.assertEqual(self.acct.cash_balance(), Decimal("0.00"))
+        self.assertEqual(self.acct.holdings(), {"AAPL": Decimal("3.00000000")})
+        self.assertEqual(result.applied[2].note, "trim")
+
+        # The next batch reuses the carried-over state and still sees external writes.
+        self.acct.deposit("180")
+        more = self.acct.apply_batch([{"type": "BUY", "symbol": "AAPL", "quantity": "1"}])
+        self.assertEqual(more.errors, [])
+        self.assertEqual(self.acct.cash_balance(), Decimal("0.00"))
+
+    def test_apply_batch_reports_non_finite_and_out_of_range_rows(self):
+        rows = [
+            {"type": "DEPOSIT", "amount": "100"},
+            {"type": "DEPOSIT", "amount": "NaN"},
+            {"type": "DEPOSIT", "amount": "Infinity"},
+            {"type": "DEPOSIT", "amount": 1e400},
+            {"type": "DEPOSIT", "amount": "1e400"},
+            {"type": "BUY", "symbol": "AAPL", "quantity": "-inf"},
+            {"type": "DEPOSIT", "amount": "5"},
+        ]
+        result = self.acct.apply_batch(rows)
+        self.assertEqual(len(result.applied), 2)
+        self.assertEqual([n for n, _ in result.errors], [2, 3, 4, 5, 6])
+        self.assertEqual(len(self.acct.transactions()), 2)
+        self.assertEqual(self.acct.cash_balance(), Decimal("105.00"))
+
+        with self.assertRaises(InvalidQuantityError):
+            self.acct.deposit("NaN")
+
     def test_sell_more_than_holdings_raises(self):
         self.acct.deposit("1000", timestamp=self.t0)
         self.acct.buy("TSLA", "1", timestamp=self.t1)
@@ -209,6 +289,42 @@ class TestTradingAndReporting(unittest.TestCase):
         range_filtered = self.acct.transactions(start=self.t1, end=self.t1)
         self.assertEqual([tx.note for tx in range_filtered], ["d1"])
 
+    def test_iter_transactions_filters_by_window_symbol_and_type(self):
+        self.acct.deposit("1000", timestamp=self.t0)
+        self.acct.buy("AAPL", "1", timestamp=self.t1)
+        self.acct.buy("TSLA", "1", timestamp=self.t2)
+        self.acct.sell("AAPL", "1", timestamp=self.t3)
+
+        it = self.acct.iter_transactions(start=self.t1, end=self.t3, symbols=["aapl"])
+        self.assertNotIsInstance(it, list)
+        self.assertEqual([tx.type for tx in it], [TransactionType.BUY, TransactionType.SELL])
+
+        sells = list(self.acct.iter_transactions(types=[TransactionType.SELL]))
+        self.assertEqual([tx.timestamp for tx in sells], [self.t3])
+        self.assertEqual(list(self.acct.iter_transactions(start=self.t4)), [])
+
+    def test_transactions_page_walks_newest_first_with_stable_cursor(self):
+        for i in range(5):
+            self.acct.deposit("10", timestamp=self.t0, note=f"d{i}")  # identical timestamps
+        self.acct.buy("AAPL", "0.1", timestamp=self.t1, note="b")
+
+        page, cursor = self.acct.transactions_page(limit=2)
+        self.assertEqual([tx.note for tx in page], ["b", "d4"])
+        self.acct.deposit("10", timestamp=self.t2, note="late")  # must not shift later pages
+        page, cursor = self.acct.transactions_page(limit=2, cursor=cursor)
+        self.assertEqual([tx.note for tx in page], ["d3", "d2"])
+        page, cursor = self.acct.transactions_page(limit=2, cursor=cursor)
+        self.assertEqual([tx.note for tx in page], ["d1", "d0"])
+        self.assertIsNone(cursor)
+
+        page, cursor = self.acct.transactions_page(limit=10, types=[TransactionType.BUY], symbols=["aapl"])
+        self.assertEqual([tx.note for tx in page], ["b"])
+        self.assertIsNone(cursor)
+        with self.assertRaises(ValueError):
+            self.acct.transactions_page(limit=2, cursor="garbage")
+        with self.assertRaises(InvalidQuantityError):
+            self.acct.transactions_page(limit=0)
+
     def test_as_of_filters_include_equal_timestamps(self):
         self.acct.deposit("100", timestamp=self.t0)
         self.acct.withdraw("10", timestamp=self.t1)
@@ -286,5 +402,66 @@ class TestReplayCorruptionAndUnknownType(unittest.TestCase):
             self.acct.cash_balance()
 
 
+@unittest.skipIf(numpy is None, "numpy is required for Account.simulate")
+class TestSimulation(unittest.TestCase):
+    def setUp(self):
+        self.acct = Account("u1")
+        t0 = datetime(2025, 1, 1, 10, 0, 0, tzinfo=timezone.utc)
+        self.acct.deposit("1000", timestamp=t0)
+        self.acct.buy("AAPL", "2", timestamp=t0 + timedelta(seconds=1))  # 360 invested, 640 cash
+        self.acct.buy("TSLA", "1", timestamp=t0 + timedelta(seconds=2))  # 250 invested, 390 cash
+        self.model = GBMModel.from_volatility(
+            ["AAPL", "TSLA", "GOOGL"], [0.05, 0.10, 0.07], [0.25, 0.60, 0.30],
+            [[1.0, 0.4, 0.5], [0.4, 1.0, 0.3], [0.5, 0.3, 1.0]],
+        )
+
+    def test_zero_volatility_is_deterministic(self):
+        model = GBMModel(("AAPL", "TSLA"), (0.0, 0.0), ((0.0, 0.0), (0.0, 0.0)))
+        res = self.acct.simulate(1000, 10, model, seed=1)
+        self.assertEqual(res.start_value, Decimal("1000.00"))
+        self.assertEqual(res.expected_value, Decimal("1000.00"))
+        self.assertEqual(res.var, Decimal("0.00"))
+        self.assertEqual(res.cvar, Decimal("0.00"))
+        self.assertEqual(res.steps[0], 0)
+        self.assertEqual(res.steps[-1], 10)
+        for band in res.bands.values():
+            self.assertTrue(all(v == Decimal("1000.00") for v in band))
+
+    def test_seeded_runs_are_reproducible_and_chunking_is_transparent(self):
+        a = self.acct.simulate(5000, 21, self.model, seed=7, chunk_size=5000)
+        b = self.acct.simulate(5000, 21, self.model, seed=7, chunk_size=5000)
+        self.assertEqual(a, b)
+        c = self.acct.simulate(5000, 21, self.model, seed=7, chunk_size=777)
+        self.assertEqual(c.paths, 5000)
+        self.assertEqual(len(c.bands[50.0]), len(c.steps))
+        self.assertEqual(c, a)
+
+    def test_risk_metrics_are_ordered(self):
+        res = self.acct.simulate(20_000, 21, self.model, seed=3, confidence=0.99)
+        self.assertGreater(res.var, Decimal("0"))
+        self.assertGreaterEqual(res.cvar, res.var)
+        self.assertLess(res.var, Decimal("610.00"))  # cannot lose more than invested
+        terminal = [res.bands[p][-1] for p in (5.0, 25.0, 50.0, 75.0, 95.0)]
+        self.assertEqual(terminal, sorted(terminal))
+
+    def test_cash_only_account_has_no_risk(self):
+        acct = Account("u2")
+        acct.deposit("50")
+        res = acct.simulate(100, 5, self.model)
+        self.assertEqual(res.start_value, Decimal("50.00"))
+        self.assertEqual(res.var, Decimal("0.00"))
+
+    def test_rejects_unmodelled_holdings_and_bad_arguments(self):
+        model = GBMModel(("AAPL",), (0.0,), ((0.04,),))
+        with self.assertRaises(InvalidSymbolError):
+            self.acct.simulate(100, 5, model)
+        with self.assertRaises(InvalidQuantityError):
+            self.acct.simulate(0, 5, self.model)
+        with self.assertRaises(InvalidQuantityError):
+            self.acct.simulate(100, 5, self.model, confidence=1.0)
+        with self.assertRaises(ValueError):
+            GBMModel(("AAPL", "TSLA"), (0.0,), ((0.04, 0.0), (0.0, 0.04)))
+
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,100 @@
+import asyncio
+import unittest
+from http import HTTPStatus
+from urllib.parse import quote
+
+from account_store import AccountStore
+from api_server import TradingApi, serve
+
+
+class TestTradingApi(unittest.TestCase):
+    def setUp(self):
+        self.api = TradingApi(AccountStore())
+
+    def test_trading_flow_and_pagination(self):
+        self.assertEqual(self.api.handle("POST", "/accounts/alice/deposit", {"amount": "1000"})[0], HTTPStatus.OK)
+        status, body = self.api.handle("POST", "/accounts/alice/buy", {"symbol": "aapl", "quantity": "2"})
+        self.assertEqual(status, HTTPStatus.OK)
+        self.assertEqual(body["cash"], "640.00")
+
+        status, snap = self.api.handle("GET", "/accounts/alice/snapshot", {})
+        self.assertEqual(snap["equity"], "1000.00")
+        self.assertEqual(snap["holdings"], {"AAPL": "2.00000000"})
+
+        status, page = self.api.handle("GET", "/accounts/alice/transactions?limit=1", {})
+        self.assertEqual([tx["type"] for tx in page["transactions"]], ["BUY"])
+        status, page = self.api.handle("GET", f"/accounts/alice/transactions?limit=1&cursor={quote(page['next_cursor'])}", {})
+        self.assertEqual([tx["type"] for tx in page["transactions"]], ["DEPOSIT"])
+        self.assertIsNone(page["next_cursor"])
+
+    def test_errors_map_to_status_codes(self):
+        status, body = self.api.handle("POST", "/accounts/bob/withdraw", {"amount": "1"})
+        self.assertEqual(status, HTTPStatus.BAD_REQUEST)
+        self.assertEqual(body["type"], "InsufficientFundsError")
+        self.assertEqual(self.api.handle("GET", "/accounts/bob/transactions?limit=0", {})[0], HTTPStatus.BAD_REQUEST)
+        self.assertEqual(self.api.handle("GET", "/nowhere", {})[0], HTTPStatus.NOT_FOUND)
+        self.assertEqual(self.api.handle("DELETE", "/accounts/bob/snapshot", {})[0], HTTPStatus.NOT_FOUND)
+
+    def test_non_finite_amounts_are_bad_requests(self):
+        for amount in ("NaN", "Infinity", "1e400", 1e400):
+            status, body = self.api.handle("POST", "/accounts/carol/deposit", {"amount": amount})
+            self.assertEqual(status, HTTPStatus.BAD_REQUEST, amount)
+            self.assertEqual(body["type"], "InvalidQuantityError")
+        status, _ = self.api.handle("POST", "/accounts/carol/buy", {"symbol": "AAPL", "quantity": "-Infinity"})
+        self.assertEqual(status, HTTPStatus.BAD_REQUEST)
+
+
+class TestServer(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = await serve(TradingApi(AccountStore()), "127.0.0.1", 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def asyncTearDown(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _exchange(self, request: bytes) -> bytes:
+        reader, writer = await asyncio.open_connection("127.0.0.1", self.port)
+        try:
+            writer.write(request)
+            await writer.drain()
+            return await asyncio.wait_for(reader.read(), 5)
+        finally:
+            writer.close()
+
+    async def test_deposit_over_http(self):
+        body = b'{"amount": "25"}'
+        reply = await self._exchange(
+            b"POST /accounts/dave/deposit HTTP/1.1\r\nConnection: close\r\n"
+            + f"Content-Length: {len(body)}\r\n\r\n".encode()
+            + body
+        )
+        self.assertTrue(reply.startswith(b"HTTP/1.1 200 "), reply)
+        self.assertIn(b'"cash":"25.00"', reply)
+
+    async def test_invalid_content_length_is_rejected(self):
+        for value in (b"abc", b"-5", b"1.5"):
+            reply = await self._exchange(b"POST /accounts/dave/deposit HTTP/1.1\r\nContent-Length: " + value + b"\r\n\r\n")
+            self.assertTrue(reply.startswith(b"HTTP/1.1 400 "), reply)
+
+    async def test_non_finite_amount_keeps_the_connection_usable(self):
+        reader, writer = await asyncio.open_connection("127.0.0.1", self.port)
+        try:
+            for amount, expected in ((b'"NaN"', b"HTTP/1.1 400 "), (b'"5"', b"HTTP/1.1 200 ")):
+                body = b'{"amount": ' + amount + b"}"
+                writer.write(
+                    b"POST /accounts/erin/deposit HTTP/1.1\r\n"
+                    + f"Content-Length: {len(body)}\r\n\r\n".encode()
+                    + body
+                )
+                await writer.drain()
+                head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), 5)
+                self.assertTrue(head.startswith(expected), head)
+                length = int(head.lower().split(b"content-length: ")[1].split(b"\r\n")[0])
+                await reader.readexactly(length)
+        finally:
+            writer.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
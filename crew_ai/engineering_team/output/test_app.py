@@ -0,0 +1,89 @@
+import unittest
+
+import accounts
+
+try:
+    import numpy as np
+
+    import app
+except ImportError:  # pragma: no cover - the UI needs gradio, numpy and pandas
+    app = None
+
+
+@unittest.skipUnless(app is not None, "app.py needs gradio, numpy and pandas")
+class TestLttb(unittest.TestCase):
+    def test_small_inputs_pass_through(self):
+        xs = np.arange(10, dtype=np.float64)
+        ys = xs * 2
+        self.assertEqual(app._lttb(xs, ys, 10).tolist(), list(range(10)))
+        self.assertEqual(app._lttb(xs, ys, 50).tolist(), list(range(10)))
+        # Fewer than 3 buckets can't keep both endpoints plus a point, so nothing is dropped.
+        self.assertEqual(app._lttb(xs, ys, 2).tolist(), list(range(10)))
+
+    def test_output_size_endpoints_and_order(self):
+        rnd = np.random.default_rng(0)
+        xs = np.arange(5000, dtype=np.float64)
+        ys = rnd.standard_normal(5000).cumsum()
+        keep = app._lttb(xs, ys, 400)
+        self.assertEqual(len(keep), 400)
+        self.assertEqual(keep[0], 0)
+        self.assertEqual(keep[-1], 4999)
+        self.assertTrue(np.all(np.diff(keep) > 0))
+
+    def test_keeps_an_isolated_spike(self):
+        xs = np.arange(1000, dtype=np.float64)
+        ys = np.zeros(1000)
+        ys[537] = 100.0
+        self.assertIn(537, app._lttb(xs, ys, 20).tolist())
+
+    def test_equity_chart_is_downsampled_to_the_point_budget(self):
+        acct = app.Account("chart")
+        for _ in range(app.EQUITY_CHART_POINTS + 300):
+            acct.deposit("1")
+        curve = list(acct.iter_equity_curve())
+        chart = app._compute_equity_chart(acct)
+        self.assertEqual(len(chart), app.EQUITY_CHART_POINTS)
+        self.assertEqual(chart["equity"].iloc[0], float(curve[0][1]))
+        self.assertEqual(chart["equity"].iloc[-1], float(curve[-1][1]))
+
+
+@unittest.skipUnless(app is not None, "app.py needs gradio, numpy and pandas")
+class TestViewCache(unittest.TestCase):
+    def setUp(self):
+        app.VIEW_CACHE.clear()
+        self.addCleanup(app.VIEW_CACHE.clear)
+        self.acct = app.Account("cache")
+        self.acct.deposit("1000")
+        self.acct.buy("AAPL", "1")
+
+    def test_view_is_served_from_cache_until_the_ledger_changes(self):
+        first = app._build_snapshot(self.acct)
+        self.assertIs(app._build_snapshot(self.acct), first)
+        self.assertEqual((app.VIEW_CACHE.hits, app.VIEW_CACHE.misses), (1, 1))
+
+        self.acct.buy("AAPL", "1")
+        second = app._build_snapshot(self.acct)
+        self.assertEqual(app.VIEW_CACHE.misses, 2)
+        self.assertNotEqual(second, first)
+
+    def test_price_change_invalidates_price_dependent_views(self):
+        holdings = app._holdings_table(self.acct)
+        page = app._transactions_page(self.acct, 50, "ALL", "ALL", None)
+        try:
+            accounts.set_share_price("AAPL", 200)
+            repriced = app._holdings_table(self.acct)
+            self.assertIsNot(repriced, holdings)
+            self.assertEqual(repriced[0]["price"], "200.00")
+            # Transaction rows don't depend on prices, so they stay cached.
+            self.assertIs(app._transactions_page(self.acct, 50, "ALL", "ALL", None), page)
+        finally:
+            accounts.set_share_price("AAPL", 180.00)
+
+    def test_lru_evicts_the_least_recently_used_entry(self):
+        cache = app._ViewCache(max_entries=2)
+        cache.get_or_compute("a", lambda: 1)
+        cache.get_or_compute("b", lambda: 2)
+        cache.get_or_compute("a", lambda: 0)
+        cache.get_or_compute("c", lambda: 3)
+        self.assertEqual(cache.get_or_compute("a", lambda: 0), 1)
+        self.assertEqual(cache.get_or_compute("b", lambda: 20), 20)
@@ -0,0 +1,59 @@
+import csv
+import io
+import json
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+
+from accounts import Account
+from exporters import (
+    COLUMNS,
+    export_columnar,
+    export_csv,
+    export_jsonl,
+    read_columnar,
+    transaction_row,
+)
+
+
+class TestExporters(unittest.TestCase):
+    def setUp(self):
+        self.acct = Account("u1")
+        self.t0 = datetime(2025, 1, 1, 10, 0, 0, tzinfo=timezone.utc)
+        self.acct.deposit("1000", timestamp=self.t0, note="café, \"quoted\"\nline")
+        self.acct.buy("AAPL", "1.5", timestamp=self.t0 + timedelta(seconds=1))
+        self.acct.buy("TSLA", "1", timestamp=self.t0 + timedelta(seconds=2))
+        self.acct.sell("AAPL", "0.5", timestamp=self.t0 + timedelta(seconds=3, microseconds=250))
+        self.expected = [transaction_row(tx) for tx in self.acct.transactions()]
+
+    def test_csv_round_trip_with_header(self):
+        buf = io.StringIO()
+        self.assertEqual(export_csv(self.acct, buf), 4)
+        buf.seek(0)
+        rows = list(csv.DictReader(buf))
+        self.assertEqual(rows, self.expected)
+
+    def test_jsonl_applies_time_and_symbol_filters(self):
+        buf = io.StringIO()
+        n = export_jsonl(self.acct, buf, start=self.t0 + timedelta(seconds=1), symbols=["AAPL"])
+        rows = [json.loads(line) for line in buf.getvalue().splitlines()]
+        self.assertEqual(n, 2)
+        self.assertEqual([r["type"] for r in rows], ["BUY", "SELL"])
+        self.assertEqual(rows[1]["quantity"], "0.50000000")
+
+    def test_columnar_round_trip_across_chunks(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "tx.col")
+            self.assertEqual(export_columnar(self.acct, path, chunk_rows=3), 4)
+            rows = list(read_columnar(path))
+        self.assertEqual(rows, self.expected)
+        self.assertEqual(list(rows[0].keys()), list(COLUMNS))
+
+    def test_columnar_rejects_foreign_files(self):
+        with self.assertRaises(ValueError):
+            list(read_columnar(io.BytesIO(b"not columnar")))
+
+
+if __name__ == "__main__":
+    unittest.main()
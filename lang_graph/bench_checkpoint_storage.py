@@ -0,0 +1,109 @@
+"""Checkpoint storage benchmark: DB size and write latency per step, no LLM.
+
+Runs `--threads` conversations of `--turns` turns each through the two-node
+echo graph from bench_checkpointer.py and compares:
+  full     PooledSqliteSaver: every checkpoint stores the whole message list
+  delta    CompactingSqliteSaver: message deltas with a full base every --full-every steps
+  retained CompactingSqliteSaver with keep_last=--keep-last, vacuumed as it goes
+DB size is the main file after a WAL checkpoint; latency is per `aput` call.
+    python bench_checkpoint_storage.py --turns 100 --threads 4 --message-bytes 500
+"""
+
+import argparse
+import asyncio
+import os
+import sqlite3
+import tempfile
+import time
+
+from bench_checkpointer import graph_builder
+from compacting_checkpointer import CompactingSqliteSaver
+from sqlite_checkpointer import PooledSqliteSaver
+
+
+def _percentile(sorted_values: list[float], pct: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))]
+
+
+def _db_size(path: str) -> int:
+    with sqlite3.connect(path) as conn:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    return os.path.getsize(path)
+
+
+async def _run(saver, path: str, args: argparse.Namespace) -> dict:
+    latencies: list[float] = []
+    aput = saver.aput
+
+    async def timed_aput(*a, **kw):
+        start = time.perf_counter()
+        try:
+            return await aput(*a, **kw)
+        finally:
+            latencies.append(time.perf_counter() - start)
+
+    saver.aput = timed_aput
+    graph = graph_builder.compile(checkpointer=saver)
+    sizes = []
+    text = "x" * args.message_bytes
+    for turn in range(1, args.turns + 1):
+        await asyncio.gather(
+            *(
+                graph.ainvoke(
+                    {"messages": [{"role": "user", "content": f"{turn} {text}"}]},
+                    config={"configurable": {"thread_id": f"t{n}"}},
+                )
+                for n in range(args.threads)
+            )
+        )
+        if turn % max(1, args.turns // 4) == 0:
+            if isinstance(saver, CompactingSqliteSaver):
+                await saver.avacuum()
+            sizes.append((turn, _db_size(path)))
+    # History must still be complete (or hold exactly what retention keeps).
+    history = [s async for s in graph.aget_state_history({"configurable": {"thread_id": "t0"}})]
+    assert len(history[0].values["messages"]) == 2 * args.turns
+    latencies.sort()
+    return {
+        "sizes": sizes,
+        "history": len(history),
+        "p50_ms": _percentile(latencies, 50) * 1000,
+        "p99_ms": _percentile(latencies, 99) * 1000,
+        "mean_ms": sum(latencies) / len(latencies) * 1000,
+    }
+
+
+async def main(args: argparse.Namespace) -> None:
+    variants = [
+        ("full", PooledSqliteSaver, {}),
+        ("delta", CompactingSqliteSaver, {"full_every": args.full_every, "vacuum_interval": None}),
+        (
+            "retained",
+            CompactingSqliteSaver,
+            {"full_every": args.full_every, "keep_last": args.keep_last, "vacuum_interval": None},
+        ),
+    ]
+    with tempfile.TemporaryDirectory() as tmp:
+        rows = []
+        for name, cls, options in variants:
+            path = os.path.join(tmp, f"{name}.db")
+            async with cls.from_path(path, **options) as saver:
+                rows.append((name, await _run(saver, path, args)))
+        turns = [turn for turn, _ in rows[0][1]["sizes"]]
+        header = " ".join(f"{f'KiB@{t}':>10}" for t in turns)
+        print(f"{'storage':>9} {header} {'history':>8} {'put p50':>8} {'put p99':>8} {'put mean':>9}")
+        for name, row in rows:
+            sizes = " ".join(f"{size / 1024:>10.0f}" for _, size in row["sizes"])
+            print(
+                f"{name:>9} {sizes} {row['history']:>8} {row['p50_ms']:>8.2f} {row['p99_ms']:>8.2f} {row['mean_ms']:>9.2f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Checkpoint DB size and write latency per step")
+    parser.add_argument("--turns", type=int, default=100, help="turns per conversation")
+    parser.add_argument("--threads", type=int, default=4, help="concurrent conversations")
+    parser.add_argument("--message-bytes", type=int, default=500, help="size of each user message")
+    parser.add_argument("--full-every", type=int, default=16, help="full checkpoint every N steps")
+    parser.add_argument("--keep-last", type=int, default=20, help="checkpoints kept per thread when retained")
+    asyncio.run(main(parser.parse_args()))
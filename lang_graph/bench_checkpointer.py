@@ -0,0 +1,101 @@
+"""Load test for the SQLite checkpointers: many concurrent thread_ids, no LLM.
+
+Each conversation thread runs `--turns` turns through a two-node graph (an echo
+"chatbot" plus a bookkeeping node) so every turn writes several checkpoints, the
+way the real chatbot does. Throughput and per-turn latency are reported for the
+stock `AsyncSqliteSaver` (one connection, one lock, a commit per write) and for
+`PooledSqliteSaver` at each concurrency level:
+    python bench_checkpointer.py --threads 1,10,100,500 --turns 5
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from typing import Annotated, TypedDict
+
+from langchain_core.messages import AIMessage
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+from langgraph.graph import END, START, StateGraph
+from langgraph.graph.message import add_messages
+
+from sqlite_checkpointer import PooledSqliteSaver
+
+
+class State(TypedDict):
+    messages: Annotated[list, add_messages]
+    turns: int
+
+
+def echo_node(state: State) -> dict:
+    return {"messages": [AIMessage(content=f"echo: {state['messages'][-1].content}")]}
+
+
+def count_node(state: State) -> dict:
+    return {"turns": state.get("turns", 0) + 1}
+
+
+graph_builder = StateGraph(State)
+graph_builder.add_node("chatbot", echo_node)
+graph_builder.add_node("count", count_node)
+graph_builder.add_edge(START, "chatbot")
+graph_builder.add_edge("chatbot", "count")
+graph_builder.add_edge("count", END)
+
+
+def _percentile(sorted_values: list[float], pct: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))]
+
+
+async def _run(saver, threads: int, turns: int, prefix: str) -> dict:
+    graph = graph_builder.compile(checkpointer=saver)
+    latencies: list[float] = []
+
+    async def conversation(n: int) -> None:
+        config = {"configurable": {"thread_id": f"{prefix}-{n}"}}
+        for turn in range(turns):
+            start = time.perf_counter()
+            await graph.ainvoke({"messages": [{"role": "user", "content": f"turn {turn}"}]}, config=config)
+            latencies.append(time.perf_counter() - start)
+        # The last turn must be readable back with the whole conversation.
+        state = await graph.aget_state(config)
+        assert len(state.values["messages"]) == 2 * turns, state.values
+
+    started = time.perf_counter()
+    await asyncio.gather(*(conversation(n) for n in range(threads)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "turns_per_s": len(latencies) / elapsed,
+        "p50_ms": _percentile(latencies, 50) * 1000,
+        "p99_ms": _percentile(latencies, 99) * 1000,
+    }
+
+
+async def main(args: argparse.Namespace) -> None:
+    levels = [int(x) for x in args.threads.split(",")]
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'threads':>8} {'saver':>8} {'turns/s':>10} {'p50 ms':>9} {'p99 ms':>9} {'writes/commit':>14}")
+        for threads in levels:
+            stock_db = os.path.join(tmp, f"stock-{threads}.db")
+            async with AsyncSqliteSaver.from_conn_string(stock_db) as saver:
+                row = await _run(saver, threads, args.turns, "stock")
+            print(
+                f"{threads:>8} {'stock':>8} {row['turns_per_s']:>10.1f} {row['p50_ms']:>9.2f} {row['p99_ms']:>9.2f} {1:>14.1f}"
+            )
+            pooled_db = os.path.join(tmp, f"pooled-{threads}.db")
+            async with PooledSqliteSaver.from_path(pooled_db, readers=args.readers) as saver:
+                row = await _run(saver, threads, args.turns, "pooled")
+                per_commit = saver.batched_writes / max(saver.batches, 1)
+            print(
+                f"{threads:>8} {'pooled':>8} {row['turns_per_s']:>10.1f} {row['p50_ms']:>9.2f} {row['p99_ms']:>9.2f} {per_commit:>14.1f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent thread_id load test for the SQLite checkpointers")
+    parser.add_argument("--threads", default="1,10,100,300", help="comma-separated concurrent thread_id counts")
+    parser.add_argument("--turns", type=int, default=5, help="turns per thread")
+    parser.add_argument("--readers", type=int, default=4, help="read connections in the pooled saver")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,389 @@
+"""Delta-encoded checkpoint storage with retention and background vacuum.
+
+Every super-step checkpoint carries the full value of every channel, so with
+`add_messages` a conversation of n messages stores O(n^2) messages in total.
+`CompactingSqliteSaver` builds on `PooledSqliteSaver` and changes three things:
+
+- Delta encoding. When a list channel (such as `messages`) in a checkpoint
+  starts with the parent checkpoint's list, only the appended tail is stored,
+  together with the parent id and the prefix length. Every `full_every`-th
+  checkpoint in a chain is stored in full, so rebuilding one checkpoint reads
+  at most `full_every` rows. Deltas are only written against a parent this
+  process wrote or read recently (an in-memory LRU); anything else is stored
+  in full.
+- Retention. With `keep_last`, only the newest N checkpoints of each thread
+  (and namespace) are kept, plus any tagged with `atag_checkpoint`. A kept
+  delta whose base is pruned is rewritten in full first, so every kept
+  checkpoint still decodes and `get_state_history` keeps working.
+- Background vacuum. Every `vacuum_interval` seconds the threads written since
+  the last pass are pruned, free pages are returned with `incremental_vacuum`
+  and the WAL is truncated.
+
+Delta rows use a `delta:<serde type>` type, so a database written by this saver
+can only be read back through it (or `PooledSqliteSaver` on files that contain
+no deltas).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections import Counter, OrderedDict
+from collections.abc import Sequence
+from typing import Any
+
+import aiosqlite
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import Checkpoint, ChannelVersions, CheckpointMetadata
+
+from sqlite_checkpointer import CHECKPOINT_COLUMNS, SCHEMA, PooledSqliteSaver
+
+TAGS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoint_tags (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    tag TEXT NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, tag)
+);
+"""
+
+DELTA_PREFIX = "delta:"
+DEFAULT_FULL_EVERY = 16
+DEFAULT_VACUUM_INTERVAL = 30.0
+DEFAULT_RECENT_CHECKPOINTS = 1024
+VACUUM_PAGES = 4096
+
+logger = logging.getLogger(__name__)
+
+# (thread_id, checkpoint_ns, checkpoint_id)
+_Key = tuple[str, str, str]
+
+
+def _shares_prefix(prefix: list, values: list) -> bool:
+    if len(prefix) > len(values):
+        return False
+    return all(a is b or a == b for a, b in zip(prefix, values))
+
+
+class CompactingSqliteSaver(PooledSqliteSaver):
+    """`PooledSqliteSaver` storing message deltas, with retention and background vacuum.
+
+    Open it with `from_path` like `PooledSqliteSaver`; the extra keyword arguments
+    are `full_every`, `keep_last` (None keeps everything), `vacuum_interval`
+    (None or 0 disables the background task) and `recent_checkpoints`.
+    """
+
+    schema = SCHEMA + TAGS_SCHEMA
+
+    def __init__(
+        self,
+        writer: aiosqlite.Connection,
+        readers: Sequence[aiosqlite.Connection],
+        *,
+        full_every: int = DEFAULT_FULL_EVERY,
+        keep_last: int | None = None,
+        vacuum_interval: float | None = DEFAULT_VACUUM_INTERVAL,
+        recent_checkpoints: int = DEFAULT_RECENT_CHECKPOINTS,
+        **kwargs: Any,
+    ) -> None:
+        if full_every < 1:
+            raise ValueError("full_every must be at least 1")
+        if keep_last is not None and keep_last < 1:
+            raise ValueError("keep_last must be at least 1")
+        super().__init__(writer, readers, **kwargs)
+        self.full_every = full_every
+        self.keep_last = keep_last
+        self.vacuum_interval = vacuum_interval
+        self.recent_checkpoints = recent_checkpoints
+        # key -> (chain depth, channel values) of checkpoints written or read recently.
+        self._recent: OrderedDict[_Key, tuple[int, dict[str, Any]]] = OrderedDict()
+        # Bases of deltas that are encoded but not yet committed are never pruned.
+        self._pinned: Counter[_Key] = Counter()
+        self._pins: dict[_Key, _Key] = {}
+        self._dirty: set[tuple[str, str]] = set()
+        self._vacuum_task: asyncio.Task | None = None
+        self.full_writes = 0
+        self.delta_writes = 0
+
+    def _start(self) -> None:
+        super()._start()
+        if self.vacuum_interval:
+            self._vacuum_task = asyncio.create_task(self._vacuum_loop())
+
+    async def _stop(self) -> None:
+        task, self._vacuum_task = self._vacuum_task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        await super()._stop()
+
+    # -----------------------
+    # Encoding
+    # -----------------------
+
+    def _remember(self, key: _Key, depth: int, channel_values: dict[str, Any]) -> None:
+        self._recent[key] = (depth, {k: list(v) if isinstance(v, list) else v for k, v in channel_values.items()})
+        self._recent.move_to_end(key)
+        while len(self._recent) > self.recent_checkpoints:
+            self._recent.popitem(last=False)
+
+    def _encode_checkpoint(self, config: RunnableConfig, checkpoint: Checkpoint) -> tuple[str, bytes]:
+        thread_id = str(config["configurable"]["thread_id"])
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        key = (thread_id, checkpoint_ns, checkpoint["id"])
+        values = checkpoint["channel_values"]
+        parent_id = config["configurable"].get("checkpoint_id")
+        parent = self._recent.get((thread_id, checkpoint_ns, parent_id)) if parent_id else None
+        prefix: dict[str, int] = {}
+        if parent is not None and parent[0] + 1 < self.full_every:
+            for channel, value in values.items():
+                base = parent[1].get(channel)
+                if isinstance(value, list) and isinstance(base, list) and base and _shares_prefix(base, value):
+                    prefix[channel] = len(base)
+        if not prefix:
+            self._remember(key, 0, values)
+            self.full_writes += 1
+            return self.serde.dumps_typed(checkpoint)
+        self._remember(key, parent[0] + 1, values)
+        self._pinned[(thread_id, checkpoint_ns, parent_id)] += 1
+        self._pins[key] = (thread_id, checkpoint_ns, parent_id)
+        self.delta_writes += 1
+        tails = {channel: values[channel][n:] for channel, n in prefix.items()}
+        type_, blob = self.serde.dumps_typed(
+            {
+                "base": parent_id,
+                "depth": parent[0] + 1,
+                "prefix": prefix,
+                "checkpoint": {**checkpoint, "channel_values": {**values, **tails}},
+            }
+        )
+        return DELTA_PREFIX + type_, blob
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        """Save a checkpoint, as a delta against its parent when possible."""
+        thread_id = str(config["configurable"]["thread_id"])
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        key = (thread_id, checkpoint_ns, checkpoint["id"])
+        try:
+            saved = await super().aput(config, checkpoint, metadata, new_versions)
+        except BaseException:
+            # It may never have been written, so nothing must be stored against it.
+            self._recent.pop(key, None)
+            raise
+        finally:
+            if (parent := self._pins.pop(key, None)) is not None:
+                self._pinned[parent] -= 1
+                if not self._pinned[parent]:
+                    del self._pinned[parent]
+        self._dirty.add((thread_id, checkpoint_ns))
+        return saved
+
+    # -----------------------
+    # Decoding
+    # -----------------------
+
+    async def _decode_checkpoints(self, conn: aiosqlite.Connection, rows: Sequence[Sequence[Any]]) -> list[Checkpoint]:
+        decoded: dict[_Key, Checkpoint] = {}
+        by_key = {(row[0], row[1], row[2]): row for row in rows}
+        # Oldest first, so a delta's base is usually decoded (and memoized) before it.
+        for key in sorted(by_key, key=lambda k: k[2]):
+            await self._materialize(conn, key, by_key, decoded)
+        return [decoded[(row[0], row[1], row[2])] for row in rows]
+
+    async def _materialize(
+        self,
+        conn: aiosqlite.Connection,
+        key: _Key,
+        rows: dict[_Key, Sequence[Any]],
+        decoded: dict[_Key, Checkpoint],
+    ) -> Checkpoint:
+        if key in decoded:
+            return decoded[key]
+        row = rows.get(key)
+        if row is None:
+            async with conn.execute(
+                f"SELECT {CHECKPOINT_COLUMNS} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                key,
+            ) as cur:
+                row = await cur.fetchone()
+            if row is None:
+                raise LookupError(f"Checkpoint {key[2]} of thread {key[0]!r} is missing the base it was stored against")
+        type_, blob = row[4], row[5]
+        if not type_ or not type_.startswith(DELTA_PREFIX):
+            checkpoint = self.serde.loads_typed((type_, blob))
+            depth = 0
+        else:
+            delta = self.serde.loads_typed((type_[len(DELTA_PREFIX) :], blob))
+            base = await self._materialize(conn, (key[0], key[1], delta["base"]), rows, decoded)
+            checkpoint = delta["checkpoint"]
+            values = checkpoint["channel_values"]
+            for channel, n in delta["prefix"].items():
+                values[channel] = base["channel_values"][channel][:n] + values[channel]
+            depth = delta["depth"]
+        decoded[key] = checkpoint
+        if key not in self._recent:
+            self._remember(key, depth, checkpoint["channel_values"])
+        return checkpoint
+
+    # -----------------------
+    # Retention and vacuum
+    # -----------------------
+
+    async def atag_checkpoint(self, config: RunnableConfig, tag: str) -> None:
+        """Keep the checkpoint in `config` through retention, under `tag`."""
+        await self._write(
+            [
+                (
+                    "INSERT OR IGNORE INTO checkpoint_tags (thread_id, checkpoint_ns, checkpoint_id, tag) VALUES (?, ?, ?, ?)",
+                    [
+                        (
+                            str(config["configurable"]["thread_id"]),
+                            config["configurable"].get("checkpoint_ns", ""),
+                            config["configurable"]["checkpoint_id"],
+                            tag,
+                        )
+                    ],
+                )
+            ]
+        )
+
+    async def auntag_checkpoint(self, config: RunnableConfig, tag: str) -> None:
+        """Drop `tag` from the checkpoint in `config`; retention may then prune it."""
+        await self._write(
+            [
+                (
+                    "DELETE FROM checkpoint_tags WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? AND tag = ?",
+                    [
+                        (
+                            str(config["configurable"]["thread_id"]),
+                            config["configurable"].get("checkpoint_ns", ""),
+                            config["configurable"]["checkpoint_id"],
+                            tag,
+                        )
+                    ],
+                )
+            ]
+        )
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        """Delete all checkpoints, writes and tags for `thread_id`."""
+        await super().adelete_thread(thread_id)
+        await self._write([("DELETE FROM checkpoint_tags WHERE thread_id = ?", [(str(thread_id),)])])
+        for key in [k for k in self._recent if k[0] == str(thread_id)]:
+            del self._recent[key]
+
+    async def aprune(self, thread_id: str | None = None) -> int:
+        """Apply `keep_last` to one thread, or to every thread written since the last prune.
+
+        Returns the number of checkpoints deleted.
+        """
+        if self.keep_last is None:
+            return 0
+        if thread_id is None:
+            targets, self._dirty = self._dirty, set()
+        else:
+            async with self._reader() as conn:
+                async with conn.execute(
+                    "SELECT DISTINCT checkpoint_ns FROM checkpoints WHERE thread_id = ?", (str(thread_id),)
+                ) as cur:
+                    targets = {(str(thread_id), ns) for (ns,) in await cur.fetchall()}
+        deleted = 0
+        pending = sorted(targets)
+        while pending:
+            try:
+                async with self.lock:
+                    deleted += await self._prune_thread(*pending[0])
+            except BaseException:
+                if thread_id is None:
+                    # Leave the unprocessed threads for the next pass.
+                    self._dirty.update(pending)
+                raise
+            pending.pop(0)
+        return deleted
+
+    async def _prune_thread(self, thread_id: str, checkpoint_ns: str) -> int:
+        conn = self.conn
+        async with conn.execute(
+            f"SELECT {CHECKPOINT_COLUMNS} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? ORDER BY checkpoint_id DESC",
+            (thread_id, checkpoint_ns),
+        ) as cur:
+            rows = await cur.fetchall()
+        async with conn.execute(
+            "SELECT checkpoint_id FROM checkpoint_tags WHERE thread_id = ? AND checkpoint_ns = ?",
+            (thread_id, checkpoint_ns),
+        ) as cur:
+            tagged = {checkpoint_id for (checkpoint_id,) in await cur.fetchall()}
+        keep = {row[2] for row in rows[: self.keep_last]} | tagged
+        keep |= {key[2] for key in self._pinned if key[:2] == (thread_id, checkpoint_ns)}
+        drop = [row[2] for row in rows if row[2] not in keep]
+        if not drop:
+            return 0
+        dropped = set(drop)
+        by_key = {(row[0], row[1], row[2]): row for row in rows}
+        rebased = []
+        for row in rows:
+            if row[2] in keep and row[4] and row[4].startswith(DELTA_PREFIX):
+                delta = self.serde.loads_typed((row[4][len(DELTA_PREFIX) :], row[5]))
+                if delta["base"] in dropped:
+                    checkpoint = await self._materialize(conn, (row[0], row[1], row[2]), by_key, {})
+                    rebased.append((*self.serde.dumps_typed(checkpoint), thread_id, checkpoint_ns, row[2]))
+                    self._recent.pop((thread_id, checkpoint_ns, row[2]), None)
+        try:
+            await conn.execute("BEGIN IMMEDIATE")
+            # An `aput` may have encoded a delta against a dropped checkpoint while the
+            # rows were read. Such bases are pinned until the delta commits, which can't
+            # happen while we hold the lock, so drop only what is still unpinned, and
+            # forget it in the same step so no later delta is encoded against it.
+            pinned = {key[2] for key in self._pinned if key[:2] == (thread_id, checkpoint_ns)}
+            params = [(thread_id, checkpoint_ns, checkpoint_id) for checkpoint_id in drop if checkpoint_id not in pinned]
+            for key in params:
+                self._recent.pop(key, None)
+            await conn.executemany(
+                "UPDATE checkpoints SET type = ?, checkpoint = ? WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                rebased,
+            )
+            await conn.executemany(
+                "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?", params
+            )
+            await conn.executemany(
+                "DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?", params
+            )
+            await conn.execute("COMMIT")
+        except Exception:
+            if conn.in_transaction:
+                await conn.execute("ROLLBACK")
+            raise
+        return len(params)
+
+    async def avacuum(self) -> int:
+        """Prune threads written since the last pass, release free pages and truncate the WAL.
+
+        Returns the number of checkpoints deleted.
+        """
+        deleted = await self.aprune()
+        async with self.lock:
+            # incremental_vacuum frees one page per step; executescript steps it to completion.
+            await self.conn.executescript(f"PRAGMA incremental_vacuum({VACUUM_PAGES});")
+            await self.conn.execute_fetchall("PRAGMA wal_checkpoint(TRUNCATE)")
+        return deleted
+
+    async def _vacuum_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.vacuum_interval)
+            try:
+                await self.avacuum()
+            except aiosqlite.Error as e:
+                # Busy or locked by another process; try again next interval.
+                logger.debug("Checkpoint vacuum skipped, retrying next interval: %s", e)
+            except Exception:
+                logger.exception("Checkpoint vacuum failed, retrying next interval")
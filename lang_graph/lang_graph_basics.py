@@ -1,10 +1,11 @@
-from typing import Annotated
+from typing import Annotated, Optional
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
 import gradio as gr
 from langchain_openai import ChatOpenAI
 from pydantic import BaseModel
 from helper_utils import base_url, api_key
+from message_window import HistoryWindow
 
 model = ChatOpenAI(
     model="gpt-5-mini",
@@ -16,23 +17,31 @@ model = ChatOpenAI(
 
 class State(BaseModel):
     messages: Annotated[list, add_messages]
+    # Rolling summary of the turns HistoryWindow has folded out of `messages`
+    summary: Optional[str] = None
 
 
 # Step 2: Start the Graph Builder with this State class
 graph_builder = StateGraph(State)
 
 
+# Keep the history sent to the model within a token budget
+history = HistoryWindow(model)
+
+
 def chatbot_node(old_state: State) -> State:
-    response = model.invoke(old_state.messages)
+    response = model.invoke(history.messages(old_state))
     new_state = State(messages=[response])
     return new_state
 
 
+graph_builder.add_node("summarize", history.node)
 graph_builder.add_node("chatbot", chatbot_node)
 
 
 # Step 4: Create Edges
-graph_builder.add_edge(START, "chatbot")
+graph_builder.add_edge(START, "summarize")
+graph_builder.add_edge("summarize", "chatbot")
 graph_builder.add_edge("chatbot", END)
 
 # Step 5: Compile the Graph
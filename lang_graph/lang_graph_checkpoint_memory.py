@@ -7,13 +7,16 @@ from langchain_openai import ChatOpenAI
 from langchain_community.utilities import GoogleSerperAPIWrapper
 from langchain_core.tools import Tool
 from dotenv import load_dotenv
-import sqlite3
-from langgraph.checkpoint.sqlite import SqliteSaver
+from compacting_checkpointer import CompactingSqliteSaver
+from message_window import HistoryWindow
 
 
 from helper_utils import base_url, api_key
 import requests
+import argparse
+import asyncio
 import os
+import uuid
 
 from typing import TypedDict
 
@@ -66,6 +69,8 @@ agent_tools = [search_tool, push_tool]
 # Step 1: Define the State Object
 class State(TypedDict):
     messages: Annotated[list[dict], add_messages]
+    # Rolling summary of the turns HistoryWindow has folded out of `messages`
+    summary: str
 
 
 # Step 2: start the graph builder with this State Class
@@ -82,12 +87,16 @@ model = ChatOpenAI(
 # Add the tools to the model
 model_with_tools = model.bind_tools(agent_tools)
 
+# Keep the history sent to the model within a token budget
+history = HistoryWindow(model)
+
 
 # Step 3: Create a Node
 def chatbot_node(state: State) -> State:
-    return {"messages": [model_with_tools.invoke(state["messages"])]}
+    return {"messages": [model_with_tools.invoke(history.messages(state))]}
 
 
+graph_builder.add_node("summarize", history.node)
 graph_builder.add_node("chatbot", chatbot_node)
 graph_builder.add_node("agent_tools", ToolNode(tools=agent_tools))
 
@@ -98,72 +107,92 @@ graph_builder.add_conditional_edges(
 
 # Any time a tool is called, we return to the chatbot to decide the next step
 graph_builder.add_edge("agent_tools", "chatbot")
-graph_builder.add_edge(START, "chatbot")
+graph_builder.add_edge(START, "summarize")
+graph_builder.add_edge("summarize", "chatbot")
 
 # Compile the graph with Memory Saver
 # graph = graph_builder.compile(checkpointer=MemorySaver())
-# Connect to a SQLite database for checkpointing
+# Checkpoints go to SQLite through CompactingSqliteSaver: WAL mode, a pool of read
+# connections and group-committed writes, so concurrent threads don't serialize
+# on one shared connection. Messages are stored as deltas and only the newest
+# checkpoints per thread are kept, so the database can persist between runs.
+# It is async, so the graph is compiled inside main().
 db_path = "langgraph_checkpoint_memory.db"
-# Remove existing database to start fresh
-if os.path.exists(db_path):
-    os.remove(db_path)
-conn = sqlite3.connect(db_path, check_same_thread=False)
-sql_memory = SqliteSaver(conn)
-graph = graph_builder.compile(checkpointer=sql_memory)
+keep_last_checkpoints = 50
 
-# Configuration
-config = {"configurable": {"thread_id": "3"}}
 
-# Test the chatbot
-if __name__ == "__main__":
+async def main(thread_id: str) -> None:
+    # Configuration: the database outlives the run, so each run starts a new thread
+    # unless --thread-id picks up an earlier conversation.
+    config = {"configurable": {"thread_id": thread_id}}
+
     # Create output directory
     output_dir = "output"
     os.makedirs(output_dir, exist_ok=True)
 
-    # Open output file for writing
-    output_file = os.path.join(output_dir, "chatbot_output.txt")
-    with open(output_file, "w", encoding='utf-8') as f:
-        f.write("Testing LangGraph Chatbot with SQLite Checkpointing\n\n")
-
-        # Test message 1
-        user_input = "What is the weather in San Francisco?"
-        f.write(f"User: {user_input}\n")
-        result = graph.invoke(
-            {"messages": [{"role": "user", "content": user_input}]}, config=config
-        )
-        f.write(f"Assistant: {result['messages'][-1].content}\n\n")
-
-        # Test message 2
-        user_input2 = "Can you send me a notification with the current weather in jacksonville, Florida?"
-        f.write(f"User: {user_input2}\n")
-        result = graph.invoke(
-            {"messages": [{"role": "user", "content": user_input2}]}, config=config
-        )
-        f.write(f"Assistant: {result['messages'][-1].content}\n\n")
-        
-        # Test message 3
-        user_input3 = "Can you resend me the notification again?"
-        f.write(f"User: {user_input3}\n")
-        result = graph.invoke(
-            {"messages": [{"role": "user", "content": user_input3}]}, config=config
-        )
-        f.write(f"Assistant: {result['messages'][-1].content}\n\n")
-
-        # Check state history
-        f.write("State History:\n")
-        f.write("=" * 80 + "\n")
-        for i, state in enumerate(graph.get_state_history(config=config), 1):
-            f.write(f"\nState {i}:\n")
-            f.write(
-                f"  Checkpoint ID: {state.config['configurable']['checkpoint_id']}\n"
+    async with CompactingSqliteSaver.from_path(
+        db_path, keep_last=keep_last_checkpoints
+    ) as sql_memory:
+        graph = graph_builder.compile(checkpointer=sql_memory)
+
+        # Open output file for writing
+        output_file = os.path.join(output_dir, "chatbot_output.txt")
+        with open(output_file, "w", encoding='utf-8') as f:
+            f.write("Testing LangGraph Chatbot with SQLite Checkpointing\n\n")
+
+            # Test message 1
+            user_input = "What is the weather in San Francisco?"
+            f.write(f"User: {user_input}\n")
+            result = await graph.ainvoke(
+                {"messages": [{"role": "user", "content": user_input}]}, config=config
+            )
+            f.write(f"Assistant: {result['messages'][-1].content}\n\n")
+
+            # Test message 2
+            user_input2 = "Can you send me a notification with the current weather in jacksonville, Florida?"
+            f.write(f"User: {user_input2}\n")
+            result = await graph.ainvoke(
+                {"messages": [{"role": "user", "content": user_input2}]}, config=config
             )
-            f.write(f"  Messages: {len(state.values.get('messages', []))}\n")
-            for j, msg in enumerate(state.values.get("messages", []), 1):
-                role = getattr(msg, "type", "unknown")
-                content = getattr(msg, "content", "")
+            f.write(f"Assistant: {result['messages'][-1].content}\n\n")
+            
+            # Test message 3
+            user_input3 = "Can you resend me the notification again?"
+            f.write(f"User: {user_input3}\n")
+            result = await graph.ainvoke(
+                {"messages": [{"role": "user", "content": user_input3}]}, config=config
+            )
+            f.write(f"Assistant: {result['messages'][-1].content}\n\n")
+
+            # Check state history
+            f.write("State History:\n")
+            f.write("=" * 80 + "\n")
+            i = 0
+            async for state in graph.aget_state_history(config=config):
+                i += 1
+                f.write(f"\nState {i}:\n")
                 f.write(
-                    f"    Message {j} [{role}]: {content[:100]}{'...' if len(str(content)) > 100 else ''}\n"
+                    f"  Checkpoint ID: {state.config['configurable']['checkpoint_id']}\n"
                 )
-            f.write("-" * 80 + "\n")
+                f.write(f"  Messages: {len(state.values.get('messages', []))}\n")
+                for j, msg in enumerate(state.values.get("messages", []), 1):
+                    role = getattr(msg, "type", "unknown")
+                    content = getattr(msg, "content", "")
+                    f.write(
+                        f"    Message {j} [{role}]: {content[:100]}{'...' if len(str(content)) > 100 else ''}\n"
+                    )
+                f.write("-" * 80 + "\n")
+
+    print(f"Output written to {output_file} (thread {thread_id})")
+
 
-    print(f"Output written to {output_file}")
+# Test the chatbot
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="LangGraph chatbot with SQLite checkpointing")
+    parser.add_argument(
+        "--thread-id",
+        default=None,
+        help="Conversation to continue; a new thread is started when omitted.",
+    )
+    args = parser.parse_args()
+    asyncio.run(main(args.thread_id or uuid.uuid4().hex))
@@ -0,0 +1,139 @@
+"""Token-budgeted message window with a rolling summary, for the LangGraph examples.
+
+Sending the whole `messages` history on every turn makes each call slower and
+more expensive than the last. `HistoryWindow` keeps it bounded:
+
+- `HistoryWindow.node` is a graph node to run before the chatbot. Once the
+  messages in state pass `max_tokens`, it folds the oldest turns into the
+  `summary` state field and removes them from state (with `RemoveMessage`),
+  leaving at most `keep_tokens` of recent turns. Only the evicted messages and
+  the previous summary go to the model, so the summary is extended
+  incrementally instead of being rebuilt from the whole conversation.
+- `HistoryWindow.messages` is what the chatbot node sends to the model: the
+  summary as a system message, followed by the window.
+
+The window is only ever cut right before a human message, so a tool call is
+never separated from its results. The state needs a `summary: str` field next
+to `messages`:
+    history = HistoryWindow(model, max_tokens=4000, keep_tokens=2000)
+    graph_builder.add_node("summarize", history.node)
+    graph_builder.add_edge(START, "summarize")
+    graph_builder.add_edge("summarize", "chatbot")
+    def chatbot_node(state):
+        return {"messages": [model.invoke(history.messages(state))]}
+"""
+
+from __future__ import annotations
+
+from collections.abc import Callable, Sequence
+from typing import Any
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, RemoveMessage, SystemMessage
+from langchain_core.messages.utils import count_tokens_approximately
+
+DEFAULT_MAX_TOKENS = 4000
+DEFAULT_KEEP_TOKENS = 2000
+
+SUMMARY_INSTRUCTIONS = (
+    "You maintain a running summary of a conversation between a user and an assistant. "
+    "Extend the existing summary with the new messages. Keep facts, names, numbers, decisions, "
+    "open questions and tool results that later turns may need; drop small talk. "
+    "Reply with the updated summary only."
+)
+
+
+def _field(state: Any, name: str, default: Any = None) -> Any:
+    """Read a state field from either a TypedDict state or a pydantic state."""
+    if isinstance(state, dict):
+        return state.get(name, default)
+    return getattr(state, name, default)
+
+
+def _transcript(messages: Sequence[BaseMessage]) -> str:
+    lines = []
+    for message in messages:
+        text = message.text
+        if isinstance(message, AIMessage) and message.tool_calls:
+            calls = ", ".join(f"{call['name']}({call['args']})" for call in message.tool_calls)
+            text = f"{text}\n[called {calls}]" if text else f"[called {calls}]"
+        lines.append(f"{message.type}: {text}")
+    return "\n".join(lines)
+
+
+class HistoryWindow:
+    """Keeps the chat history sent to the model within a token budget.
+
+    Args:
+        model: Chat model used to write the summary (no tools needed).
+        max_tokens: Summarize once the messages in state exceed this many tokens.
+        keep_tokens: Most tokens of recent turns kept after summarizing. The
+            current turn is always kept, even if it is larger.
+        token_counter: Counts the tokens of a list of messages. The default
+            approximation needs no tokenizer; pass the model's own counter
+            for exact budgets.
+    """
+
+    def __init__(
+        self,
+        model: BaseChatModel,
+        *,
+        max_tokens: int = DEFAULT_MAX_TOKENS,
+        keep_tokens: int = DEFAULT_KEEP_TOKENS,
+        token_counter: Callable[[Sequence[BaseMessage]], int] = count_tokens_approximately,
+    ) -> None:
+        if not 0 < keep_tokens <= max_tokens:
+            raise ValueError("keep_tokens must be positive and no larger than max_tokens")
+        self.model = model
+        self.max_tokens = max_tokens
+        self.keep_tokens = keep_tokens
+        self.token_counter = token_counter
+
+    def messages(self, state: Any) -> list[BaseMessage]:
+        """The model input: the rolling summary (if any) followed by the window."""
+        messages = list(_field(state, "messages", []))
+        summary = _field(state, "summary", "")
+        if not summary:
+            return messages
+        return [SystemMessage(content=f"Summary of the earlier conversation:\n{summary}"), *messages]
+
+    def split(self, messages: Sequence[BaseMessage]) -> int:
+        """Index of the first message to keep; everything before it gets summarized.
+
+        Returns 0 while the history fits in `max_tokens`.
+        """
+        sizes = [self.token_counter([message]) for message in messages]
+        if sum(sizes) <= self.max_tokens:
+            return 0
+        cut = 0
+        kept = 0
+        for i in range(len(messages) - 1, 0, -1):
+            kept += sizes[i]
+            if not isinstance(messages[i], HumanMessage):
+                continue
+            if kept > self.keep_tokens and cut:
+                break
+            # The latest human message is always a valid cut, even over budget.
+            cut = i
+        return cut
+
+    def node(self, state: Any) -> dict[str, Any]:
+        """Graph node: fold the oldest turns into `summary` once over budget."""
+        messages = list(_field(state, "messages", []))
+        cut = self.split(messages)
+        if cut == 0:
+            return {}
+        evicted = messages[:cut]
+        previous = _field(state, "summary", "") or "(empty)"
+        response = self.model.invoke(
+            [
+                SystemMessage(content=SUMMARY_INSTRUCTIONS),
+                HumanMessage(
+                    content=f"Existing summary:\n{previous}\n\nNew messages:\n{_transcript(evicted)}"
+                ),
+            ]
+        )
+        return {
+            "summary": response.text,
+            "messages": [RemoveMessage(id=message.id) for message in evicted],
+        }
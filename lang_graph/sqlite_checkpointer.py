@@ -0,0 +1,435 @@
+"""Connection-pooled async SQLite checkpointer for the LangGraph examples.
+
+`AsyncSqliteSaver` funnels every read and write through one aiosqlite connection
+behind one lock, so concurrent conversation threads queue up on each other and
+every checkpoint pays for its own commit. `PooledSqliteSaver` keeps the same
+schema (a database written by `SqliteSaver` can be opened by it and vice versa)
+but:
+
+- serves reads from a pool of read-only connections, which WAL mode lets run
+  alongside the writer;
+- sends every write through a single writer task that commits whatever has
+  queued up since the last commit in one transaction (group commit), each
+  write inside its own savepoint so one bad write does not fail the batch;
+- tunes `synchronous`, `cache_size`, `mmap_size` and `busy_timeout`.
+
+Usage:
+    async with PooledSqliteSaver.from_path("checkpoints.db") as saver:
+        graph = graph_builder.compile(checkpointer=saver)
+        await graph.ainvoke(..., config={"configurable": {"thread_id": "1"}})
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+from collections.abc import AsyncIterator, Sequence
+from contextlib import asynccontextmanager
+from typing import Any, cast
+
+import aiosqlite
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    SerializerProtocol,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+from langgraph.checkpoint.sqlite.utils import search_where
+
+# Same tables as langgraph.checkpoint.sqlite, so the files stay interchangeable.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    type TEXT,
+    checkpoint BLOB,
+    metadata BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT,
+    value BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+"""
+
+CHECKPOINT_COLUMNS = "thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata"
+WRITES_QUERY = "SELECT task_id, channel, type, value FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_id, idx"
+
+DEFAULT_READERS = 4
+DEFAULT_MAX_BATCH = 256
+DEFAULT_CACHE_KIB = 16 * 1024
+DEFAULT_MMAP_BYTES = 64 * 1024 * 1024
+DEFAULT_BUSY_TIMEOUT_MS = 5000
+
+# One queued write: a list of (sql, rows) executed with executemany.
+_Statements = list[tuple[str, list[tuple[Any, ...]]]]
+
+
+def connection_pragmas(
+    cache_kib: int = DEFAULT_CACHE_KIB,
+    mmap_bytes: int = DEFAULT_MMAP_BYTES,
+    busy_timeout_ms: int = DEFAULT_BUSY_TIMEOUT_MS,
+) -> list[str]:
+    """Per-connection pragmas. `synchronous=NORMAL` is durable under WAL except on power loss."""
+    return [
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        f"PRAGMA cache_size=-{cache_kib}",
+        f"PRAGMA mmap_size={mmap_bytes}",
+        f"PRAGMA busy_timeout={busy_timeout_ms}",
+        "PRAGMA temp_store=MEMORY",
+    ]
+
+
+class PooledSqliteSaver(AsyncSqliteSaver):
+    """`AsyncSqliteSaver` with a read-connection pool and a group-committing writer.
+
+    Create it with `from_path`, which opens the connections, creates the schema
+    and starts the writer task, and closes everything on exit. The synchronous
+    `get_tuple`/`list`/`put` methods inherited from `AsyncSqliteSaver` keep
+    working from other threads.
+
+    Subclasses change the on-disk checkpoint format through `_encode_checkpoint`
+    and `_decode_checkpoints`, and run maintenance on the writer connection under
+    `self.lock`, which the writer also holds while it commits.
+    """
+
+    schema = SCHEMA
+
+    def __init__(
+        self,
+        writer: aiosqlite.Connection,
+        readers: Sequence[aiosqlite.Connection],
+        *,
+        max_batch: int = DEFAULT_MAX_BATCH,
+        serde: SerializerProtocol | None = None,
+    ) -> None:
+        super().__init__(writer, serde=serde)
+        self.readers = list(readers)
+        self.max_batch = max_batch
+        self._idle: asyncio.Queue[aiosqlite.Connection] = asyncio.Queue()
+        for conn in self.readers:
+            self._idle.put_nowait(conn)
+        self._pending: asyncio.Queue[tuple[_Statements, asyncio.Future] | None] = asyncio.Queue()
+        self._writer_task: asyncio.Task | None = None
+        self.batches = 0
+        self.batched_writes = 0
+        # The schema is created by from_path before the saver is handed out.
+        self.is_setup = True
+
+    @classmethod
+    @asynccontextmanager
+    async def from_path(
+        cls,
+        path: str,
+        *,
+        readers: int = DEFAULT_READERS,
+        max_batch: int = DEFAULT_MAX_BATCH,
+        cache_kib: int = DEFAULT_CACHE_KIB,
+        mmap_bytes: int = DEFAULT_MMAP_BYTES,
+        busy_timeout_ms: int = DEFAULT_BUSY_TIMEOUT_MS,
+        serde: SerializerProtocol | None = None,
+        **options: Any,
+    ) -> AsyncIterator[PooledSqliteSaver]:
+        """Open a saver on the database file at `path`.
+
+        Args:
+            path: Database file. Pooled connections need a real file, not ":memory:".
+            readers: Number of read-only connections.
+            max_batch: Most writes committed in one transaction.
+            cache_kib: Page cache per connection, in KiB.
+            mmap_bytes: Memory-mapped I/O size per connection.
+            busy_timeout_ms: How long a connection waits on a lock before failing.
+            options: Extra keyword arguments for the subclass constructor.
+        """
+        if path == ":memory:" or path.startswith("file::memory:"):
+            raise ValueError("PooledSqliteSaver needs a database file; use MemorySaver for in-memory state")
+        if readers < 1 or max_batch < 1:
+            raise ValueError("readers and max_batch must be at least 1")
+        pragmas = connection_pragmas(cache_kib, mmap_bytes, busy_timeout_ms)
+        opened: list[aiosqlite.Connection] = []
+        saver = None
+        try:
+            # isolation_level=None: transactions are issued explicitly by the writer.
+            writer = await aiosqlite.connect(path, isolation_level=None)
+            opened.append(writer)
+            # auto_vacuum only takes effect on a new file, so set it before the schema.
+            for pragma in ["PRAGMA auto_vacuum=INCREMENTAL"] + pragmas:
+                await writer.execute(pragma)
+            await writer.executescript(cls.schema)
+            for _ in range(readers):
+                conn = await aiosqlite.connect(path, isolation_level=None)
+                opened.append(conn)
+                for pragma in pragmas + ["PRAGMA query_only=ON"]:
+                    await conn.execute(pragma)
+            saver = cls(writer, opened[1:], max_batch=max_batch, serde=serde, **options)
+            saver._start()
+            yield saver
+        finally:
+            if saver is not None:
+                await saver._stop()
+            for conn in opened:
+                await conn.close()
+
+    async def setup(self) -> None:
+        """Nothing to do: `from_path` has already created the schema."""
+
+    def _start(self) -> None:
+        self._writer_task = asyncio.create_task(self._write_loop())
+
+    # -----------------------
+    # Reads
+    # -----------------------
+
+    @asynccontextmanager
+    async def _reader(self) -> AsyncIterator[aiosqlite.Connection]:
+        """A pooled connection inside a read transaction, so all its queries see one snapshot."""
+        conn = await self._idle.get()
+        try:
+            await conn.execute("BEGIN")
+            yield conn
+        finally:
+            # A cancelled BEGIN still runs on the connection's thread, so `in_transaction`
+            # can't be trusted yet. aiosqlite runs calls in order: `rollback()` lands after
+            # it (a no-op outside a transaction) and before the next reader's BEGIN.
+            try:
+                await asyncio.shield(conn.rollback())
+            finally:
+                self._idle.put_nowait(conn)
+
+    async def aget_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        """Get the checkpoint for `config` (the latest one if it has no `checkpoint_id`)."""
+        thread_id = str(config["configurable"]["thread_id"])
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        if checkpoint_id := get_checkpoint_id(config):
+            query = f"SELECT {CHECKPOINT_COLUMNS} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?"
+            params: tuple[Any, ...] = (thread_id, checkpoint_ns, checkpoint_id)
+        else:
+            query = f"SELECT {CHECKPOINT_COLUMNS} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? ORDER BY checkpoint_id DESC LIMIT 1"
+            params = (thread_id, checkpoint_ns)
+        async with self._reader() as conn:
+            async with conn.execute(query, params) as cur:
+                row = await cur.fetchone()
+            if row is None:
+                return None
+            async with conn.execute(WRITES_QUERY, row[:3]) as cur:
+                writes = await cur.fetchall()
+            (checkpoint,) = await self._decode_checkpoints(conn, [row])
+        return self._tuple(row, checkpoint, writes)
+
+    async def alist(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        """List matching checkpoints, newest first.
+
+        Rows are read up front so the pooled connection is returned before the
+        caller resumes; a caller that reads more checkpoints while iterating can
+        not starve the pool.
+        """
+        where, params = search_where(config, filter, before)
+        query = f"SELECT {CHECKPOINT_COLUMNS} FROM checkpoints {where} ORDER BY checkpoint_id DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params = (*params, limit)
+        async with self._reader() as conn:
+            async with conn.execute(query, params) as cur:
+                rows = await cur.fetchall()
+            writes = []
+            for row in rows:
+                async with conn.execute(WRITES_QUERY, row[:3]) as cur:
+                    writes.append(await cur.fetchall())
+            checkpoints = await self._decode_checkpoints(conn, rows)
+        for row, checkpoint, row_writes in zip(rows, checkpoints, writes):
+            yield self._tuple(row, checkpoint, row_writes)
+
+    async def _decode_checkpoints(self, conn: aiosqlite.Connection, rows: Sequence[Sequence[Any]]) -> list[Checkpoint]:
+        """Checkpoints stored in `rows` (as selected by CHECKPOINT_COLUMNS), in the same order."""
+        return [self.serde.loads_typed((row[4], row[5])) for row in rows]
+
+    def _tuple(self, row: Sequence[Any], checkpoint: Checkpoint, writes: Sequence[Sequence[Any]]) -> CheckpointTuple:
+        thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, *_, metadata = row
+        return CheckpointTuple(
+            {
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint_id,
+                }
+            },
+            checkpoint,
+            cast(CheckpointMetadata, json.loads(metadata) if metadata is not None else {}),
+            (
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": checkpoint_ns,
+                        "checkpoint_id": parent_checkpoint_id,
+                    }
+                }
+                if parent_checkpoint_id
+                else None
+            ),
+            [(task_id, channel, self.serde.loads_typed((t, value))) for task_id, channel, t, value in writes],
+        )
+
+    # -----------------------
+    # Writes
+    # -----------------------
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        """Save a checkpoint; returns once the batch holding it has committed."""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        type_, serialized = self._encode_checkpoint(config, checkpoint)
+        serialized_metadata = json.dumps(get_checkpoint_metadata(config, metadata), ensure_ascii=False).encode(
+            "utf-8", "ignore"
+        )
+        row = (
+            str(thread_id),
+            checkpoint_ns,
+            checkpoint["id"],
+            config["configurable"].get("checkpoint_id"),
+            type_,
+            serialized,
+            serialized_metadata,
+        )
+        await self._write(
+            [(f"INSERT OR REPLACE INTO checkpoints ({CHECKPOINT_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)", [row])]
+        )
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        """Store a task's intermediate writes for the checkpoint in `config`."""
+        verb = "INSERT OR REPLACE" if all(w[0] in WRITES_IDX_MAP for w in writes) else "INSERT OR IGNORE"
+        rows = [
+            (
+                str(config["configurable"]["thread_id"]),
+                str(config["configurable"]["checkpoint_ns"]),
+                str(config["configurable"]["checkpoint_id"]),
+                task_id,
+                WRITES_IDX_MAP.get(channel, idx),
+                channel,
+                *self.serde.dumps_typed(value),
+            )
+            for idx, (channel, value) in enumerate(writes)
+        ]
+        await self._write(
+            [
+                (
+                    f"{verb} INTO writes (thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, type, value) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+            ]
+        )
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        """Delete all checkpoints and writes for `thread_id`."""
+        await self._write(
+            [
+                ("DELETE FROM checkpoints WHERE thread_id = ?", [(str(thread_id),)]),
+                ("DELETE FROM writes WHERE thread_id = ?", [(str(thread_id),)]),
+            ]
+        )
+
+    def _encode_checkpoint(self, config: RunnableConfig, checkpoint: Checkpoint) -> tuple[str, bytes]:
+        """(type, blob) stored for `checkpoint`, whose parent is the checkpoint in `config`."""
+        return self.serde.dumps_typed(checkpoint)
+
+    async def _write(self, statements: _Statements) -> None:
+        if self._writer_task is None:
+            raise RuntimeError("PooledSqliteSaver is closed; open it with PooledSqliteSaver.from_path")
+        done = asyncio.get_running_loop().create_future()
+        self._pending.put_nowait((statements, done))
+        await done
+
+    async def _write_loop(self) -> None:
+        closing = False
+        while not closing:
+            batch = [await self._pending.get()]
+            while len(batch) < self.max_batch and not self._pending.empty():
+                batch.append(self._pending.get_nowait())
+            if batch[-1] is None:
+                # _stop's sentinel is always the last thing queued.
+                closing = True
+                batch.pop()
+            if batch:
+                async with self.lock:
+                    await self._commit(batch)
+
+    async def _commit(self, batch: list[tuple[_Statements, asyncio.Future]]) -> None:
+        errors: list[Exception | None] = []
+        try:
+            await self.conn.execute("BEGIN IMMEDIATE")
+            for statements, _ in batch:
+                await self.conn.execute("SAVEPOINT write")
+                try:
+                    for sql, rows in statements:
+                        await self.conn.executemany(sql, rows)
+                except Exception as e:
+                    await self.conn.execute("ROLLBACK TO write")
+                    errors.append(e)
+                else:
+                    errors.append(None)
+                await self.conn.execute("RELEASE write")
+            await self.conn.execute("COMMIT")
+        except Exception as e:
+            # The transaction itself failed, so nothing in the batch was committed.
+            if self.conn.in_transaction:
+                await self.conn.execute("ROLLBACK")
+            errors = [e] * len(batch)
+        else:
+            self.batches += 1
+            self.batched_writes += len(batch)
+        for (_, done), error in zip(batch, errors):
+            if done.done():
+                continue
+            if error is None:
+                done.set_result(None)
+            else:
+                done.set_exception(error)
+
+    async def _stop(self) -> None:
+        """Commit everything already queued, then stop the writer task."""
+        task, self._writer_task = self._writer_task, None
+        if task is None:
+            return
+        self._pending.put_nowait(None)
+        await task
@@ -0,0 +1,151 @@
+import asyncio
+import os
+import tempfile
+import unittest
+
+from bench_checkpointer import graph_builder
+from compacting_checkpointer import CompactingSqliteSaver
+from sqlite_checkpointer import PooledSqliteSaver
+
+TURNS = 12
+
+
+def _config(thread_id: str) -> dict:
+    return {"configurable": {"thread_id": thread_id}}
+
+
+async def _converse(saver, thread_ids=("a", "b"), turns: int = TURNS) -> None:
+    graph = graph_builder.compile(checkpointer=saver)
+    for turn in range(turns):
+        await asyncio.gather(
+            *(graph.ainvoke({"messages": [("user", f"{t} {turn}")]}, _config(t)) for t in thread_ids)
+        )
+
+
+async def _history(saver, thread_id: str) -> list:
+    """(step, message contents, turns) of every checkpoint, newest first."""
+    graph = graph_builder.compile(checkpointer=saver)
+    return [
+        (
+            snapshot.metadata["step"],
+            [m.content for m in snapshot.values.get("messages", [])],
+            snapshot.values.get("turns"),
+        )
+        async for snapshot in graph.aget_state_history(_config(thread_id))
+    ]
+
+
+class TestCompactingSqliteSaver(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+        async with PooledSqliteSaver.from_path(self._path("full")) as saver:
+            await _converse(saver)
+            self.expected = {t: await _history(saver, t) for t in ("a", "b")}
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.dir, f"{name}.db")
+
+    async def test_delta_history_matches_full_storage(self):
+        async with CompactingSqliteSaver.from_path(self._path("delta"), full_every=4, vacuum_interval=None) as saver:
+            await _converse(saver)
+            self.assertGreater(saver.delta_writes, saver.full_writes)
+            for t in ("a", "b"):
+                self.assertEqual(await _history(saver, t), self.expected[t])
+
+    async def test_cold_reopen_decodes_deltas(self):
+        path = self._path("delta")
+        async with CompactingSqliteSaver.from_path(path, full_every=4, vacuum_interval=None) as saver:
+            await _converse(saver)
+        async with CompactingSqliteSaver.from_path(path, full_every=4, vacuum_interval=None) as saver:
+            self.assertEqual(len(saver._recent), 0)
+            self.assertEqual(await _history(saver, "a"), self.expected["a"])
+            # Latest-checkpoint reads and new turns work on a cold cache too.
+            await _converse(saver, thread_ids=("b",), turns=1)
+            state = await graph_builder.compile(checkpointer=saver).aget_state(_config("b"))
+            self.assertEqual(len(state.values["messages"]), 2 * (TURNS + 1))
+
+    async def test_retention_keeps_the_newest_checkpoints_decodable(self):
+        path = self._path("retained")
+        async with CompactingSqliteSaver.from_path(path, full_every=4, keep_last=5, vacuum_interval=None) as saver:
+            await _converse(saver)
+            graph = graph_builder.compile(checkpointer=saver)
+            states = [s async for s in graph.aget_state_history(_config("a"))]
+            await saver.atag_checkpoint(states[-1].config, "start")
+            self.assertGreater(await saver.avacuum(), 0)
+            kept = self.expected["a"][:5] + self.expected["a"][-1:]
+            self.assertEqual(await _history(saver, "a"), kept)
+            self.assertEqual(await _history(saver, "b"), self.expected["b"][:5])
+        async with CompactingSqliteSaver.from_path(path, full_every=4, vacuum_interval=None) as saver:
+            self.assertEqual(await _history(saver, "a"), kept)
+
+    async def test_prune_keeps_a_base_pinned_while_rows_were_read(self):
+        async with CompactingSqliteSaver.from_path(
+            self._path("race"), full_every=4, keep_last=2, vacuum_interval=None
+        ) as saver:
+            await _converse(saver, thread_ids=("a",))
+            graph = graph_builder.compile(checkpointer=saver)
+            oldest = [s async for s in graph.aget_state_history(_config("a"))][-1].config["configurable"]
+            key = ("a", "", oldest["checkpoint_id"])
+            execute = saver.conn.execute
+
+            def execute_with_concurrent_encode(sql, *args):
+                # A delta against the oldest checkpoint is encoded after the rows were read.
+                if sql == "BEGIN IMMEDIATE":
+                    saver._pinned[key] += 1
+                return execute(sql, *args)
+
+            saver.conn.execute = execute_with_concurrent_encode
+            try:
+                await saver.aprune("a")
+            finally:
+                del saver.conn.execute
+            saver._pinned.clear()
+            history = await _history(saver, "a")
+            self.assertEqual(len(history), 3)
+            self.assertEqual(history[-1], self.expected["a"][-1])
+
+    async def test_failed_prune_leaves_unprocessed_threads_dirty(self):
+        async with CompactingSqliteSaver.from_path(
+            self._path("dirty"), keep_last=2, vacuum_interval=None
+        ) as saver:
+            await _converse(saver, thread_ids=("a", "b", "c"), turns=2)
+            prune = saver._prune_thread
+
+            async def failing_prune(thread_id, checkpoint_ns):
+                if thread_id == "b":
+                    raise RuntimeError("disk full")
+                return await prune(thread_id, checkpoint_ns)
+
+            saver._prune_thread = failing_prune
+            with self.assertRaises(RuntimeError):
+                await saver.aprune()
+            self.assertEqual(saver._dirty, {("b", ""), ("c", "")})
+            del saver._prune_thread
+            self.assertGreater(await saver.aprune(), 0)
+            self.assertEqual(saver._dirty, set())
+
+    async def test_vacuum_loop_survives_unexpected_errors(self):
+        async with CompactingSqliteSaver.from_path(self._path("loop"), vacuum_interval=0.01) as saver:
+            calls = 0
+
+            async def flaky_vacuum():
+                nonlocal calls
+                calls += 1
+                if calls == 1:
+                    raise RuntimeError("boom")
+                return 0
+
+            saver.avacuum = flaky_vacuum
+            with self.assertLogs("compacting_checkpointer", "ERROR"):
+                for _ in range(100):
+                    await asyncio.sleep(0.01)
+                    if calls >= 3:
+                        break
+            self.assertGreaterEqual(calls, 3)
+            self.assertFalse(saver._vacuum_task.done())
+
+
+if __name__ == "__main__":
+    unittest.main()
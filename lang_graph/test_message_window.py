@@ -0,0 +1,118 @@
+import unittest
+from typing import Annotated, TypedDict
+
+from langchain_core.messages import AIMessage, HumanMessage, RemoveMessage, SystemMessage, ToolMessage
+from langgraph.graph import END, START, StateGraph
+from langgraph.graph.message import add_messages
+
+from message_window import HistoryWindow
+
+
+class _FakeModel:
+    """Chat model stand-in: records each prompt and answers with numbered summaries."""
+
+    def __init__(self):
+        self.prompts = []
+
+    def invoke(self, messages):
+        self.prompts.append(messages)
+        return AIMessage(content=f"summary {len(self.prompts)}")
+
+
+def _words(messages) -> int:
+    return sum(len(m.text.split()) for m in messages)
+
+
+def _conversation(turns: int = 3, words: int = 10) -> list:
+    """`turns` rounds of question, tool call, tool result and answer, `words` words each."""
+    text = " ".join(["word"] * words)
+    messages = []
+    for n in range(turns):
+        call = {"name": "search", "args": {"q": str(n)}, "id": f"call-{n}"}
+        messages += [
+            HumanMessage(content=text, id=f"h{n}"),
+            AIMessage(content="", tool_calls=[call], id=f"a{n}"),
+            ToolMessage(content=text, tool_call_id=f"call-{n}", id=f"t{n}"),
+            AIMessage(content=text, id=f"r{n}"),
+        ]
+    return messages
+
+
+class TestHistoryWindow(unittest.TestCase):
+    def window(self, model=None, **kwargs) -> HistoryWindow:
+        return HistoryWindow(model or _FakeModel(), token_counter=_words, **kwargs)
+
+    def test_history_under_budget_is_left_alone(self):
+        model = _FakeModel()
+        window = self.window(model, max_tokens=90, keep_tokens=30)
+        messages = _conversation()
+        self.assertEqual(window.split(messages), 0)
+        self.assertEqual(window.node({"messages": messages, "summary": ""}), {})
+        self.assertEqual(model.prompts, [])
+
+    def test_cut_lands_on_a_human_message(self):
+        messages = _conversation()
+        for keep_tokens in range(1, 90, 7):
+            with self.subTest(keep_tokens=keep_tokens):
+                cut = self.window(max_tokens=89, keep_tokens=keep_tokens).split(messages)
+                self.assertIsInstance(messages[cut], HumanMessage)
+                kept_calls = {c["id"] for m in messages[cut:] if isinstance(m, AIMessage) for c in m.tool_calls}
+                for m in messages[cut:]:
+                    if isinstance(m, ToolMessage):
+                        self.assertIn(m.tool_call_id, kept_calls)
+        # Each turn is 30 words, so keep_tokens=60 keeps exactly the last two.
+        self.assertEqual(self.window(max_tokens=89, keep_tokens=60).split(messages), 4)
+
+    def test_latest_human_turn_is_kept_over_budget(self):
+        messages = _conversation(words=100)
+        self.assertEqual(self.window(max_tokens=50, keep_tokens=10).split(messages), 8)
+
+    def test_node_removes_the_evicted_messages_and_extends_the_summary(self):
+        model = _FakeModel()
+        messages = _conversation()
+        update = self.window(model, max_tokens=60, keep_tokens=30).node(
+            {"messages": messages, "summary": "user likes weather"}
+        )
+        cut = 8
+        self.assertEqual(update["summary"], "summary 1")
+        self.assertTrue(all(isinstance(m, RemoveMessage) for m in update["messages"]))
+        self.assertEqual([m.id for m in update["messages"]], [m.id for m in messages[:cut]])
+
+        (prompt,) = model.prompts
+        self.assertIsInstance(prompt[0], SystemMessage)
+        request = prompt[1].text
+        self.assertIn("Existing summary:\nuser likes weather", request)
+        self.assertIn("[called search({'q': '0'})]", request)
+        self.assertIn("tool: word", request)
+        self.assertNotIn("search({'q': '2'})", request)
+
+    def test_graph_keeps_the_window_and_the_summary_in_state(self):
+        class State(TypedDict):
+            messages: Annotated[list, add_messages]
+            summary: str
+
+        model = _FakeModel()
+        window = self.window(model, max_tokens=60, keep_tokens=30)
+        seen = []
+
+        def chatbot(state: State) -> State:
+            seen.append(window.messages(state))
+            return {"messages": [AIMessage(content="ok")]}
+
+        builder = StateGraph(State)
+        builder.add_node("summarize", window.node)
+        builder.add_node("chatbot", chatbot)
+        builder.add_edge(START, "summarize")
+        builder.add_edge("summarize", "chatbot")
+        builder.add_edge("chatbot", END)
+        graph = builder.compile()
+
+        result = graph.invoke({"messages": _conversation(), "summary": "earlier"})
+        self.assertEqual([m.id for m in result["messages"][:4]], ["h2", "a2", "t2", "r2"])
+        self.assertEqual(result["summary"], "summary 1")
+        self.assertEqual(seen[0][0].text, "Summary of the earlier conversation:\nsummary 1")
+        self.assertEqual(seen[0][1:], result["messages"][:4])
+
+
+if __name__ == "__main__":
+    unittest.main()
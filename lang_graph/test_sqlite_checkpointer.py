@@ -0,0 +1,111 @@
+import asyncio
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from bench_checkpointer import graph_builder
+from sqlite_checkpointer import CHECKPOINT_COLUMNS, PooledSqliteSaver
+
+
+def _config(thread_id: str) -> dict:
+    return {"configurable": {"thread_id": thread_id}}
+
+
+INSERT = f"INSERT INTO checkpoints ({CHECKPOINT_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)"
+
+
+def _row(thread_id: str) -> tuple:
+    return (thread_id, "", "1", None, "json", b"{}", b"{}")
+
+
+async def _count(conn) -> int:
+    async with conn.execute("SELECT COUNT(*) FROM checkpoints") as cur:
+        return (await cur.fetchone())[0]
+
+
+class TestPooledSqliteSaver(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "checkpoints.db")
+
+    async def test_round_trip_and_group_commit(self):
+        async with PooledSqliteSaver.from_path(self.path, readers=2) as saver:
+            graph = graph_builder.compile(checkpointer=saver)
+            await asyncio.gather(
+                *(graph.ainvoke({"messages": [("user", f"hi {n}")]}, _config(f"t{n}")) for n in range(8))
+            )
+            state = await graph.aget_state(_config("t3"))
+            self.assertEqual([m.content for m in state.values["messages"]], ["hi 3", "echo: hi 3"])
+            self.assertEqual(state.values["turns"], 1)
+            self.assertLess(saver.batches, saver.batched_writes)
+
+        # A cold reopen sees the same state.
+        async with PooledSqliteSaver.from_path(self.path) as saver:
+            graph = graph_builder.compile(checkpointer=saver)
+            state = await graph.aget_state(_config("t3"))
+            self.assertEqual(state.values["turns"], 1)
+
+    async def test_pooled_readers_are_read_only_wal_connections(self):
+        async with PooledSqliteSaver.from_path(self.path, readers=2) as saver:
+            for conn in [saver.conn, *saver.readers]:
+                async with conn.execute("PRAGMA journal_mode") as cur:
+                    self.assertEqual(await cur.fetchone(), ("wal",))
+            with self.assertRaises(sqlite3.OperationalError):
+                await saver.readers[0].execute("DELETE FROM checkpoints")
+
+    async def test_readers_keep_their_snapshot_while_the_writer_commits(self):
+        async with PooledSqliteSaver.from_path(self.path, readers=2) as saver:
+            async with saver._reader() as held:
+                self.assertEqual(await _count(held), 0)
+                # Under WAL the writer commits while a read transaction is open, and the
+                # second pooled connection serves reads meanwhile.
+                await asyncio.wait_for(saver._write([(INSERT, [_row("a")])]), 5)
+                self.assertIsNotNone(await asyncio.wait_for(saver.aget_tuple(_config("a")), 5))
+                self.assertEqual(await _count(held), 0)
+            async with saver._reader() as fresh:
+                self.assertEqual(await _count(fresh), 1)
+
+    async def test_a_failed_write_rolls_back_alone_within_its_batch(self):
+        async with PooledSqliteSaver.from_path(self.path) as saver:
+            bad = [(INSERT, [_row("partial")]), ("INSERT INTO checkpoints (thread_id) VALUES (NULL)", [()])]
+            results = await asyncio.gather(
+                saver._write([(INSERT, [_row("a")])]),
+                saver._write(bad),
+                saver._write([(INSERT, [_row("b")])]),
+                return_exceptions=True,
+            )
+            self.assertIsNone(results[0])
+            self.assertIsInstance(results[1], sqlite3.IntegrityError)
+            self.assertIsNone(results[2])
+            self.assertEqual((saver.batches, saver.batched_writes), (1, 3))
+            async with saver._reader() as conn:
+                async with conn.execute("SELECT thread_id FROM checkpoints ORDER BY thread_id") as cur:
+                    self.assertEqual(await cur.fetchall(), [("a",), ("b",)])
+                self.assertFalse(saver.conn.in_transaction)
+
+    async def test_cancelled_reads_leave_no_open_transaction(self):
+        async with PooledSqliteSaver.from_path(self.path, readers=1) as saver:
+            graph = graph_builder.compile(checkpointer=saver)
+            await graph.ainvoke({"messages": [("user", "hi")]}, _config("t"))
+            history = len([c async for c in saver.alist(_config("t"))])
+            # Cancel reads at every await point of the read transaction: in BEGIN,
+            # in the queries, and in the cleanup.
+            for steps in range(12):
+                task = asyncio.ensure_future(saver.aget_tuple(_config("t")))
+                for _ in range(steps):
+                    await asyncio.sleep(0)
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+                # The single pooled connection must still be usable.
+                self.assertIsNotNone(await saver.aget_tuple(_config("t")))
+                self.assertEqual(len([c async for c in saver.alist(_config("t"))]), history)
+            self.assertFalse(saver.readers[0].in_transaction)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+"""
+Throughput of one HTTP-mode server as the number of concurrent MCP clients grows.
+
+Starts `shell_server.py --transport http` on a free port, then for each client count
+opens that many MCP sessions, each calling a tool in a loop for --duration seconds,
+and prints calls/s and p50/p99 latency per step:
+    python bench_http.py --clients 1,2,4,8,16 --duration 5 --tool terminal
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List
+
+from mcp import ClientSession
+from mcp.client.streamable_http import streamablehttp_client
+
+TOOL_ARGUMENTS = {
+    "terminal": {"command": "true"},
+    "read_file": {"path": __file__, "limit": 4096},
+    "server_stats": {},
+}
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def _wait_ready(url: str, timeout: float = 15.0) -> None:
+    host, port = url.split("//")[1].split("/")[0].split(":")
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            _, writer = await asyncio.open_connection(host, int(port))
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError("server did not start")
+
+
+async def _client(url: str, tool: str, deadline: float, latencies: List[float], errors: List[int]) -> None:
+    async with streamablehttp_client(url) as (read, write, _):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                result = await session.call_tool(tool, TOOL_ARGUMENTS[tool])
+                latencies.append(time.perf_counter() - start)
+                if result.isError:
+                    errors[0] += 1
+
+
+async def _step(url: str, tool: str, clients: int, duration: float) -> Dict[str, Any]:
+    latencies: List[float] = []
+    errors = [0]
+    deadline = time.perf_counter() + duration
+    start = time.perf_counter()
+    await asyncio.gather(*(_client(url, tool, deadline, latencies, errors) for _ in range(clients)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "clients": clients,
+        "calls": len(latencies),
+        "calls_per_s": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 2) if latencies else None,
+        "p99_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000, 2) if latencies else None,
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 2) if latencies else None,
+        "errors": errors[0],
+    }
+
+
+async def _bench(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}/mcp/"
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "shell_server.py"),
+         "--transport", "http", "--port", str(port), "--max-sessions", str(max(args.clients))],
+    )
+    try:
+        await _wait_ready(url)
+        return [await _step(url, args.tool, n, args.duration) for n in args.clients]
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the HTTP transport with concurrent MCP clients")
+    parser.add_argument("--clients", default="1,2,4,8,16", help="comma-separated client counts")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per client count")
+    parser.add_argument("--tool", choices=sorted(TOOL_ARGUMENTS), default="terminal")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+    args.clients = [int(n) for n in args.clients.split(",")]
+
+    report = asyncio.run(_bench(args))
+    if args.json:
+        print(json.dumps(report))
+        return
+    for row in report:
+        print(
+            f"{row['clients']:>3} clients: {row['calls_per_s']:>8} calls/s  p50 {row['p50_ms']} ms  "
+            f"p99 {row['p99_ms']} ms  ({row['calls']} calls, {row['errors']} errors)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""
+Concurrent load benchmark and regression gate for shell_server.py.
+
+Drives N concurrent `terminal` calls over a weighted mix of workloads (trivial,
+large output, sleeps and timeouts) through a real MCP client session, either against
+a server subprocess over stdio (default) or in-process over memory streams, and
+reports throughput, per-workload p50/p99 latency, server peak RSS and processes
+left behind. Runs offline. Exits 1 if a --max-*/--min-* gate fails:
+    python bench_load.py --concurrency 16 --requests 400
+    python bench_load.py --inprocess --max-p99-ms 2000 --min-throughput 20 --max-leaked 0
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+
+SERVER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "shell_server.py")
+RUN_ID_ENV = "SHELL_SERVER_BENCH_RUN"
+
+# name -> (weight, terminal arguments)
+WORKLOADS: Dict[str, Tuple[int, Dict[str, Any]]] = {
+    "trivial": (50, {"command": "true"}),
+    "large_output": (20, {"command": "seq 1 200000"}),
+    "sleep": (20, {"command": "sleep 0.2"}),
+    "timeout": (10, {"command": "sleep 5", "timeout_seconds": 0.3}),
+}
+
+
+def _percentile(sorted_values: List[float], pct: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))]
+
+
+def _peak_rss_kb(pid: Optional[int]) -> Optional[int]:
+    if pid is None:
+        import resource
+
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    try:
+        with open(f"/proc/{pid}/status") as fh:
+            for line in fh:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def _leaked_processes(run_id: str, exclude: List[int]) -> List[Dict[str, Any]]:
+    """Processes still carrying this run's marker in their environment (inherited from the server)."""
+    marker = f"{RUN_ID_ENV}={run_id}".encode()
+    leaked = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit() or int(entry) in exclude:
+            continue
+        try:
+            with open(f"/proc/{entry}/environ", "rb") as fh:
+                if marker not in fh.read().split(b"\0"):
+                    continue
+            with open(f"/proc/{entry}/cmdline", "rb") as fh:
+                cmdline = fh.read().replace(b"\0", b" ").decode(errors="replace").strip()
+        except OSError:
+            continue
+        leaked.append({"pid": int(entry), "cmdline": cmdline})
+    return leaked
+
+
+@asynccontextmanager
+async def _session(inprocess: bool) -> AsyncIterator[Tuple[ClientSession, Optional[int]]]:
+    """Yield (client session, server pid or None when in-process)."""
+    if inprocess:
+        from mcp.shared.memory import create_connected_server_and_client_session
+
+        import shell_server
+
+        async with create_connected_server_and_client_session(shell_server.server) as session:
+            yield session, None
+        return
+    params = StdioServerParameters(command=sys.executable, args=[SERVER_PATH], env=dict(os.environ))
+    async with stdio_client(params) as (read, write):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+            # The server is the only child we started that runs shell_server.py.
+            yield session, _find_server_pid()
+
+
+def _find_server_pid() -> Optional[int]:
+    me = str(os.getpid())
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as fh:
+                ppid = fh.read().rsplit(")", 1)[1].split()[1]
+            with open(f"/proc/{entry}/cmdline", "rb") as fh:
+                cmdline = fh.read()
+        except (OSError, IndexError):
+            continue
+        if ppid == me and SERVER_PATH.encode() in cmdline:
+            return int(entry)
+    return None
+
+
+async def _run(args: argparse.Namespace) -> Dict[str, Any]:
+    run_id = uuid.uuid4().hex
+    # Inherited by the server (and so by every command it runs) for the leak scan.
+    os.environ[RUN_ID_ENV] = run_id
+    rnd = random.Random(args.seed)
+    names = list(WORKLOADS)
+    plan = rnd.choices(names, weights=[WORKLOADS[n][0] for n in names], k=args.requests)
+    latencies: Dict[str, List[float]] = {name: [] for name in names}
+    failures: Dict[str, int] = {name: 0 for name in names}
+
+    async with _session(args.inprocess) as (session, server_pid):
+        queue: asyncio.Queue = asyncio.Queue()
+        for name in plan:
+            queue.put_nowait(name)
+
+        async def worker() -> None:
+            while not queue.empty():
+                name = queue.get_nowait()
+                start = time.perf_counter()
+                result = await session.call_tool("terminal", WORKLOADS[name][1])
+                latencies[name].append(time.perf_counter() - start)
+                payload = json.loads(json.loads(result.content[0].text)["text"])
+                expected_timeout = name == "timeout"
+                if "error" in payload or bool(payload.get("timed_out")) != expected_timeout:
+                    failures[name] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+        peak_rss_kb = _peak_rss_kb(server_pid)
+        # Give killed process groups a moment to be reaped before scanning.
+        await asyncio.sleep(0.5)
+        leaked = _leaked_processes(run_id, exclude=[os.getpid()] + ([server_pid] if server_pid else []))
+
+    everything = sorted(x for values in latencies.values() for x in values)
+    per_workload = {}
+    for name, values in latencies.items():
+        values.sort()
+        per_workload[name] = {
+            "calls": len(values),
+            "failures": failures[name],
+            "p50_ms": round(_percentile(values, 50) * 1000, 2) if values else None,
+            "p99_ms": round(_percentile(values, 99) * 1000, 2) if values else None,
+        }
+    return {
+        "mode": "inprocess" if args.inprocess else "stdio",
+        "concurrency": args.concurrency,
+        "requests": len(everything),
+        "elapsed_s": round(elapsed, 3),
+        "throughput_per_s": round(len(everything) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(_percentile(everything, 50) * 1000, 2),
+        "p99_ms": round(_percentile(everything, 99) * 1000, 2),
+        "peak_rss_kb": peak_rss_kb,
+        "leaked_processes": leaked,
+        "failures": sum(failures.values()),
+        "workloads": per_workload,
+    }
+
+
+def _gate(report: Dict[str, Any], args: argparse.Namespace) -> List[str]:
+    problems = []
+    if args.max_p99_ms is not None and report["p99_ms"] > args.max_p99_ms:
+        problems.append(f"p99 {report['p99_ms']} ms > {args.max_p99_ms} ms")
+    if args.min_throughput is not None and report["throughput_per_s"] < args.min_throughput:
+        problems.append(f"throughput {report['throughput_per_s']}/s < {args.min_throughput}/s")
+    if args.max_leaked is not None and len(report["leaked_processes"]) > args.max_leaked:
+        problems.append(f"{len(report['leaked_processes'])} leaked processes > {args.max_leaked}")
+    if args.max_rss_kb is not None and (report["peak_rss_kb"] or 0) > args.max_rss_kb:
+        problems.append(f"peak RSS {report['peak_rss_kb']} kB > {args.max_rss_kb} kB")
+    if report["failures"]:
+        problems.append(f"{report['failures']} calls returned unexpected results")
+    return problems
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Concurrent load benchmark for shell_server.py")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--inprocess", action="store_true", help="run the server in this process over memory streams")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("--max-p99-ms", type=float)
+    parser.add_argument("--min-throughput", type=float)
+    parser.add_argument("--max-leaked", type=int, default=0)
+    parser.add_argument("--max-rss-kb", type=int)
+    args = parser.parse_args()
+
+    report = asyncio.run(_run(args))
+    problems = _gate(report, args)
+    report["gate_failures"] = problems
+    if args.json:
+        print(json.dumps(report))
+    else:
+        print(
+            f"{report['requests']} calls ({report['mode']}, concurrency {report['concurrency']}) in "
+            f"{report['elapsed_s']}s: {report['throughput_per_s']}/s, p50 {report['p50_ms']} ms, "
+            f"p99 {report['p99_ms']} ms, peak RSS {report['peak_rss_kb']} kB, "
+            f"{len(report['leaked_processes'])} leaked processes"
+        )
+        for name, row in report["workloads"].items():
+            print(f"  {name:>12}: {row['calls']} calls, p50 {row['p50_ms']} ms, p99 {row['p99_ms']} ms, {row['failures']} failures")
+        for leak in report["leaked_processes"]:
+            print(f"  leaked pid {leak['pid']}: {leak['cmdline']}")
+        for problem in problems:
+            print(f"GATE FAILED: {problem}")
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
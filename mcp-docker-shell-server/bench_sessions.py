@@ -0,0 +1,73 @@
+"""
+Per-call latency of one-shot `terminal` commands vs. a persistent shell session.
+
+Runs the same command N times through `_run_shell_command` (a fresh /bin/sh per call)
+and through a `_ShellSession`, in-process, and prints mean/p50/p99 latency:
+    python bench_sessions.py --iterations 500 --command true
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from typing import Any, Dict, List
+
+import shell_server
+
+
+def _summary(samples: List[float]) -> Dict[str, Any]:
+    samples = sorted(samples)
+    return {
+        "mean_ms": round(statistics.fmean(samples) * 1000, 3),
+        "p50_ms": round(samples[len(samples) // 2] * 1000, 3),
+        "p99_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000, 3),
+    }
+
+
+async def _bench(args: argparse.Namespace) -> Dict[str, Any]:
+    one_shot: List[float] = []
+    for _ in range(args.iterations):
+        start = time.perf_counter()
+        await shell_server._run_shell_command(args.command, timeout_seconds=30)
+        one_shot.append(time.perf_counter() - start)
+
+    persistent: List[float] = []
+    try:
+        async with shell_server.sessions.use("bench", "bench") as session:
+            await session.run("true", timeout_seconds=30)  # spawn outside the measurement
+            for _ in range(args.iterations):
+                start = time.perf_counter()
+                await session.run(args.command, timeout_seconds=30)
+                persistent.append(time.perf_counter() - start)
+    finally:
+        await shell_server.sessions.close("bench", "bench")
+
+    report = {
+        "command": args.command,
+        "iterations": args.iterations,
+        "one_shot": _summary(one_shot),
+        "session": _summary(persistent),
+    }
+    report["speedup_p50"] = round(report["one_shot"]["p50_ms"] / max(report["session"]["p50_ms"], 1e-9), 2)
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark one-shot commands vs. persistent shell sessions")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--command", default="true")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    report = asyncio.run(_bench(args))
+    if args.json:
+        print(json.dumps(report))
+        return
+    for mode in ("one_shot", "session"):
+        r = report[mode]
+        print(f"{mode:>9}: mean {r['mean_ms']} ms, p50 {r['p50_ms']} ms, p99 {r['p99_ms']} ms")
+    print(f"p50 speedup with a session: {report['speedup_p50']}x ({args.iterations} x {args.command!r})")
+
+
+if __name__ == "__main__":
+    main()
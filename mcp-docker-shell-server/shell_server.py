@@ -1,8 +1,32 @@
+import argparse
 import asyncio
+import base64
+import bisect
+import codecs
+import errno
+import gzip
+import hashlib
+import itertools
 import json
+import math
+import mmap
+import os
+import re
+import resource
+import shlex
+import shutil
+import signal
+import stat
+import subprocess
+import tempfile
 import time
-from typing import Any, Dict, List
+import uuid
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
 
+import anyio
 from mcp.server import Server
 from mcp.server.stdio import stdio_server
 from mcp.types import Tool
@@ -11,111 +35,2268 @@ from mcp.types import Tool
 server = Server("shell-server")
 
 
+_COMMAND_PROPERTIES: Dict[str, Any] = {
+    "command": {
+        "type": "string",
+        "description": "The shell command to execute as a single string.",
+    },
+    "timeout_seconds": {
+        "type": "number",
+        "description": "Optional timeout in seconds before the process is killed (default 60).",
+    },
+    "max_output_bytes": {
+        "type": "integer",
+        "description": (
+            "Optional per-stream cap on output kept in the result (default 1 MiB). Larger output "
+            "keeps its head and tail and is spilled in full to a temp file whose path is reported."
+        ),
+    },
+    "priority": {
+        "type": "integer",
+        "description": (
+            "Optional scheduling priority when the server is at its concurrency limit; "
+            "higher runs sooner (default 0)."
+        ),
+    },
+    "client_id": {
+        "type": "string",
+        "description": (
+            "Optional fairness key for queued commands (defaults to the MCP session). It does not "
+            "select shell sessions, which always belong to the calling MCP session."
+        ),
+    },
+    "output_encoding": {
+        "type": "string",
+        "enum": ["text", "base64", "gzip+base64", "auto"],
+        "description": (
+            "How stdout/stderr are returned: text (UTF-8, invalid bytes replaced; the default), base64, "
+            "gzip+base64, or auto (text when valid UTF-8, base64 for binary, gzip+base64 for large "
+            "output when smaller). Non-text streams carry <stream>_encoding, _bytes and _sha256."
+        ),
+    },
+    "limits": {
+        "type": "object",
+        "description": (
+            "Optional resource limits for this command; they can only tighten the server defaults. "
+            "Exceeded limits are listed in the result's 'limit_exceeded'."
+        ),
+        "properties": {
+            "cpu_seconds": {"type": "integer", "description": "CPU time (RLIMIT_CPU)."},
+            "memory_bytes": {"type": "integer", "description": "Address space per process (RLIMIT_AS)."},
+            "open_files": {"type": "integer", "description": "Open file descriptors per process (RLIMIT_NOFILE)."},
+            "processes": {
+                "type": "integer",
+                "description": (
+                    "RLIMIT_NPROC. Counts every process of the server's user, not just this command's, "
+                    "so it must exceed what the user already runs; ignored when the server runs as root."
+                ),
+            },
+            "output_bytes": {"type": "integer", "description": "Total stdout+stderr bytes before the command is killed."},
+        },
+        "additionalProperties": False,
+    },
+}
+
+_SESSION_PROPERTY = {
+    "session": {
+        "type": "string",
+        "description": (
+            "Optional name of a persistent shell session. Commands in the same session run in one "
+            "long-lived shell, so cd, exports and shell variables carry over between calls."
+        ),
+    },
+}
+
+_CACHE_PROPERTIES = {
+    "cache": {
+        "type": "boolean",
+        "description": (
+            "Mark the command as read-only and idempotent: a successful result is cached and reused "
+            "for the same command, cwd, limits and cache_inputs until the inputs change or the entry "
+            "expires (default false)."
+        ),
+    },
+    "cache_inputs": {
+        "type": "array",
+        "items": {"type": "string"},
+        "description": (
+            "Paths the output depends on; their mtime and size are part of the cache key. A directory's "
+            "mtime only changes when entries are added, removed or renamed."
+        ),
+    },
+}
+
+_JOB_ID_PROPERTY = {"job_id": {"type": "string", "description": "Id returned by job_start."}}
+
+
 @server.list_tools()
 async def list_tools() -> List[Tool]:
     return [
         Tool(
             name="terminal",
-            description="Run a shell command on the host and return stdout, stderr, and exit code.",
+            description=(
+                "Run a shell command on the host and return stdout, stderr, and exit code. "
+                "If the request carries a progressToken, output lines are streamed as progress "
+                "notifications while the command runs."
+            ),
+            inputSchema={
+                "type": "object",
+                "properties": {**_COMMAND_PROPERTIES, **_SESSION_PROPERTY, **_CACHE_PROPERTIES},
+                "required": ["command"],
+                "additionalProperties": False,
+            },
+        ),
+        Tool(
+            name="terminal_batch",
+            description=(
+                "Run several shell commands in one call. Commands without a dependency between them "
+                "run in parallel under the server's concurrency limit; a command starts only after "
+                "everything in its depends_on succeeded. With stop_on_failure (default), the first "
+                "failure stops any command that has not started yet. Returns per-command results "
+                "and the total wall time."
+            ),
             inputSchema={
                 "type": "object",
                 "properties": {
-                    "command": {
-                        "type": "string",
-                        "description": "The shell command to execute as a single string.",
+                    "commands": {
+                        "type": "array",
+                        "description": f"Up to {BATCH_MAX_COMMANDS} commands.",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "id": {"type": "string", "description": "Name used in depends_on and results (default: the index)."},
+                                "depends_on": {"type": "array", "items": {"type": "string"}},
+                                **{k: v for k, v in _COMMAND_PROPERTIES.items() if k not in ("priority", "client_id")},
+                            },
+                            "required": ["command"],
+                            "additionalProperties": False,
+                        },
                     },
+                    "stop_on_failure": {"type": "boolean", "description": "Skip commands not yet started once one fails (default true)."},
+                    "priority": _COMMAND_PROPERTIES["priority"],
+                    "client_id": _COMMAND_PROPERTIES["client_id"],
+                },
+                "required": ["commands"],
+                "additionalProperties": False,
+            },
+        ),
+        Tool(
+            name="job_start",
+            description=(
+                "Start a shell command in the background and return its job_id immediately. "
+                "Poll with job_status, block with job_wait, stop with job_cancel."
+            ),
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    **_COMMAND_PROPERTIES,
                     "timeout_seconds": {
                         "type": "number",
-                        "description": "Optional timeout in seconds before the process is killed (default 60).",
+                        "description": f"Optional timeout in seconds before the job is killed (default {JOB_DEFAULT_TIMEOUT_SECONDS}).",
                     },
                 },
                 "required": ["command"],
                 "additionalProperties": False,
             },
-        )
+        ),
+        Tool(
+            name="job_status",
+            description=(
+                "Report a background job's state and the output produced since the given offsets. "
+                "Pass the returned stdout_offset/stderr_offset back to read only new output."
+            ),
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    **_JOB_ID_PROPERTY,
+                    "stdout_offset": {"type": "integer", "description": "Characters of stdout already read (default 0)."},
+                    "stderr_offset": {"type": "integer", "description": "Characters of stderr already read (default 0)."},
+                },
+                "required": ["job_id"],
+                "additionalProperties": False,
+            },
+        ),
+        Tool(
+            name="job_wait",
+            description=(
+                "Wait up to timeout_seconds for a background job to finish and return its result "
+                "(same shape as terminal) or its current state if it is still running."
+            ),
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    **_JOB_ID_PROPERTY,
+                    "timeout_seconds": {"type": "number", "description": "Maximum time to wait (default 30)."},
+                },
+                "required": ["job_id"],
+                "additionalProperties": False,
+            },
+        ),
+        Tool(
+            name="job_cancel",
+            description="Cancel a queued or running background job, killing its process.",
+            inputSchema={
+                "type": "object",
+                "properties": _JOB_ID_PROPERTY,
+                "required": ["job_id"],
+                "additionalProperties": False,
+            },
+        ),
+        Tool(
+            name="session_close",
+            description="Close a persistent shell session started by terminal with 'session'.",
+            inputSchema={
+                "type": "object",
+                "properties": _SESSION_PROPERTY,
+                "required": ["session"],
+                "additionalProperties": False,
+            },
+        ),
+        Tool(
+            name="read_file",
+            description=(
+                "Read part of a file without spawning a process. Returns text decoded as UTF-8 "
+                "starting at byte 'offset', plus next_offset and eof for paging."
+            ),
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "path": {"type": "string", "description": "File to read."},
+                    "offset": {"type": "integer", "description": "Byte offset to start at (default 0)."},
+                    "limit": {"type": "integer", "description": "Maximum bytes to read (default 1 MiB)."},
+                },
+                "required": ["path"],
+                "additionalProperties": False,
+            },
+        ),
+        Tool(
+            name="list_dir",
+            description="List a directory's entries with type, size and modification time.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "path": {"type": "string", "description": "Directory to list (default '.')."},
+                    "limit": {"type": "integer", "description": f"Maximum entries returned (default {LIST_DIR_DEFAULT_LIMIT})."},
+                },
+                "additionalProperties": False,
+            },
+        ),
+        Tool(
+            name="stat",
+            description="Report type, size, mode, owner and timestamps of a path (symlinks are not followed).",
+            inputSchema={
+                "type": "object",
+                "properties": {"path": {"type": "string", "description": "Path to inspect."}},
+                "required": ["path"],
+                "additionalProperties": False,
+            },
+        ),
+        Tool(
+            name="grep",
+            description=(
+                "Search files for a regular expression without spawning a process. Directories are "
+                "searched recursively; binary files are skipped. Stops after max_matches."
+            ),
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "pattern": {"type": "string", "description": "Python regular expression."},
+                    "path": {"type": "string", "description": "File or directory to search (default '.')."},
+                    "ignore_case": {"type": "boolean", "description": "Case-insensitive match (default false)."},
+                    "max_matches": {"type": "integer", "description": f"Stop after this many matches (default {GREP_DEFAULT_MAX_MATCHES})."},
+                },
+                "required": ["pattern"],
+                "additionalProperties": False,
+            },
+        ),
+        Tool(
+            name="write_file",
+            description=(
+                "Write UTF-8 text to a file. Overwrites atomically (temp file + rename) unless "
+                "append is true."
+            ),
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "path": {"type": "string", "description": "File to write."},
+                    "content": {"type": "string", "description": "Text to write."},
+                    "append": {"type": "boolean", "description": "Append instead of replacing (default false)."},
+                    "create_dirs": {"type": "boolean", "description": "Create missing parent directories (default false)."},
+                },
+                "required": ["path", "content"],
+                "additionalProperties": False,
+            },
+        ),
+        Tool(
+            name="server_stats",
+            description=(
+                "Report server health: per-tool call counts and latency histograms, spawns, timeouts, "
+                "queue depth, output bytes, cache and job counts, and current RSS."
+            ),
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "format": {
+                        "type": "string",
+                        "enum": ["json", "prometheus"],
+                        "description": "json (default) or Prometheus text exposition format.",
+                    },
+                },
+                "additionalProperties": False,
+            },
+        ),
     ]
 
 
-async def _run_shell_command(command: str, timeout_seconds: float) -> Dict[str, Any]:
-    start_time = time.perf_counter()
-    process = await asyncio.create_subprocess_shell(
-        command,
-        stdout=asyncio.subprocess.PIPE,
-        stderr=asyncio.subprocess.PIPE,
-    )
+def _env_int(name: str, default: int) -> int:
     try:
-        stdout_bytes, stderr_bytes = await asyncio.wait_for(
-            process.communicate(), timeout=timeout_seconds
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+# Per-stream cap on output kept in memory and returned; half head, half tail.
+DEFAULT_MAX_OUTPUT_BYTES = _env_int("SHELL_SERVER_MAX_OUTPUT_BYTES", 1024 * 1024)
+MAX_OUTPUT_BYTES_LIMIT = _env_int("SHELL_SERVER_MAX_OUTPUT_BYTES_LIMIT", 64 * 1024 * 1024)
+# Full output of truncated streams goes here; set SHELL_SERVER_SPILL=0 to disable.
+SPILL_ENABLED = os.environ.get("SHELL_SERVER_SPILL", "1") != "0"
+SPILL_DIR = os.environ.get("SHELL_SERVER_SPILL_DIR") or os.path.join(tempfile.gettempdir(), "shell-server-spill")
+SPILL_TTL_SECONDS = _env_int("SHELL_SERVER_SPILL_TTL_SECONDS", 3600)
+
+# Scheduler limits: commands running at once, commands waiting overall and per client.
+MAX_CONCURRENT_COMMANDS = _env_int("SHELL_SERVER_MAX_CONCURRENT", max(2, (os.cpu_count() or 1) * 2))
+MAX_QUEUED_COMMANDS = _env_int("SHELL_SERVER_MAX_QUEUED", 256)
+MAX_QUEUED_PER_CLIENT = _env_int("SHELL_SERVER_MAX_QUEUED_PER_CLIENT", 64)
+
+# Background jobs: default timeout, and how many finished jobs / for how long they are kept.
+JOB_DEFAULT_TIMEOUT_SECONDS = _env_int("SHELL_SERVER_JOB_TIMEOUT_SECONDS", 3600)
+JOB_RETENTION_COUNT = _env_int("SHELL_SERVER_JOB_RETENTION", 256)
+JOB_RETENTION_SECONDS = _env_int("SHELL_SERVER_JOB_RETENTION_SECONDS", 3600)
+# Result cache for commands marked `cache`: entry count, total output bytes, lifetime.
+CACHE_MAX_ENTRIES = _env_int("SHELL_SERVER_CACHE_MAX_ENTRIES", 512)
+CACHE_MAX_BYTES = _env_int("SHELL_SERVER_CACHE_MAX_BYTES", 64 * 1024 * 1024)
+CACHE_TTL_SECONDS = _env_int("SHELL_SERVER_CACHE_TTL_SECONDS", 300)
+BATCH_MAX_COMMANDS = _env_int("SHELL_SERVER_BATCH_MAX_COMMANDS", 64)
+
+# Persistent shell sessions: shell binary, how many are kept, and idle time before eviction.
+SESSION_SHELL = os.environ.get("SHELL_SERVER_SESSION_SHELL") or shutil.which("bash") or "/bin/sh"
+MAX_SESSIONS = _env_int("SHELL_SERVER_MAX_SESSIONS", 32)
+SESSION_IDLE_SECONDS = _env_int("SHELL_SERVER_SESSION_IDLE_SECONDS", 600)
+
+# Native file tools: reads at least this large go through mmap instead of read().
+READ_FILE_MMAP_THRESHOLD = 1024 * 1024
+LIST_DIR_DEFAULT_LIMIT = 1000
+GREP_DEFAULT_MAX_MATCHES = 200
+GREP_MAX_LINE_CHARS = 500
+# Files whose first block contains a NUL byte are treated as binary and skipped by grep.
+BINARY_SNIFF_BYTES = 8192
+
+# Resource limits, applied by exec'ing the command through util-linux `prlimit`. Server
+# defaults come from SHELL_SERVER_LIMIT_<NAME> (unset or 0 = unlimited); per-call limits
+# only tighten them.
+RLIMITS = {
+    "cpu_seconds": resource.RLIMIT_CPU,
+    "memory_bytes": resource.RLIMIT_AS,
+    "open_files": resource.RLIMIT_NOFILE,
+    "processes": resource.RLIMIT_NPROC,
+}
+PRLIMIT_OPTIONS = {
+    resource.RLIMIT_CPU: "--cpu",
+    resource.RLIMIT_AS: "--as",
+    resource.RLIMIT_NOFILE: "--nofile",
+    resource.RLIMIT_NPROC: "--nproc",
+}
+PRLIMIT = shutil.which("prlimit")
+LIMIT_NAMES = (*RLIMITS, "output_bytes")
+DEFAULT_LIMITS = {
+    name: value
+    for name in LIMIT_NAMES
+    if (value := _env_int(f"SHELL_SERVER_LIMIT_{name.upper()}", 0)) > 0
+}
+# stderr phrases that identify which limit a failed command ran into.
+LIMIT_ERROR_MARKERS = {
+    "memory_bytes": ("Cannot allocate memory", "MemoryError", "std::bad_alloc", "out of memory"),
+    "open_files": ("Too many open files",),
+    "processes": ("Resource temporarily unavailable", "fork: retry"),
+}
+
+# Output encodings for results; `auto` gzips text at least this large when that is smaller.
+OUTPUT_ENCODINGS = ("text", "base64", "gzip+base64", "auto")
+DEFAULT_OUTPUT_ENCODING = os.environ.get("SHELL_SERVER_OUTPUT_ENCODING", "text")
+AUTO_COMPRESS_BYTES = _env_int("SHELL_SERVER_AUTO_COMPRESS_BYTES", 64 * 1024)
+
+STREAM_CHUNK_BYTES = 64 * 1024
+# After the shell exits, how long to keep reading pipes still held open by its children.
+PIPE_DRAIN_SECONDS = 0.5
+# Partial lines longer than this are flushed to the client without waiting for "\n".
+STREAM_MAX_LINE_BYTES = 8 * 1024
+
+OutputCallback = Callable[[str, str], Awaitable[None]]
+
+
+class _LineSplitter:
+    """Incrementally decodes a byte stream and releases only complete lines."""
+
+    def __init__(self) -> None:
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._pending = ""
+
+    def feed(self, data: bytes) -> str:
+        text = self._pending + self._decoder.decode(data)
+        cut = text.rfind("\n") + 1
+        if cut == 0 and len(text) >= STREAM_MAX_LINE_BYTES:
+            cut = len(text)
+        self._pending = text[cut:]
+        return text[:cut]
+
+    def flush(self) -> str:
+        text = self._pending + self._decoder.decode(b"", final=True)
+        self._pending = ""
+        return text
+
+
+class _OutputCapture:
+    """
+    Bounded capture of one output stream.
+
+    Keeps the first and last `max_bytes // 2` bytes in memory. Once the stream exceeds
+    `max_bytes`, everything (including what was already buffered) is also written to a
+    spill file so the full output stays retrievable without being held in memory.
+    """
+
+    def __init__(
+        self, name: str, max_bytes: int, spill: bool = SPILL_ENABLED, budget: Optional["_OutputBudget"] = None
+    ) -> None:
+        self.name = name
+        self.max_bytes = max_bytes
+        self.budget = budget
+        self.total_bytes = 0
+        self._head_cap = max_bytes - max_bytes // 2
+        self._tail_cap = max_bytes // 2
+        self._head = bytearray()
+        self._tail = bytearray()
+        self._spill_enabled = spill
+        self._spill: Optional[Any] = None
+        self.spill_path: Optional[str] = None
+        self._sha256 = hashlib.sha256()
+
+    @property
+    def truncated(self) -> bool:
+        return self.total_bytes > self.max_bytes
+
+    def feed(self, data: bytes) -> None:
+        self.total_bytes += len(data)
+        self._sha256.update(data)
+        if self.budget is not None:
+            self.budget.charge(len(data))
+        if self._spill is not None:
+            self._spill.write(data)
+        elif self._spill_enabled and self.total_bytes > self.max_bytes:
+            # Nothing has been dropped yet, so head + tail is the whole stream so far.
+            self._spill = _open_spill_file(self.name)
+            self.spill_path = self._spill.name
+            self._spill.write(self._head)
+            self._spill.write(self._tail)
+            self._spill.write(data)
+        room = self._head_cap - len(self._head)
+        if room > 0:
+            self._head += data[:room]
+            data = data[room:]
+        if data:
+            self._tail += data
+            excess = len(self._tail) - self._tail_cap
+            if excess > 0:
+                del self._tail[:excess]
+
+    def close(self) -> None:
+        if self._spill is not None:
+            self._spill.close()
+
+    def text(self) -> str:
+        if not self.truncated:
+            return (bytes(self._head) + bytes(self._tail)).decode(errors="replace")
+        omitted = self.total_bytes - len(self._head) - len(self._tail)
+        return (
+            self._head.decode(errors="replace")
+            + f"\n... [{omitted} bytes omitted] ...\n"
+            + self._tail.decode(errors="replace")
         )
-        return_code = process.returncode
-        duration_ms = int((time.perf_counter() - start_time) * 1000)
+
+    def payload(self) -> bytes:
+        """The kept bytes: head followed directly by tail (see `metadata()["head_bytes"]`)."""
+        return bytes(self._head) + bytes(self._tail)
+
+    def metadata(self) -> Dict[str, Any]:
         return {
-            "stdout": stdout_bytes.decode(errors="replace"),
-            "stderr": stderr_bytes.decode(errors="replace"),
-            "return_code": return_code,
-            "duration_ms": duration_ms,
+            "total_bytes": self.total_bytes,
+            "kept_bytes": len(self._head) + len(self._tail),
+            "head_bytes": len(self._head),
+            "omitted_bytes": self.total_bytes - len(self._head) - len(self._tail),
+            "sha256": self._sha256.hexdigest(),
+            "spill_path": self.spill_path,
         }
-    except asyncio.TimeoutError:
+
+
+def _encode_output(data: bytes, encoding: str) -> Tuple[str, str]:
+    """Encode raw output for JSON; returns (encoding used, payload). `auto` picks per stream."""
+    if encoding == "auto":
         try:
-            process.kill()
+            data.decode("utf-8")
+            is_text = True
+        except UnicodeDecodeError:
+            is_text = False
+        if len(data) >= AUTO_COMPRESS_BYTES:
+            packed = base64.b64encode(gzip.compress(data, compresslevel=6)).decode("ascii")
+            if not is_text or len(packed) < len(data):
+                return "gzip+base64", packed
+        encoding = "text" if is_text else "base64"
+    if encoding == "text":
+        return "text", data.decode("utf-8", errors="replace")
+    if encoding == "base64":
+        return "base64", base64.b64encode(data).decode("ascii")
+    return "gzip+base64", base64.b64encode(gzip.compress(data, compresslevel=6)).decode("ascii")
+
+
+def _output_fields(stdout_buf: "_OutputCapture", stderr_buf: "_OutputCapture", encoding: str) -> Dict[str, Any]:
+    """
+    Result fields for captured output: `stdout`/`stderr`, plus `<stream>_encoding`,
+    `<stream>_bytes` and `<stream>_sha256` (of the raw kept bytes) when not plain text,
+    and per-stream `truncated` metadata with the full stream's size and sha256.
+
+    Only bytes the command wrote are encoded; server notices go in their own result field.
+    """
+    fields: Dict[str, Any] = {}
+    for cap in (stdout_buf, stderr_buf):
+        if encoding == "text":
+            fields[cap.name] = cap.text()
+            continue
+        raw = cap.payload()
+        used, fields[cap.name] = _encode_output(raw, encoding)
+        if used != "text":
+            fields[f"{cap.name}_encoding"] = used
+            fields[f"{cap.name}_bytes"] = len(raw)
+            fields[f"{cap.name}_sha256"] = hashlib.sha256(raw).hexdigest()
+    truncated = {cap.name: cap.metadata() for cap in (stdout_buf, stderr_buf) if cap.truncated}
+    if truncated:
+        fields["truncated"] = truncated
+    return fields
+
+
+class _OutputBudget:
+    """Combined stdout+stderr byte allowance of one command (the `output_bytes` limit)."""
+
+    def __init__(self, limit: int) -> None:
+        self.limit = limit
+        self.used = 0
+        self.exceeded = asyncio.Event()
+
+    def charge(self, nbytes: int) -> None:
+        self.used += nbytes
+        if self.used > self.limit:
+            self.exceeded.set()
+
+
+def _open_spill_file(stream_name: str) -> Any:
+    os.makedirs(SPILL_DIR, exist_ok=True)
+    _prune_spill_dir()
+    return tempfile.NamedTemporaryFile(
+        mode="wb", dir=SPILL_DIR, prefix="output-", suffix=f".{stream_name}", delete=False
+    )
+
+
+def _prune_spill_dir() -> None:
+    cutoff = time.time() - SPILL_TTL_SECONDS
+    try:
+        entries = list(os.scandir(SPILL_DIR))
+    except OSError:
+        return
+    for entry in entries:
+        try:
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                os.unlink(entry.path)
+        except OSError:
+            pass
+
+
+class SchedulerFull(Exception):
+    """Raised when a command cannot even be queued."""
+
+
+class _Scheduler:
+    """
+    Caps concurrently running commands; excess callers wait in a queue.
+
+    When a slot frees up, the waiter with the highest priority wins; ties go to the client
+    with the fewest commands currently running, then to the oldest waiter, so one busy
+    client cannot starve the others.
+    """
+
+    def __init__(self, max_concurrent: int, max_queued: int, max_queued_per_client: int) -> None:
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queued = max_queued
+        self.max_queued_per_client = max_queued_per_client
+        self.running = 0
+        self._running_by_client: Dict[str, int] = {}
+        self._queued_by_client: Dict[str, int] = {}
+        self._waiters: List[List[Any]] = []  # [priority, seq, client, future]
+        self._seq = itertools.count()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    @asynccontextmanager
+    async def slot(self, client: str, priority: int = 0) -> AsyncIterator[float]:
+        """Hold a run slot for the duration of the block; yields the queue wait in ms."""
+        start = time.perf_counter()
+        await self._acquire(client, priority)
+        try:
+            yield (time.perf_counter() - start) * 1000
         finally:
-            await process.wait()
-        duration_ms = int((time.perf_counter() - start_time) * 1000)
-        return {
-            "stdout": "",
-            "stderr": f"Process timed out after {timeout_seconds} seconds",
-            "return_code": -1,
-            "duration_ms": duration_ms,
-        }
+            self._release(client)
+
+    async def _acquire(self, client: str, priority: int) -> None:
+        if self.running < self.max_concurrent and not self._waiters:
+            self._grant(client)
+            return
+        if len(self._waiters) >= self.max_queued:
+            raise SchedulerFull(f"Server busy: {len(self._waiters)} commands already queued")
+        if self._queued_by_client.get(client, 0) >= self.max_queued_per_client:
+            raise SchedulerFull(f"Too many queued commands for client {client!r}")
+        future = asyncio.get_running_loop().create_future()
+        waiter = [priority, next(self._seq), client, future]
+        self._waiters.append(waiter)
+        self._queued_by_client[client] = self._queued_by_client.get(client, 0) + 1
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Granted a slot just as we were cancelled: hand it on.
+                self._release(client)
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+                self._dequeued(client)
+            raise
 
+    def _grant(self, client: str) -> None:
+        self.running += 1
+        self._running_by_client[client] = self._running_by_client.get(client, 0) + 1
 
-@server.call_tool()
-async def call_tool(name: str, arguments: Dict[str, Any] | None) -> Any:
-    if name != "terminal":
+    def _dequeued(self, client: str) -> None:
+        left = self._queued_by_client[client] - 1
+        if left:
+            self._queued_by_client[client] = left
+        else:
+            del self._queued_by_client[client]
+
+    def _release(self, client: str) -> None:
+        self.running -= 1
+        left = self._running_by_client[client] - 1
+        if left:
+            self._running_by_client[client] = left
+        else:
+            del self._running_by_client[client]
+        while self._waiters and self.running < self.max_concurrent:
+            waiter = min(
+                self._waiters,
+                key=lambda w: (-w[0], self._running_by_client.get(w[2], 0), w[1]),
+            )
+            self._waiters.remove(waiter)
+            _, _, next_client, future = waiter
+            self._dequeued(next_client)
+            if future.done():
+                continue
+            self._grant(next_client)
+            future.set_result(None)
+
+
+scheduler = _Scheduler(MAX_CONCURRENT_COMMANDS, MAX_QUEUED_COMMANDS, MAX_QUEUED_PER_CLIENT)
+
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is unbounded.
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+
+class _LatencyHistogram:
+    def __init__(self) -> None:
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self.sum_ms = 0.0
+
+    def observe(self, ms: float) -> None:
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.sum_ms += ms
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-quantile (None past the last bound)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(LATENCY_BUCKETS_MS, self.counts):
+            seen += n
+            if seen >= rank:
+                return float(bound)
+        return None
+
+    def snapshot(self) -> Dict[str, Any]:
         return {
-            "type": "text",
-            "text": json.dumps({"error": f"Unknown tool: {name}"}),
+            "count": self.count,
+            "mean_ms": round(self.sum_ms / self.count, 3) if self.count else None,
+            "p50_ms": self.quantile(0.5),
+            "p99_ms": self.quantile(0.99),
+            "buckets": {f"le_{bound}": n for bound, n in zip(LATENCY_BUCKETS_MS, self.counts)}
+            | {"le_inf": self.counts[-1]},
         }
 
-    if arguments is None or not isinstance(arguments, dict):
-        return {
-            "type": "text",
-            "text": json.dumps({"error": "Missing arguments object"}),
+
+class _Metrics:
+    """Process-wide counters reported by the `server_stats` tool."""
+
+    def __init__(self) -> None:
+        self.started = time.time()
+        self.latency: Dict[str, _LatencyHistogram] = {}
+        self.calls: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+        self.spawns = 0
+        self.session_spawns = 0
+        self.timeouts = 0
+        self.cancellations = 0
+        self.limit_exceeded: Dict[str, int] = {}
+        self.output_bytes_captured = 0
+        self.response_bytes = 0
+
+    def observe_call(self, tool: str, ms: float, error: bool, response_bytes: int) -> None:
+        self.calls[tool] = self.calls.get(tool, 0) + 1
+        if error:
+            self.errors[tool] = self.errors.get(tool, 0) + 1
+        self.latency.setdefault(tool, _LatencyHistogram()).observe(ms)
+        self.response_bytes += response_bytes
+
+    def observe_command(self, result: Dict[str, Any], captured_bytes: int) -> None:
+        self.output_bytes_captured += captured_bytes
+        if result.get("timed_out"):
+            self.timeouts += 1
+        for name in result.get("limit_exceeded", ()):
+            self.limit_exceeded[name] = self.limit_exceeded.get(name, 0) + 1
+
+
+metrics = _Metrics()
+
+
+def _rss_bytes() -> Optional[int]:
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+async def _pump_stream(
+    stream: asyncio.StreamReader,
+    name: str,
+    sink: _OutputCapture,
+    on_output: Optional[OutputCallback],
+    first_output: List[float],
+    sentinel: Optional[bytes] = None,
+) -> Optional[bytes]:
+    """
+    Copy `stream` into `sink` (and `on_output`, line by line) until EOF.
+
+    With `sentinel`, stop at its first occurrence instead and return the rest of the
+    sentinel's line; returns None if EOF comes first.
+    """
+    splitter = _LineSplitter() if on_output is not None else None
+
+    async def emit(data: bytes) -> None:
+        if not data:
+            return
+        if not first_output:
+            first_output.append(time.perf_counter())
+        sink.feed(data)
+        if splitter is not None:
+            lines = splitter.feed(data)
+            if lines:
+                await on_output(name, lines)
+
+    trailer: Optional[bytes] = None
+    # Bytes that might be the start of a sentinel split across reads are held back.
+    keep = len(sentinel) - 1 if sentinel else 0
+    pending = b""
+    while True:
+        chunk = await stream.read(STREAM_CHUNK_BYTES)
+        if not chunk:
+            await emit(pending)
+            break
+        if sentinel is None:
+            await emit(chunk)
+            continue
+        pending += chunk
+        idx = pending.find(sentinel)
+        if idx >= 0:
+            await emit(pending[:idx])
+            rest = pending[idx + len(sentinel):]
+            while b"\n" not in rest:
+                more = await stream.read(STREAM_CHUNK_BYTES)
+                if not more:
+                    break
+                rest += more
+            trailer = rest.split(b"\n", 1)[0]
+            break
+        if len(pending) > keep:
+            await emit(pending[:len(pending) - keep])
+            pending = pending[len(pending) - keep:]
+    if splitter is not None:
+        rest_text = splitter.flush()
+        if rest_text:
+            await on_output(name, rest_text)
+    return trailer
+
+
+def _kill_group(pgid: int) -> None:
+    try:
+        os.killpg(pgid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+async def _wait4(pid: int) -> Tuple[int, Any]:
+    """Reap `pid` without blocking the loop; returns (exit code, resource usage)."""
+    loop = asyncio.get_running_loop()
+    try:
+        pidfd = os.pidfd_open(pid)
+    except (AttributeError, OSError):
+        _, status, usage = await loop.run_in_executor(None, os.wait4, pid, 0)
+        return os.waitstatus_to_exitcode(status), usage
+    try:
+        exited = loop.create_future()
+        loop.add_reader(pidfd, lambda: exited.done() or exited.set_result(None))
+        try:
+            await exited
+        finally:
+            loop.remove_reader(pidfd)
+        _, status, usage = os.wait4(pid, 0)
+        return os.waitstatus_to_exitcode(status), usage
+    finally:
+        os.close(pidfd)
+
+
+async def _read_pipe(pipe: Any) -> Tuple[asyncio.StreamReader, asyncio.BaseTransport]:
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader(loop=loop)
+    transport, _ = await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader, loop=loop), pipe)
+    return reader, transport
+
+
+def _rlimit_values(limits: Dict[str, int]) -> Dict[int, Tuple[int, int]]:
+    """(soft, hard) per resource for the rlimit-backed entries of `limits`, within our own hard limits."""
+    values = {}
+    for name, value in limits.items():
+        if name not in RLIMITS:
+            continue
+        res = RLIMITS[name]
+        _, hard = resource.getrlimit(res)
+        if hard != resource.RLIM_INFINITY:
+            value = min(value, hard)
+        # For CPU the soft limit sends SIGXCPU; the hard limit one second later is SIGKILL.
+        new_hard = value + 1 if res == resource.RLIMIT_CPU else value
+        if hard != resource.RLIM_INFINITY:
+            new_hard = min(new_hard, hard)
+        values[res] = (value, new_hard)
+    return values
+
+
+def _limited_argv(argv: List[str], values: Dict[int, Tuple[int, int]]) -> List[str]:
+    """
+    Prefix `argv` with `prlimit`, which sets `values` on itself and execs the command.
+
+    The limits are in place before the command runs, and the spawn needs no preexec_fn:
+    that would run Python in a child forked from a multi-threaded server, which can
+    deadlock on locks held by other threads at fork time.
+    """
+    if not values or PRLIMIT is None:
+        return argv
+    options = [f"{PRLIMIT_OPTIONS[res]}={soft}:{hard}" for res, (soft, hard) in values.items()]
+    return [PRLIMIT, *options, "--", *argv]
+
+
+def _apply_rlimits(pid: int, values: Dict[int, Tuple[int, int]]) -> None:
+    """Fallback without `prlimit`: limit the child after it started (it runs unlimited until then)."""
+    if PRLIMIT is not None:
+        return
+    for res, value in values.items():
+        try:
+            resource.prlimit(pid, res, value)
+        except ProcessLookupError:
+            return
+
+
+def _limits_exceeded(limits: Dict[str, int], usage: Any, return_code: int, stderr: str, output_exceeded: bool) -> List[str]:
+    exceeded = []
+    cpu = limits.get("cpu_seconds")
+    if cpu is not None and (
+        usage.ru_utime + usage.ru_stime >= cpu * 0.99 or return_code in (-signal.SIGXCPU, 128 + signal.SIGXCPU)
+    ):
+        exceeded.append("cpu_seconds")
+    if return_code != 0:
+        for name, markers in LIMIT_ERROR_MARKERS.items():
+            if name in limits and any(marker in stderr for marker in markers):
+                exceeded.append(name)
+    if output_exceeded:
+        exceeded.append("output_bytes")
+    return exceeded
+
+
+async def _run_shell_command(
+    command: str,
+    timeout_seconds: float,
+    on_output: Optional[OutputCallback] = None,
+    max_output_bytes: int = DEFAULT_MAX_OUTPUT_BYTES,
+    limits: Optional[Dict[str, int]] = None,
+    output_encoding: str = DEFAULT_OUTPUT_ENCODING,
+) -> Dict[str, Any]:
+    """
+    Run `command` in a shell, reading stdout/stderr incrementally.
+
+    `on_output(stream_name, text)` is awaited with complete lines as they arrive, so
+    callers can forward output before the command exits. At most `max_output_bytes`
+    per stream are kept in memory (see `_OutputCapture`).
+
+    The shell leads its own session and process group; on timeout or cancellation the
+    whole group is killed, so grandchildren cannot keep the pipes (and the slot) busy.
+    The shell is reaped with wait4, and its rusage is reported in the result.
+
+    `limits` (see RLIMITS) are applied through `prlimit` before the shell starts;
+    `output_bytes` is enforced here by killing the group. Limits that were hit are listed
+    in `limit_exceeded`.
+    """
+    limits = DEFAULT_LIMITS if limits is None else limits
+    start_time = time.perf_counter()
+    metrics.spawns += 1
+    rlimits = _rlimit_values(limits)
+    process = subprocess.Popen(
+        _limited_argv(["/bin/sh", "-c", command], rlimits),
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        start_new_session=True,
+    )
+    _apply_rlimits(process.pid, rlimits)
+    exit_waiter = asyncio.ensure_future(_wait4(process.pid))
+    transports: List[asyncio.BaseTransport] = []
+    budget = _OutputBudget(limits["output_bytes"]) if "output_bytes" in limits else None
+    stdout_buf = _OutputCapture("stdout", max_output_bytes, budget=budget)
+    stderr_buf = _OutputCapture("stderr", max_output_bytes, budget=budget)
+    timed_out = False
+    try:
+        stdout_reader, transport = await _read_pipe(process.stdout)
+        transports.append(transport)
+        stderr_reader, transport = await _read_pipe(process.stderr)
+        transports.append(transport)
+        first_output: List[float] = []
+        pumps = asyncio.gather(
+            _pump_stream(stdout_reader, "stdout", stdout_buf, on_output, first_output),
+            _pump_stream(stderr_reader, "stderr", stderr_buf, on_output, first_output),
+        )
+        # Cancelled pumps must not log "exception was never retrieved".
+        pumps.add_done_callback(lambda f: f.cancelled() or f.exception())
+        over_budget = asyncio.ensure_future(budget.exceeded.wait()) if budget is not None else None
+        try:
+            done, _ = await asyncio.wait(
+                [f for f in (exit_waiter, over_budget) if f is not None],
+                timeout=timeout_seconds,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if not done:
+                timed_out = True
+                _kill_group(process.pid)
+            elif exit_waiter not in done:
+                _kill_group(process.pid)
+            # Drain what is still buffered in the pipes. Background children that outlive
+            # the shell and keep the pipes open are not waited for beyond the grace period.
+            await asyncio.wait([pumps], timeout=PIPE_DRAIN_SECONDS)
+        finally:
+            pumps.cancel()
+            if over_budget is not None:
+                over_budget.cancel()
+        return_code, usage = await exit_waiter
+    except asyncio.CancelledError:
+        # Cancelled by the caller (e.g. job_cancel): don't leave the command running.
+        metrics.cancellations += 1
+        _kill_group(process.pid)
+        await asyncio.wait([exit_waiter], timeout=1)
+        raise
+    finally:
+        for transport in transports:
+            transport.close()
+        stdout_buf.close()
+        stderr_buf.close()
+        if exit_waiter.done() and not exit_waiter.cancelled() and exit_waiter.exception() is None:
+            # Keep Popen from reporting a still-running child when it is collected.
+            process.returncode = exit_waiter.result()[0]
+    duration_ms = int((time.perf_counter() - start_time) * 1000)
+    # Output produced before a timeout is kept.
+    result: Dict[str, Any] = {
+        **_output_fields(stdout_buf, stderr_buf, output_encoding),
+        "return_code": return_code,
+        "duration_ms": duration_ms,
+        "first_output_ms": int((first_output[0] - start_time) * 1000) if first_output else None,
+        # Covers the shell and the children it waited for. On Linux, max RSS never drops
+        # below what the forked shell inherited from this server before exec.
+        "rusage": {
+            "user_ms": round(usage.ru_utime * 1000, 3),
+            "sys_ms": round(usage.ru_stime * 1000, 3),
+            "max_rss_kb": usage.ru_maxrss,
+        },
+    }
+    if limits:
+        result["limits"] = limits
+        exceeded = _limits_exceeded(
+            limits, usage, return_code, stderr_buf.text(), budget is not None and budget.exceeded.is_set()
+        )
+        if exceeded:
+            result["limit_exceeded"] = exceeded
+    if timed_out:
+        result["return_code"] = -1
+        result["timed_out"] = True
+        result["notice"] = f"Process timed out after {timeout_seconds} seconds"
+    metrics.observe_command(result, stdout_buf.total_bytes + stderr_buf.total_bytes)
+    return result
+
+
+class _ShellSession:
+    """
+    A long-lived shell that runs commands one at a time, keeping cwd and environment.
+
+    Each command is sent as `eval '<command>'` followed by printf's of a random sentinel on
+    stdout (with the exit code and $PWD) and on stderr; output is read up to the sentinels.
+    The shell gets its own process group, so a timeout or cancel kills it and anything it
+    started; the next command then transparently starts a fresh shell.
+    """
+
+    def __init__(self, key: Tuple[str, str]) -> None:
+        self.key = key
+        self.lock = asyncio.Lock()
+        self.last_used = time.monotonic()
+        self.commands = 0
+        self.users = 0
+        self.cwd: Optional[str] = None
+        self._process: Optional[asyncio.subprocess.Process] = None
+
+    @property
+    def alive(self) -> bool:
+        return self._process is not None and self._process.returncode is None
+
+    @property
+    def busy(self) -> bool:
+        return self.users > 0 or self.lock.locked()
+
+    async def run(
+        self,
+        command: str,
+        timeout_seconds: float,
+        on_output: Optional[OutputCallback] = None,
+        max_output_bytes: int = DEFAULT_MAX_OUTPUT_BYTES,
+        output_encoding: str = DEFAULT_OUTPUT_ENCODING,
+    ) -> Dict[str, Any]:
+        async with self.lock:
+            return await self.run_locked(command, timeout_seconds, on_output, max_output_bytes, output_encoding)
+
+    async def run_locked(
+        self,
+        command: str,
+        timeout_seconds: float,
+        on_output: Optional[OutputCallback] = None,
+        max_output_bytes: int = DEFAULT_MAX_OUTPUT_BYTES,
+        output_encoding: str = DEFAULT_OUTPUT_ENCODING,
+    ) -> Dict[str, Any]:
+        """`run` for a caller that already holds `self.lock`."""
+        try:
+            return await self._run(command, timeout_seconds, on_output, max_output_bytes, output_encoding)
+        finally:
+            self.last_used = time.monotonic()
+
+    async def _run(
+        self,
+        command: str,
+        timeout_seconds: float,
+        on_output: Optional[OutputCallback],
+        max_output_bytes: int,
+        output_encoding: str,
+    ) -> Dict[str, Any]:
+        start_time = time.perf_counter()
+        reset = False
+        if not self.alive:
+            reset = self.commands > 0
+            metrics.session_spawns += 1
+            # A CPU limit would accumulate over the shell's lifetime, so sessions only
+            # get the server's memory/file/process defaults.
+            rlimits = _rlimit_values({k: v for k, v in DEFAULT_LIMITS.items() if k != "cpu_seconds"})
+            self._process = await asyncio.create_subprocess_exec(
+                *_limited_argv([SESSION_SHELL], rlimits),
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                start_new_session=True,
+            )
+            _apply_rlimits(self._process.pid, rlimits)
+        process = self._process
+        self.commands += 1
+        token = f"__shell_server_{uuid.uuid4().hex}__"
+        process.stdin.write(
+            (
+                f"eval {shlex.quote(command)} </dev/null\n"
+                f"printf '%s %d %s\\n' '{token}' \"$?\" \"$PWD\"; printf '%s\\n' '{token}' >&2\n"
+            ).encode()
+        )
+
+        stdout_buf = _OutputCapture("stdout", max_output_bytes)
+        stderr_buf = _OutputCapture("stderr", max_output_bytes)
+        first_output: List[float] = []
+        sentinel = token.encode()
+        pumps = asyncio.gather(
+            _pump_stream(process.stdout, "stdout", stdout_buf, on_output, first_output, sentinel),
+            _pump_stream(process.stderr, "stderr", stderr_buf, on_output, first_output, sentinel),
+        )
+        pumps.add_done_callback(lambda f: f.cancelled() or f.exception())
+        timed_out = False
+        trailer: Optional[bytes] = None
+        try:
+            await process.stdin.drain()
+            trailer, _ = await asyncio.wait_for(pumps, timeout=timeout_seconds)
+        except asyncio.CancelledError:
+            metrics.cancellations += 1
+            await self.close()
+            raise
+        except asyncio.TimeoutError:
+            timed_out = True
+            await self.close()
+        except (BrokenPipeError, ConnectionResetError):
+            # The shell died before reading the command (e.g. a previous `exit`).
+            pass
+        finally:
+            stdout_buf.close()
+            stderr_buf.close()
+
+        return_code: Optional[int]
+        if trailer is not None:
+            code, _, cwd = trailer.decode(errors="replace").strip().partition(" ")
+            return_code = int(code)
+            self.cwd = cwd
+        else:
+            # The command ended the shell itself (`exit`, `exec`, a fatal error).
+            if not timed_out:
+                await self.close()
+            return_code = process.returncode
+        result: Dict[str, Any] = {
+            **_output_fields(stdout_buf, stderr_buf, output_encoding),
+            "return_code": return_code,
+            "duration_ms": int((time.perf_counter() - start_time) * 1000),
+            "first_output_ms": int((first_output[0] - start_time) * 1000) if first_output else None,
+            "session": self.key[1],
+            "cwd": self.cwd,
         }
+        if reset:
+            result["session_reset"] = True
+        if timed_out:
+            result["return_code"] = -1
+            result["timed_out"] = True
+            result["notice"] = f"Process timed out after {timeout_seconds} seconds; session restarted"
+        metrics.observe_command(result, stdout_buf.total_bytes + stderr_buf.total_bytes)
+        return result
+
+    async def close(self) -> None:
+        """Kill the shell's process group; the next `run` starts a new shell."""
+        process = self._process
+        if process is None:
+            return
+        if process.returncode is None:
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        if process.stdin is not None:
+            process.stdin.close()
+        await asyncio.wait([asyncio.ensure_future(process.wait())], timeout=1)
+
+
+class _SessionPool:
+    """
+    Sessions keyed by (client, name); least recently used idle sessions are evicted.
+
+    `client` is the server-side ID of the MCP session (see `_session_client_id`), never a
+    value the caller chose, so one client cannot reach another's shells.
+    """
+
+    def __init__(self, max_sessions: int, idle_seconds: float) -> None:
+        self.max_sessions = max_sessions
+        self.idle_seconds = idle_seconds
+        self._sessions: Dict[Tuple[str, str], _ShellSession] = {}
+        self._reaper: Optional["asyncio.Task[None]"] = None
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    @asynccontextmanager
+    async def use(self, client: str, name: str) -> AsyncIterator[_ShellSession]:
+        """
+        Yield the session for (client, name), creating it on first use.
+
+        The session is busy from the lookup to the end of the block, so neither eviction nor
+        the idle reaper can close it before the caller has taken its lock.
+        """
+        key = (client, name)
+        while True:
+            session = self._sessions.get(key)
+            if session is not None:
+                break
+            if len(self._sessions) < self.max_sessions:
+                session = self._sessions[key] = _ShellSession(key)
+                if self._reaper is None or self._reaper.done():
+                    self._reaper = asyncio.create_task(self._reap_idle())
+                break
+            idle = [s for s in self._sessions.values() if not s.busy]
+            if not idle:
+                raise ToolArgumentError(f"Too many shell sessions (max {self.max_sessions}) and all are busy")
+            await self.close(*min(idle, key=lambda s: s.last_used).key)
+        session.users += 1
+        try:
+            yield session
+        finally:
+            session.users -= 1
+            if not session.users and self._sessions.get(key) is not session:
+                # Closed while in use: don't leave a shell the last command restarted behind.
+                await session.close()
+
+    async def close(self, client: str, name: str) -> bool:
+        session = self._sessions.pop((client, name), None)
+        if session is None:
+            return False
+        await session.close()
+        return True
+
+    async def close_client(self, client: str) -> int:
+        """Close every session of `client`; returns how many there were."""
+        keys = [key for key in self._sessions if key[0] == client]
+        for key in keys:
+            await self.close(*key)
+        return len(keys)
+
+    async def _reap_idle(self) -> None:
+        while self._sessions:
+            await asyncio.sleep(min(60.0, self.idle_seconds))
+            cutoff = time.monotonic() - self.idle_seconds
+            for session in list(self._sessions.values()):
+                if not session.busy and session.last_used < cutoff:
+                    await self.close(*session.key)
+
+
+sessions = _SessionPool(MAX_SESSIONS, SESSION_IDLE_SECONDS)
 
+
+def _progress_reporter() -> Optional[OutputCallback]:
+    """Forward output lines as MCP progress notifications if the client sent a progressToken."""
+    try:
+        ctx = server.request_context
+    except LookupError:
+        return None
+    token = getattr(ctx.meta, "progressToken", None) if ctx.meta is not None else None
+    if token is None:
+        return None
+    sent = 0
+
+    async def report(stream: str, text: str) -> None:
+        nonlocal sent
+        sent += len(text)
+        message = text if stream == "stdout" else f"[{stream}] {text}"
+        try:
+            await ctx.session.send_progress_notification(
+                token, float(sent), message=message, related_request_id=ctx.request_id
+            )
+        except Exception:
+            # A client that went away must not fail the command itself.
+            pass
+
+    return report
+
+
+# Server-side ID of the MCP session a request arrived on. `_SessionCountingServer.run` sets a
+# fresh one per HTTP session; stdio serves a single client.
+_client_id: ContextVar[str] = ContextVar("shell_server_client_id", default="local")
+
+
+def _session_client_id() -> str:
+    return _client_id.get()
+
+
+class ToolArgumentError(ValueError):
+    """Invalid tool arguments; reported to the client as {"error": ...}."""
+
+
+def _error(message: str, **extra: Any) -> Dict[str, Any]:
+    return {"type": "text", "text": json.dumps({"error": message, **extra})}
+
+
+def _positive_number(arguments: Dict[str, Any], name: str, default: float) -> float:
+    value = arguments.get(name, default)
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ToolArgumentError(f"'{name}' must be a number") from None
+    if not math.isfinite(number) or number <= 0:
+        raise ToolArgumentError(f"'{name}' must be a finite number > 0")
+    return number
+
+
+def _int_argument(arguments: Dict[str, Any], name: str, default: int, low: int, high: Optional[int] = None) -> int:
+    value = arguments.get(name, default)
+    if isinstance(value, bool) or not isinstance(value, int) or value < low or (high is not None and value > high):
+        bounds = f"in {low}..{high}" if high is not None else f">= {low}"
+        raise ToolArgumentError(f"'{name}' must be an integer {bounds}")
+    return value
+
+
+def _command_options(arguments: Dict[str, Any], default_timeout: float) -> Dict[str, Any]:
+    """Validate the arguments shared by `terminal` and `job_start`."""
     command = arguments.get("command")
     if not isinstance(command, str) or not command.strip():
-        return {
-            "type": "text",
-            "text": json.dumps({"error": "Argument 'command' must be a non-empty string"}),
+        raise ToolArgumentError("Argument 'command' must be a non-empty string")
+    priority = arguments.get("priority", 0)
+    if isinstance(priority, bool) or not isinstance(priority, int):
+        raise ToolArgumentError("'priority' must be an integer")
+    client_id = arguments.get("client_id")
+    if client_id is not None and not isinstance(client_id, str):
+        raise ToolArgumentError("'client_id' must be a string")
+    return {
+        "command": command,
+        "timeout_seconds": _positive_number(arguments, "timeout_seconds", default_timeout),
+        "max_output_bytes": _int_argument(
+            arguments, "max_output_bytes", DEFAULT_MAX_OUTPUT_BYTES, 1, MAX_OUTPUT_BYTES_LIMIT
+        ),
+        "priority": priority,
+        "client_id": client_id or _session_client_id(),
+        "limits": _limits_argument(arguments),
+        "output_encoding": _choice_argument(arguments, "output_encoding", OUTPUT_ENCODINGS, DEFAULT_OUTPUT_ENCODING),
+    }
+
+
+def _choice_argument(arguments: Dict[str, Any], name: str, choices: Tuple[str, ...], default: str) -> str:
+    value = arguments.get(name, default)
+    if value not in choices:
+        raise ToolArgumentError(f"'{name}' must be one of {', '.join(choices)}")
+    return value
+
+
+def _limits_argument(arguments: Dict[str, Any]) -> Dict[str, int]:
+    """Merge per-call `limits` into the server defaults; a call can only lower a limit."""
+    requested = arguments.get("limits", {})
+    if not isinstance(requested, dict):
+        raise ToolArgumentError("'limits' must be an object")
+    limits = dict(DEFAULT_LIMITS)
+    for name, value in requested.items():
+        if name not in LIMIT_NAMES:
+            raise ToolArgumentError(f"Unknown limit {name!r}; expected one of {', '.join(LIMIT_NAMES)}")
+        if isinstance(value, bool) or not isinstance(value, int) or value <= 0:
+            raise ToolArgumentError(f"Limit {name!r} must be a positive integer")
+        limits[name] = min(value, limits.get(name, value))
+    return limits
+
+
+class _TextLog:
+    """Append-only text log addressed by absolute character offsets, keeping only the newest `max_chars`."""
+
+    def __init__(self, max_chars: int) -> None:
+        self.max_chars = max_chars
+        self.end = 0
+        self._start = 0
+        self._size = 0
+        self._chunks: Deque[str] = deque()
+
+    def append(self, text: str) -> None:
+        self._chunks.append(text)
+        self._size += len(text)
+        self.end += len(text)
+        while self._size - len(self._chunks[0]) >= self.max_chars:
+            dropped = self._chunks.popleft()
+            self._size -= len(dropped)
+            self._start += len(dropped)
+
+    def read(self, offset: int) -> Tuple[str, int]:
+        """Return (text from `offset` on, characters skipped because they were already dropped)."""
+        skipped = max(0, self._start - offset)
+        offset = max(offset, self._start)
+        return "".join(self._chunks)[offset - self._start:], skipped
+
+
+class _Job:
+    def __init__(self, job_id: str, options: Dict[str, Any]) -> None:
+        self.job_id = job_id
+        self.options = options
+        self.status = "queued"
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.queue_wait_ms: Optional[int] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.logs = {name: _TextLog(options["max_output_bytes"]) for name in ("stdout", "stderr")}
+        self.task: Optional["asyncio.Task[None]"] = None
+
+    async def run(self) -> None:
+        opts = self.options
+
+        async def on_output(stream: str, text: str) -> None:
+            self.logs[stream].append(text)
+
+        try:
+            async with scheduler.slot(opts["client_id"], opts["priority"]) as queue_wait_ms:
+                self.status = "running"
+                self.queue_wait_ms = int(queue_wait_ms)
+                result = await _run_shell_command(
+                    command=opts["command"],
+                    timeout_seconds=opts["timeout_seconds"],
+                    on_output=on_output,
+                    max_output_bytes=opts["max_output_bytes"],
+                    output_encoding=opts["output_encoding"],
+                    limits=opts["limits"],
+                )
+            result["queue_wait_ms"] = self.queue_wait_ms
+            self.result = result
+            self.status = "timed_out" if result.get("timed_out") else "exited"
+        except asyncio.CancelledError:
+            self.status = "cancelled"
+        except SchedulerFull as e:
+            self.status = "rejected"
+            self.result = {"error": str(e)}
+        except Exception as e:
+            self.status = "failed"
+            self.result = {"error": f"{type(e).__name__}: {e}"}
+        finally:
+            self.finished_at = time.time()
+
+    @property
+    def done(self) -> bool:
+        return self.finished_at is not None
+
+    def summary(self) -> Dict[str, Any]:
+        info: Dict[str, Any] = {
+            "job_id": self.job_id,
+            "status": self.status,
+            "command": self.options["command"],
+            "queue_wait_ms": self.queue_wait_ms,
+            "age_ms": int((time.time() - self.created_at) * 1000),
         }
+        if self.result is not None:
+            info.update({k: v for k, v in self.result.items() if k not in ("stdout", "stderr")})
+        return info
 
-    timeout_seconds_value = arguments.get("timeout_seconds", 60)
-    try:
-        timeout_seconds = float(timeout_seconds_value)
-        if timeout_seconds <= 0:
-            return {
-                "type": "text",
-                "text": json.dumps({"error": "'timeout_seconds' must be > 0"}),
+
+class _JobTable:
+    """In-process registry of background jobs; finished jobs are pruned by count and age."""
+
+    def __init__(self, retention_count: int, retention_seconds: float) -> None:
+        self.retention_count = retention_count
+        self.retention_seconds = retention_seconds
+        self._jobs: Dict[str, _Job] = {}
+
+    def start(self, options: Dict[str, Any]) -> _Job:
+        self._prune()
+        job = _Job(uuid.uuid4().hex[:16], options)
+        job.task = asyncio.create_task(job.run(), name=f"job-{job.job_id}")
+        self._jobs[job.job_id] = job
+        return job
+
+    def all(self) -> List[_Job]:
+        return list(self._jobs.values())
+
+    def get(self, job_id: Any) -> _Job:
+        job = self._jobs.get(job_id) if isinstance(job_id, str) else None
+        if job is None:
+            raise ToolArgumentError(f"Unknown job_id: {job_id!r}")
+        return job
+
+    def _prune(self) -> None:
+        cutoff = time.time() - self.retention_seconds
+        finished = sorted((j for j in self._jobs.values() if j.done), key=lambda j: j.finished_at)
+        excess = len(finished) - self.retention_count
+        for i, job in enumerate(finished):
+            if i < excess or job.finished_at < cutoff:
+                del self._jobs[job.job_id]
+
+
+jobs = _JobTable(JOB_RETENTION_COUNT, JOB_RETENTION_SECONDS)
+
+
+class _ResultCache:
+    """LRU cache of successful command results with a TTL and a budget on stored output bytes."""
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl_seconds: float) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple[Any, ...], Tuple[float, int, Dict[str, Any]]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Tuple[Any, ...]) -> Optional[Tuple[float, Dict[str, Any]]]:
+        """Return (stored_at, result) or None."""
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() - entry[0] > self.ttl_seconds:
+            self._drop(key)
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return entry[0], entry[2]
+
+    def put(self, key: Tuple[Any, ...], result: Dict[str, Any]) -> bool:
+        size = len(result["stdout"]) + len(result["stderr"])
+        if size > self.max_bytes:
+            return False
+        if key in self._entries:
+            self._drop(key)
+        self._entries[key] = (time.monotonic(), size, result)
+        self.bytes += size
+        while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+            self._drop(next(iter(self._entries)))
+        return True
+
+    def _drop(self, key: Tuple[Any, ...]) -> None:
+        _, size, _ = self._entries.pop(key)
+        self.bytes -= size
+
+
+result_cache = _ResultCache(CACHE_MAX_ENTRIES, CACHE_MAX_BYTES, CACHE_TTL_SECONDS)
+
+
+def _cache_key(arguments: Dict[str, Any], opts: Dict[str, Any]) -> Tuple[Any, ...]:
+    inputs = arguments.get("cache_inputs", [])
+    if not isinstance(inputs, list) or not all(isinstance(p, str) and p for p in inputs):
+        raise ToolArgumentError("'cache_inputs' must be an array of paths")
+    stamps = []
+    for path in inputs:
+        try:
+            st = os.stat(os.path.expanduser(path))
+            stamps.append((path, st.st_mtime_ns, st.st_size))
+        except OSError:
+            stamps.append((path, None, None))
+    return (
+        opts["command"],
+        os.getcwd(),
+        opts["max_output_bytes"],
+        opts["output_encoding"],
+        tuple(sorted(opts["limits"].items())),
+        tuple(stamps),
+    )
+
+
+async def _tool_terminal(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    opts = _command_options(arguments, default_timeout=60)
+    session_name = arguments.get("session")
+    if session_name is not None and (not isinstance(session_name, str) or not session_name):
+        raise ToolArgumentError("'session' must be a non-empty string")
+    if session_name is not None and "limits" in arguments:
+        raise ToolArgumentError("'limits' cannot be combined with 'session'")
+    cacheable = arguments.get("cache", False)
+    if not isinstance(cacheable, bool):
+        raise ToolArgumentError("'cache' must be a boolean")
+    if cacheable and session_name is not None:
+        raise ToolArgumentError("'cache' cannot be combined with 'session'")
+    cache_key = None
+    if cacheable:
+        cache_key = _cache_key(arguments, opts)
+        hit = result_cache.get(cache_key)
+        if hit is not None:
+            stored_at, cached = hit
+            result = {
+                **cached,
+                "queue_wait_ms": 0,
+                "cache": {"hit": True, "age_ms": int((time.monotonic() - stored_at) * 1000), "saved_ms": cached["duration_ms"]},
             }
-    except (TypeError, ValueError):
-        return {
-            "type": "text",
-            "text": json.dumps({"error": "'timeout_seconds' must be a number"}),
-        }
+            return {"type": "text", "text": json.dumps(result)}
+    try:
+        if session_name is not None:
+            # Wait for the session before taking a slot: a command queued behind a busy
+            # session must not hold a slot that another client's command could use.
+            async with sessions.use(_session_client_id(), session_name) as session, session.lock:
+                async with scheduler.slot(opts["client_id"], opts["priority"]) as queue_wait_ms:
+                    result = await session.run_locked(
+                        command=opts["command"],
+                        timeout_seconds=opts["timeout_seconds"],
+                        on_output=_progress_reporter(),
+                        max_output_bytes=opts["max_output_bytes"],
+                        output_encoding=opts["output_encoding"],
+                    )
+        else:
+            async with scheduler.slot(opts["client_id"], opts["priority"]) as queue_wait_ms:
+                result = await _run_shell_command(
+                    command=opts["command"],
+                    timeout_seconds=opts["timeout_seconds"],
+                    on_output=_progress_reporter(),
+                    max_output_bytes=opts["max_output_bytes"],
+                    output_encoding=opts["output_encoding"],
+                    limits=opts["limits"],
+                )
+    except SchedulerFull as e:
+        return _error(str(e), queued=scheduler.queued, running=scheduler.running)
+    result["queue_wait_ms"] = int(queue_wait_ms)
+    if cache_key is not None:
+        # Only clean, complete results are reused; failures and truncated output re-run.
+        stored = (
+            result["return_code"] == 0
+            and not result.get("timed_out")
+            and "truncated" not in result
+            and "limit_exceeded" not in result
+            and result_cache.put(cache_key, {k: v for k, v in result.items() if k != "queue_wait_ms"})
+        )
+        result["cache"] = {"hit": False, "stored": stored}
+    return {"type": "text", "text": json.dumps(result)}
+
+
+def _batch_steps(arguments: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Validate `terminal_batch` commands: unique ids, known dependencies, no cycles."""
+    commands = arguments.get("commands")
+    if not isinstance(commands, list) or not commands:
+        raise ToolArgumentError("'commands' must be a non-empty array")
+    if len(commands) > BATCH_MAX_COMMANDS:
+        raise ToolArgumentError(f"At most {BATCH_MAX_COMMANDS} commands per batch")
+    steps: List[Dict[str, Any]] = []
+    for index, item in enumerate(commands):
+        if not isinstance(item, dict):
+            raise ToolArgumentError(f"commands[{index}] must be an object")
+        step_id = item.get("id", str(index))
+        if not isinstance(step_id, str) or not step_id:
+            raise ToolArgumentError(f"commands[{index}].id must be a non-empty string")
+        depends_on = item.get("depends_on", [])
+        if not isinstance(depends_on, list) or not all(isinstance(d, str) for d in depends_on):
+            raise ToolArgumentError(f"commands[{index}].depends_on must be an array of ids")
+        try:
+            opts = _command_options(
+                {**item, "priority": arguments.get("priority", 0), "client_id": arguments.get("client_id")},
+                default_timeout=60,
+            )
+        except ToolArgumentError as e:
+            raise ToolArgumentError(f"commands[{index}]: {e}") from None
+        steps.append({"id": step_id, "depends_on": depends_on, "options": opts})
+
+    ids = [step["id"] for step in steps]
+    if len(set(ids)) != len(ids):
+        raise ToolArgumentError("Command ids must be unique")
+    deps = {step["id"]: step["depends_on"] for step in steps}
+    for step_id, step_deps in deps.items():
+        unknown = [d for d in step_deps if d not in deps]
+        if unknown:
+            raise ToolArgumentError(f"Command {step_id!r} depends on unknown ids: {', '.join(unknown)}")
+    # Kahn's algorithm: anything left over sits on a cycle.
+    remaining = {step_id: set(step_deps) for step_id, step_deps in deps.items()}
+    ready = [step_id for step_id, step_deps in remaining.items() if not step_deps]
+    while ready:
+        done = ready.pop()
+        del remaining[done]
+        for step_id, step_deps in remaining.items():
+            if done in step_deps:
+                step_deps.discard(done)
+                if not step_deps:
+                    ready.append(step_id)
+    if remaining:
+        raise ToolArgumentError(f"Dependency cycle among: {', '.join(sorted(remaining))}")
+    return steps
+
+
+async def _run_batch(steps: List[Dict[str, Any]], stop_on_failure: bool, on_output: Optional[OutputCallback]) -> List[Dict[str, Any]]:
+    failed = asyncio.Event()
+    tasks: Dict[str, "asyncio.Task[Dict[str, Any]]"] = {}
+
+    async def run_step(step: Dict[str, Any]) -> Dict[str, Any]:
+        step_id, opts = step["id"], step["options"]
+        upstream = [await tasks[d] for d in step["depends_on"]]
+        if any(r["status"] != "ok" for r in upstream):
+            return {"id": step_id, "status": "skipped", "reason": "dependency did not succeed"}
+        if stop_on_failure and failed.is_set():
+            return {"id": step_id, "status": "skipped", "reason": "an earlier command failed"}
+
+        step_output: Optional[OutputCallback] = None
+        if on_output is not None:
+            async def step_output(stream: str, text: str) -> None:
+                await on_output(stream, f"[{step_id}] {text}")
+
+        async with scheduler.slot(opts["client_id"], opts["priority"]) as queue_wait_ms:
+            # Re-check: another command may have failed while this one was queued.
+            if stop_on_failure and failed.is_set():
+                return {"id": step_id, "status": "skipped", "reason": "an earlier command failed"}
+            result = await _run_shell_command(
+                command=opts["command"],
+                timeout_seconds=opts["timeout_seconds"],
+                on_output=step_output,
+                max_output_bytes=opts["max_output_bytes"],
+                output_encoding=opts["output_encoding"],
+                limits=opts["limits"],
+            )
+        result["queue_wait_ms"] = int(queue_wait_ms)
+        if result.get("timed_out"):
+            status = "timed_out"
+        else:
+            status = "ok" if result["return_code"] == 0 else "failed"
+        if status != "ok":
+            failed.set()
+        return {"id": step_id, "status": status, **result}
 
-    result = await _run_shell_command(command=command, timeout_seconds=timeout_seconds)
+    for step in steps:
+        tasks[step["id"]] = asyncio.create_task(run_step(step))
+    try:
+        return list(await asyncio.gather(*tasks.values()))
+    except BaseException:
+        for task in tasks.values():
+            task.cancel()
+        raise
+
+
+async def _tool_terminal_batch(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    steps = _batch_steps(arguments)
+    stop_on_failure = arguments.get("stop_on_failure", True)
+    if not isinstance(stop_on_failure, bool):
+        raise ToolArgumentError("'stop_on_failure' must be a boolean")
+    start = time.perf_counter()
+    try:
+        results = await _run_batch(steps, stop_on_failure, _progress_reporter())
+    except SchedulerFull as e:
+        return _error(str(e), queued=scheduler.queued, running=scheduler.running)
+    summary = {
+        "ok": all(r["status"] == "ok" for r in results),
+        "wall_ms": int((time.perf_counter() - start) * 1000),
+        "results": results,
+    }
+    return {"type": "text", "text": json.dumps(summary)}
+
+
+async def _tool_job_start(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    job = jobs.start(_command_options(arguments, default_timeout=JOB_DEFAULT_TIMEOUT_SECONDS))
+    return {"type": "text", "text": json.dumps(job.summary())}
+
+
+async def _tool_job_status(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    job = jobs.get(arguments.get("job_id"))
+    info = job.summary()
+    for stream in ("stdout", "stderr"):
+        offset = _int_argument(arguments, f"{stream}_offset", 0, 0)
+        text, skipped = job.logs[stream].read(offset)
+        info[stream] = text
+        info[f"{stream}_offset"] = job.logs[stream].end
+        if skipped:
+            info[f"{stream}_skipped"] = skipped
+    return {"type": "text", "text": json.dumps(info)}
+
+
+async def _tool_job_wait(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    job = jobs.get(arguments.get("job_id"))
+    timeout_seconds = _positive_number(arguments, "timeout_seconds", 30)
+    if not job.done and job.task is not None:
+        # shield: giving up on the wait must not cancel the job itself.
+        await asyncio.wait([asyncio.shield(job.task)], timeout=timeout_seconds)
+    if job.done and job.result is not None:
+        return {"type": "text", "text": json.dumps({**job.result, "job_id": job.job_id, "status": job.status})}
+    return {"type": "text", "text": json.dumps(job.summary())}
+
+
+async def _tool_job_cancel(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    job = jobs.get(arguments.get("job_id"))
+    if not job.done and job.task is not None:
+        job.task.cancel()
+        await asyncio.wait([job.task])
+    return {"type": "text", "text": json.dumps(job.summary())}
+
+
+async def _tool_session_close(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    name = arguments.get("session")
+    if not isinstance(name, str) or not name:
+        raise ToolArgumentError("'session' must be a non-empty string")
+    closed = await sessions.close(_session_client_id(), name)
+    return {"type": "text", "text": json.dumps({"session": name, "closed": closed})}
+
+
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def _utf8_cut(data: bytes) -> Tuple[int, int]:
+    """(bytes, missing bytes) of a UTF-8 sequence cut off at the end of `data`; (0, 0) if none."""
+    for back in range(1, min(4, len(data)) + 1):
+        lead = data[-back]
+        if lead & 0xC0 != 0x80:
+            needed = 2 if lead & 0xE0 == 0xC0 else 3 if lead & 0xF0 == 0xE0 else 4 if lead >= 0xF0 else 1
+            return (back, needed - back) if needed > back else (0, 0)
+    return 0, 0
+
+
+def _read_file(path: str, offset: int, limit: int) -> Dict[str, Any]:
+    with open(path, "rb") as fh:
+        size = os.fstat(fh.fileno()).st_size
+        end = min(size, offset + limit)
+        if offset >= end:
+            data = b""
+        elif end - offset >= READ_FILE_MMAP_THRESHOLD:
+            with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                data = mm[offset:end]
+        else:
+            fh.seek(offset)
+            data = fh.read(end - offset)
+        # Don't split a UTF-8 sequence at the end of the page; the next read starts there.
+        # A page too short for even one character is extended to hold it, so paging
+        # always makes progress.
+        if end < size:
+            cut, missing = _utf8_cut(data)
+            if cut and cut == len(data):
+                fh.seek(end)
+                data += fh.read(missing)
+            elif cut:
+                data = data[:-cut]
+    return {
+        "path": path,
+        "content": data.decode("utf-8", errors="replace"),
+        "offset": offset,
+        "next_offset": offset + len(data),
+        "size": size,
+        "eof": offset + len(data) >= size,
+    }
+
+
+def _stat_info(path: str, st: os.stat_result) -> Dict[str, Any]:
+    if stat.S_ISDIR(st.st_mode):
+        kind = "directory"
+    elif stat.S_ISREG(st.st_mode):
+        kind = "file"
+    elif stat.S_ISLNK(st.st_mode):
+        kind = "symlink"
+    else:
+        kind = "other"
+    return {
+        "path": path,
+        "type": kind,
+        "size": st.st_size,
+        "mode": oct(stat.S_IMODE(st.st_mode)),
+        "uid": st.st_uid,
+        "gid": st.st_gid,
+        "mtime": st.st_mtime,
+        "ctime": st.st_ctime,
+    }
+
+
+def _stat(path: str) -> Dict[str, Any]:
+    info = _stat_info(path, os.lstat(path))
+    if info["type"] == "symlink":
+        info["target"] = os.readlink(path)
+    return info
+
+
+def _list_dir(path: str, limit: int) -> Dict[str, Any]:
+    entries: List[Dict[str, Any]] = []
+    total = 0
+    with os.scandir(path) as it:
+        for entry in it:
+            total += 1
+            if len(entries) >= limit:
+                continue
+            try:
+                info = _stat_info(entry.name, entry.stat(follow_symlinks=False))
+            except OSError:
+                info = {"path": entry.name, "type": "unknown"}
+            info["name"] = info.pop("path")
+            entries.append(info)
+    entries.sort(key=lambda e: e["name"])
+    return {"path": path, "entries": entries, "total": total, "truncated": total > len(entries)}
+
+
+def _iter_files(path: str) -> Any:
+    if not os.path.isdir(path):
+        yield path
+        return
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            yield os.path.join(root, name)
+
+
+def _grep(pattern: "re.Pattern[bytes]", path: str, max_matches: int) -> Dict[str, Any]:
+    matches: List[Dict[str, Any]] = []
+    files_searched = 0
+    for file_path in _iter_files(path):
+        try:
+            with open(file_path, "rb") as fh:
+                if fh.read(BINARY_SNIFF_BYTES).count(b"\0"):
+                    continue
+                size = os.fstat(fh.fileno()).st_size
+                if size == 0:
+                    continue
+                files_searched += 1
+                with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    line_no, counted_to, pos = 1, 0, 0
+                    while pos <= size:
+                        m = pattern.search(mm, pos)
+                        if m is None:
+                            break
+                        start = mm.rfind(b"\n", 0, m.start()) + 1
+                        end = mm.find(b"\n", m.start())
+                        end = size if end < 0 else end
+                        line_no += mm[counted_to:start].count(b"\n")
+                        counted_to = start
+                        line = mm[start:end].decode("utf-8", errors="replace")
+                        matches.append({"path": file_path, "line": line_no, "text": line[:GREP_MAX_LINE_CHARS]})
+                        if len(matches) >= max_matches:
+                            return {"matches": matches, "files_searched": files_searched, "truncated": True}
+                        pos = end + 1
+        except (OSError, ValueError):
+            # Unreadable files and special files that can't be mapped are skipped, like grep -s.
+            continue
+    return {"matches": matches, "files_searched": files_searched, "truncated": False}
+
+
+def _write_file(path: str, content: str, append: bool, create_dirs: bool) -> Dict[str, Any]:
+    data = content.encode("utf-8")
+    parent = os.path.dirname(os.path.abspath(path))
+    if create_dirs:
+        os.makedirs(parent, exist_ok=True)
+    elif not os.path.isdir(parent):
+        # Checked up front so the error names `path`, not the temporary file.
+        raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), path)
+    if append:
+        with open(path, "ab") as fh:
+            fh.write(data)
+    else:
+        fd, tmp = tempfile.mkstemp(dir=parent, prefix=".write_file-")
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                fh.write(data)
+            # mkstemp creates 0600; keep the existing file's mode, or what open() would give.
+            mode = stat.S_IMODE(os.stat(path).st_mode) if os.path.exists(path) else 0o666 & ~_UMASK
+            os.chmod(tmp, mode)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+    return {"path": path, "bytes_written": len(data), "size": os.path.getsize(path)}
+
+
+def _path_argument(arguments: Dict[str, Any], default: Optional[str] = None) -> str:
+    path = arguments.get("path", default)
+    if not isinstance(path, str) or not path:
+        raise ToolArgumentError("'path' must be a non-empty string")
+    return os.path.expanduser(path)
+
+
+def _bool_argument(arguments: Dict[str, Any], name: str) -> bool:
+    value = arguments.get(name, False)
+    if not isinstance(value, bool):
+        raise ToolArgumentError(f"'{name}' must be a boolean")
+    return value
+
+
+async def _tool_read_file(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    path = _path_argument(arguments)
+    offset = _int_argument(arguments, "offset", 0, 0)
+    limit = _int_argument(arguments, "limit", DEFAULT_MAX_OUTPUT_BYTES, 1, MAX_OUTPUT_BYTES_LIMIT)
+    result = await asyncio.to_thread(_read_file, path, offset, limit)
     return {"type": "text", "text": json.dumps(result)}
 
 
-async def main() -> None:
+async def _tool_list_dir(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    path = _path_argument(arguments, ".")
+    limit = _int_argument(arguments, "limit", LIST_DIR_DEFAULT_LIMIT, 1)
+    result = await asyncio.to_thread(_list_dir, path, limit)
+    return {"type": "text", "text": json.dumps(result)}
+
+
+async def _tool_stat(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    result = await asyncio.to_thread(_stat, _path_argument(arguments))
+    return {"type": "text", "text": json.dumps(result)}
+
+
+async def _tool_grep(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    pattern = arguments.get("pattern")
+    if not isinstance(pattern, str) or not pattern:
+        raise ToolArgumentError("'pattern' must be a non-empty string")
+    flags = re.MULTILINE | (re.IGNORECASE if _bool_argument(arguments, "ignore_case") else 0)
+    try:
+        regex = re.compile(pattern.encode("utf-8"), flags)
+    except re.error as e:
+        raise ToolArgumentError(f"Invalid 'pattern': {e}") from None
+    max_matches = _int_argument(arguments, "max_matches", GREP_DEFAULT_MAX_MATCHES, 1)
+    result = await asyncio.to_thread(_grep, regex, _path_argument(arguments, "."), max_matches)
+    return {"type": "text", "text": json.dumps(result)}
+
+
+async def _tool_write_file(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    path = _path_argument(arguments)
+    content = arguments.get("content")
+    if not isinstance(content, str):
+        raise ToolArgumentError("'content' must be a string")
+    result = await asyncio.to_thread(
+        _write_file, path, content, _bool_argument(arguments, "append"), _bool_argument(arguments, "create_dirs")
+    )
+    return {"type": "text", "text": json.dumps(result)}
+
+
+def _stats() -> Dict[str, Any]:
+    job_states: Dict[str, int] = {}
+    for job in jobs.all():
+        job_states[job.status] = job_states.get(job.status, 0) + 1
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return {
+        "uptime_s": round(time.time() - metrics.started, 3),
+        "rss_bytes": _rss_bytes(),
+        "max_rss_kb": usage.ru_maxrss,
+        "cpu_user_s": round(usage.ru_utime, 3),
+        "cpu_sys_s": round(usage.ru_stime, 3),
+        "scheduler": {
+            "running": scheduler.running,
+            "queued": scheduler.queued,
+            "max_concurrent": scheduler.max_concurrent,
+            "max_queued": scheduler.max_queued,
+        },
+        "spawns": metrics.spawns,
+        "session_spawns": metrics.session_spawns,
+        "sessions": len(sessions),
+        "timeouts": metrics.timeouts,
+        "cancellations": metrics.cancellations,
+        "limit_exceeded": metrics.limit_exceeded,
+        "output_bytes_captured": metrics.output_bytes_captured,
+        "response_bytes": metrics.response_bytes,
+        "jobs": job_states,
+        "cache": {
+            "entries": len(result_cache),
+            "bytes": result_cache.bytes,
+            "hits": result_cache.hits,
+            "misses": result_cache.misses,
+        },
+        "tools": {
+            tool: {"calls": metrics.calls[tool], "errors": metrics.errors.get(tool, 0), **hist.snapshot()}
+            for tool, hist in sorted(metrics.latency.items())
+        },
+    }
+
+
+def _stats_text(stats: Dict[str, Any]) -> str:
+    """Render `_stats()` in the Prometheus text exposition format."""
+    lines: List[str] = []
+
+    def sample(name: str, value: Any, labels: str = "") -> None:
+        if value is not None:
+            lines.append(f"shell_server_{name}{{{labels}}} {value}" if labels else f"shell_server_{name} {value}")
+
+    for key in ("uptime_s", "rss_bytes", "max_rss_kb", "cpu_user_s", "cpu_sys_s", "spawns", "session_spawns",
+                "sessions", "timeouts", "cancellations", "output_bytes_captured", "response_bytes"):
+        sample(key, stats[key])
+    for key, value in stats["scheduler"].items():
+        sample(f"scheduler_{key}", value)
+    for key, value in stats["cache"].items():
+        sample(f"cache_{key}", value)
+    for state, n in sorted(stats["jobs"].items()):
+        sample("jobs", n, f'status="{state}"')
+    for limit, n in sorted(stats["limit_exceeded"].items()):
+        sample("limit_exceeded_total", n, f'limit="{limit}"')
+    for tool, hist in metrics.latency.items():
+        sample("tool_calls_total", metrics.calls[tool], f'tool="{tool}"')
+        sample("tool_errors_total", metrics.errors.get(tool, 0), f'tool="{tool}"')
+        cumulative = 0
+        for bound, n in zip(LATENCY_BUCKETS_MS, hist.counts):
+            cumulative += n
+            sample("tool_latency_ms_bucket", cumulative, f'tool="{tool}",le="{bound}"')
+        sample("tool_latency_ms_bucket", hist.count, f'tool="{tool}",le="+Inf"')
+        sample("tool_latency_ms_sum", round(hist.sum_ms, 3), f'tool="{tool}"')
+        sample("tool_latency_ms_count", hist.count, f'tool="{tool}"')
+    return "\n".join(lines) + "\n"
+
+
+async def _tool_server_stats(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    fmt = arguments.get("format", "json")
+    if fmt not in ("json", "prometheus"):
+        raise ToolArgumentError("'format' must be 'json' or 'prometheus'")
+    stats = _stats()
+    return {"type": "text", "text": _stats_text(stats) if fmt == "prometheus" else json.dumps(stats)}
+
+
+TOOL_HANDLERS: Dict[str, Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]] = {
+    "terminal": _tool_terminal,
+    "terminal_batch": _tool_terminal_batch,
+    "job_start": _tool_job_start,
+    "job_status": _tool_job_status,
+    "job_wait": _tool_job_wait,
+    "job_cancel": _tool_job_cancel,
+    "session_close": _tool_session_close,
+    "read_file": _tool_read_file,
+    "list_dir": _tool_list_dir,
+    "stat": _tool_stat,
+    "grep": _tool_grep,
+    "write_file": _tool_write_file,
+    "server_stats": _tool_server_stats,
+}
+
+
+@server.call_tool()
+async def call_tool(name: str, arguments: Dict[str, Any] | None) -> Any:
+    start = time.perf_counter()
+    response = await _dispatch(name, arguments)
+    text = response.get("text", "")
+    metrics.observe_call(
+        name if name in TOOL_HANDLERS else "unknown",
+        (time.perf_counter() - start) * 1000,
+        error=text.startswith('{"error"'),
+        response_bytes=len(text),
+    )
+    return response
+
+
+async def _dispatch(name: str, arguments: Dict[str, Any] | None) -> Dict[str, Any]:
+    handler = TOOL_HANDLERS.get(name)
+    if handler is None:
+        return _error(f"Unknown tool: {name}")
+
+    if arguments is None or not isinstance(arguments, dict):
+        return _error("Missing arguments object")
+
+    try:
+        return await handler(arguments)
+    except ToolArgumentError as e:
+        return _error(str(e))
+    except OSError as e:
+        return _error(f"{e.strerror or e}: {e.filename}" if e.filename else str(e), errno=e.errno)
+
+
+async def _serve_stdio() -> None:
     async with stdio_server() as (read, write):
         # Pass a proper InitializationOptions object instead of a bare dict.
         # Use the Server helper which fills in capabilities/version automatically.
         await server.run(read, write, server.create_initialization_options())
 
 
-if __name__ == "__main__":
-    asyncio.run(main())
+class _SessionCountingServer:
+    """
+    `server` as the HTTP session manager sees it, counting the MCP sessions it runs.
+
+    The manager calls `run` once per MCP session, and `run` returns when the session ends,
+    whether the client terminated it or it crashed. Each run gets a fresh client ID, which
+    the requests it handles inherit; its shell sessions are closed when it returns.
+    """
 
+    def __init__(self, inner: Server) -> None:
+        self.inner = inner
+        self.live = 0
 
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.inner, name)
+
+    async def run(self, *args: Any, **kwargs: Any) -> Any:
+        client = f"http-{uuid.uuid4().hex}"
+        token = _client_id.set(client)
+        self.live += 1
+        try:
+            return await self.inner.run(*args, **kwargs)
+        finally:
+            # Also runs when server shutdown cancels the session.
+            with anyio.CancelScope(shield=True):
+                await sessions.close_client(client)
+            self.live -= 1
+            _client_id.reset(token)
+
+
+def _http_app(max_sessions: int) -> Any:
+    """
+    ASGI app serving many MCP clients over streamable HTTP at /mcp.
+
+    Each MCP session gets its own `server.run` and a server-side client ID. Shell sessions
+    belong to that ID and are closed when the MCP session ends; it is also the default
+    scheduler fairness key. Jobs are one server-wide table: a job ID is a random token, and
+    any client holding it can read or cancel the job. New sessions while `max_sessions` are
+    live are refused with 503. GET /metrics serves `server_stats` in Prometheus format.
+    """
+    from mcp.server.streamable_http_manager import StreamableHTTPSessionManager
+    from starlette.applications import Starlette
+    from starlette.requests import Request
+    from starlette.responses import JSONResponse, PlainTextResponse
+    from starlette.routing import Mount, Route
+
+    counted = _SessionCountingServer(server)
+    manager = StreamableHTTPSessionManager(app=counted)
+    admission = asyncio.Lock()
+
+    async def handle_mcp(scope: Any, receive: Any, send: Any) -> None:
+        headers = dict(scope.get("headers") or [])
+        if b"mcp-session-id" in headers:
+            await manager.handle_request(scope, receive, send)
+            return
+        # A request without a session ID starts a session. Admitting them one at a time means
+        # each new session is counted before the next request checks the cap; the manager
+        # serializes session creation anyway.
+        async with admission:
+            if counted.live >= max_sessions:
+                response = JSONResponse(
+                    {"error": f"Too many MCP sessions ({counted.live}/{max_sessions}); retry later"},
+                    status_code=503,
+                    headers={"Retry-After": "1"},
+                )
+                await response(scope, receive, send)
+                return
+            await manager.handle_request(scope, receive, send)
+
+    async def metrics_endpoint(request: Request) -> PlainTextResponse:
+        return PlainTextResponse(_stats_text(_stats()), media_type="text/plain; version=0.0.4")
+
+    async def health(request: Request) -> JSONResponse:
+        return JSONResponse(
+            {"status": "ok", "running": scheduler.running, "queued": scheduler.queued, "mcp_sessions": counted.live}
+        )
+
+    @asynccontextmanager
+    async def lifespan(app: Any) -> AsyncIterator[None]:
+        async with manager.run():
+            yield
+
+    return Starlette(
+        routes=[
+            Mount("/mcp", app=handle_mcp),
+            Route("/metrics", metrics_endpoint),
+            Route("/health", health),
+        ],
+        lifespan=lifespan,
+    )
+
+
+async def _serve_http(host: str, port: int, max_sessions: int, max_connections: int) -> None:
+    import uvicorn
+
+    config = uvicorn.Config(
+        _http_app(max_sessions),
+        host=host,
+        port=port,
+        # uvicorn answers 503 once this many connections/requests are in flight.
+        limit_concurrency=max_connections,
+        log_level="warning",
+    )
+    await uvicorn.Server(config).serve()
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="MCP shell server")
+    parser.add_argument(
+        "--transport",
+        choices=("stdio", "http"),
+        default=os.environ.get("SHELL_SERVER_TRANSPORT", "stdio"),
+        help="stdio serves one client; http serves many over streamable HTTP at /mcp",
+    )
+    parser.add_argument("--host", default=os.environ.get("SHELL_SERVER_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=_env_int("SHELL_SERVER_PORT", 8000))
+    parser.add_argument("--max-sessions", type=int, default=_env_int("SHELL_SERVER_HTTP_MAX_SESSIONS", 64))
+    parser.add_argument("--max-connections", type=int, default=_env_int("SHELL_SERVER_HTTP_MAX_CONNECTIONS", 256))
+    args = parser.parse_args()
+    if args.transport == "http":
+        await _serve_http(args.host, args.port, args.max_sessions, args.max_connections)
+    else:
+        await _serve_stdio()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
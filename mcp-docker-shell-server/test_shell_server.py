@@ -0,0 +1,677 @@
+import asyncio
+import base64
+import gzip
+import hashlib
+import json
+import os
+import socket
+import sys
+import tempfile
+import time
+import unittest
+from contextlib import asynccontextmanager
+from unittest import mock
+
+import httpx
+import uvicorn
+from mcp import ClientSession
+from mcp.client.streamable_http import streamablehttp_client
+from mcp.shared.memory import create_connected_server_and_client_session
+
+import shell_server
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _alive(pid: int) -> bool:
+    """True while `pid` exists and is not a zombie waiting to be reaped."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().rsplit(")", 1)[1].split()[0] not in ("Z", "X")
+    except FileNotFoundError:
+        return False
+
+
+class ToolTestCase(unittest.IsolatedAsyncioTestCase):
+    """Calls the tools through an in-process MCP client session."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = tmp.name
+
+    @asynccontextmanager
+    async def client(self):
+        async with create_connected_server_and_client_session(shell_server.server) as session:
+            yield session
+
+    async def call(self, session, tool: str, /, **arguments) -> dict:
+        result = await session.call_tool(tool, arguments)
+        return json.loads(json.loads(result.content[0].text)["text"])
+
+    async def wait_dead(self, pid: int) -> None:
+        for _ in range(100):
+            if not _alive(pid):
+                return
+            await asyncio.sleep(0.02)
+        self.fail(f"process {pid} outlived its command")
+
+
+class TestScheduler(unittest.IsolatedAsyncioTestCase):
+    async def _queue(self, scheduler, order: list, client: str, priority: int = 0) -> "asyncio.Task[None]":
+        async def run() -> None:
+            async with scheduler.slot(client, priority):
+                order.append(client)
+
+        task = asyncio.create_task(run())
+        await asyncio.sleep(0)
+        return task
+
+    async def test_higher_priority_runs_first(self):
+        scheduler = shell_server._Scheduler(1, 16, 16)
+        order = []
+        async with scheduler.slot("x"):
+            tasks = [await self._queue(scheduler, order, "low"), await self._queue(scheduler, order, "high", priority=5)]
+            self.assertEqual((scheduler.running, scheduler.queued), (1, 2))
+        await asyncio.gather(*tasks)
+        self.assertEqual(order, ["high", "low"])
+        self.assertEqual((scheduler.running, scheduler.queued), (0, 0))
+
+    async def test_ties_go_to_the_client_with_fewest_running(self):
+        scheduler = shell_server._Scheduler(2, 16, 16)
+        order = []
+        async with scheduler.slot("busy"):
+            async with scheduler.slot("busy"):
+                tasks = [await self._queue(scheduler, order, "busy"), await self._queue(scheduler, order, "idle")]
+            await asyncio.sleep(0)
+            # One "busy" command is still running, so the later "idle" waiter goes first.
+            self.assertEqual(order, ["idle"])
+        await asyncio.gather(*tasks)
+        self.assertEqual(order, ["idle", "busy"])
+
+    async def test_queue_limits_and_cancelled_waiters(self):
+        scheduler = shell_server._Scheduler(1, 2, 1)
+        order = []
+        async with scheduler.slot("x"):
+            waiting = await self._queue(scheduler, order, "a")
+            with self.assertRaisesRegex(shell_server.SchedulerFull, "client 'a'"):
+                async with scheduler.slot("a"):
+                    pass
+            other = await self._queue(scheduler, order, "b")
+            with self.assertRaisesRegex(shell_server.SchedulerFull, "already queued"):
+                async with scheduler.slot("c"):
+                    pass
+            waiting.cancel()
+            await asyncio.sleep(0)
+            self.assertEqual(scheduler.queued, 1)
+        await other
+        self.assertEqual(order, ["b"])
+        self.assertEqual((scheduler.running, scheduler.queued), (0, 0))
+
+
+class TestTerminal(ToolTestCase):
+    async def test_output_lines_stream_as_progress_notifications(self):
+        updates = []
+
+        async def on_progress(progress: float, total, message) -> None:
+            updates.append((progress, message))
+
+        async with self.client() as c:
+            result = await c.call_tool(
+                "terminal",
+                {"command": "echo one; sleep 0.2; echo two >&2; sleep 0.2; echo three"},
+                progress_callback=on_progress,
+            )
+        result = json.loads(json.loads(result.content[0].text)["text"])
+        self.assertEqual((result["stdout"], result["stderr"]), ("one\nthree\n", "two\n"))
+        self.assertEqual([m for _, m in updates], ["one\n", "[stderr] two\n", "three\n"])
+        # Progress counts the characters streamed so far.
+        self.assertEqual([p for p, _ in updates], [4.0, 8.0, 14.0])
+
+    async def test_full_queue_is_reported_as_an_error(self):
+        with mock.patch.object(shell_server, "scheduler", shell_server._Scheduler(1, 0, 0)):
+            async with self.client() as c:
+                running = asyncio.create_task(self.call(c, "terminal", command="sleep 0.3"))
+                await asyncio.sleep(0.1)
+                refused = await self.call(c, "terminal", command="true")
+                self.assertIn("Server busy", refused["error"])
+                self.assertEqual((refused["running"], refused["queued"]), (1, 0))
+                self.assertEqual((await running)["return_code"], 0)
+
+    async def test_timeout_kills_the_whole_process_group(self):
+        async with self.client() as c:
+            start = time.monotonic()
+            result = await self.call(c, "terminal", command="sleep 30 & echo $!; sleep 30", timeout_seconds=0.5)
+            self.assertLess(time.monotonic() - start, 5)
+            self.assertTrue(result["timed_out"])
+            self.assertEqual(result["return_code"], -1)
+            self.assertEqual(result["notice"], "Process timed out after 0.5 seconds")
+            self.assertEqual(result["stderr"], "")
+            await self.wait_dead(int(result["stdout"]))
+
+    async def test_rusage_covers_the_commands_children(self):
+        async with self.client() as c:
+            result = await self.call(c, "terminal", command="sh -c 'i=0; while [ $i -lt 100000 ]; do i=$((i+1)); done'")
+        self.assertEqual(result["return_code"], 0)
+        self.assertGreater(result["rusage"]["user_ms"] + result["rusage"]["sys_ms"], 10)
+        self.assertGreater(result["rusage"]["max_rss_kb"], 0)
+
+    async def test_large_output_is_truncated_and_spilled(self):
+        with mock.patch.object(shell_server, "SPILL_DIR", self.tmp):
+            async with self.client() as c:
+                result = await self.call(
+                    c, "terminal", command="yes 0123456789 | head -c 50000; echo err >&2", max_output_bytes=1000
+                )
+        self.assertEqual(result["return_code"], 0)
+        self.assertIn("bytes omitted", result["stdout"])
+        self.assertEqual(result["stderr"], "err\n")
+        meta = result["truncated"]["stdout"]
+        self.assertNotIn("stderr", result["truncated"])
+        self.assertEqual((meta["total_bytes"], meta["kept_bytes"], meta["omitted_bytes"]), (50000, 1000, 49000))
+        self.assertEqual(os.path.dirname(meta["spill_path"]), self.tmp)
+        with open(meta["spill_path"], "rb") as f:
+            spilled = f.read()
+        self.assertEqual(len(spilled), 50000)
+        self.assertTrue(spilled.startswith(result["stdout"][:500].encode()))
+
+    async def test_cached_result_is_reused_until_an_input_changes(self):
+        path = os.path.join(self.tmp, "input.txt")
+        with open(path, "w") as f:
+            f.write("one\n")
+        cache = shell_server._ResultCache(16, 1 << 20, 300)
+        with mock.patch.object(shell_server, "result_cache", cache):
+            async with self.client() as c:
+
+                async def cat() -> dict:
+                    return await self.call(c, "terminal", command=f"cat {path}", cache=True, cache_inputs=[path])
+
+                first = await cat()
+                self.assertEqual(first["cache"], {"hit": False, "stored": True})
+                second = await cat()
+                self.assertTrue(second["cache"]["hit"])
+                self.assertEqual(second["stdout"], "one\n")
+
+                with open(path, "w") as f:
+                    f.write("two, longer\n")
+                third = await cat()
+                self.assertFalse(third["cache"]["hit"])
+                self.assertEqual(third["stdout"], "two, longer\n")
+
+                failed = await self.call(c, "terminal", command="false", cache=True)
+                self.assertEqual(failed["cache"], {"hit": False, "stored": False})
+        self.assertEqual((cache.hits, len(cache)), (1, 2))
+
+    def test_timeout_must_be_a_finite_positive_number(self):
+        for value in (float("nan"), float("inf"), float("-inf"), 0, "soon"):
+            with self.assertRaisesRegex(shell_server.ToolArgumentError, "^'timeout_seconds' must be a"):
+                shell_server._positive_number({"timeout_seconds": value}, "timeout_seconds", 60)
+        self.assertEqual(shell_server._positive_number({}, "timeout_seconds", 60), 60)
+
+
+class TestSessions(ToolTestCase):
+    async def test_state_carries_over_and_output_is_cut_at_the_sentinel(self):
+        async with self.client() as c:
+            try:
+                first = await self.call(c, "terminal", command=f"cd {self.tmp} && X=5 && printf partial", session="s")
+                self.assertEqual((first["stdout"], first["return_code"], first["cwd"]), ("partial", 0, self.tmp))
+
+                second = await self.call(c, "terminal", command="echo $X; echo oops >&2; false", session="s")
+                self.assertEqual((second["stdout"], second["stderr"], second["return_code"]), ("5\n", "oops\n", 1))
+
+                # The command never sees the sentinel, so it can't end the read early.
+                third = await self.call(c, "terminal", command="echo __shell_server_fake__ 0 /; pwd", session="s")
+                self.assertEqual(third["stdout"], f"__shell_server_fake__ 0 /\n{self.tmp}\n")
+            finally:
+                await self.call(c, "session_close", session="s")
+
+    async def test_exit_and_timeout_restart_the_shell(self):
+        async with self.client() as c:
+            try:
+                await self.call(c, "terminal", command="X=1", session="s")
+                exited = await self.call(c, "terminal", command="exit 3", session="s")
+                self.assertEqual(exited["return_code"], 3)
+                after_exit = await self.call(c, "terminal", command="echo ${X:-unset}", session="s")
+                self.assertEqual(after_exit["stdout"], "unset\n")
+                self.assertTrue(after_exit["session_reset"])
+
+                pid_file = os.path.join(self.tmp, "pid")
+                timed_out = await self.call(
+                    c, "terminal", command=f"sleep 30 & echo $! > {pid_file}; sleep 30", session="s", timeout_seconds=0.5
+                )
+                self.assertTrue(timed_out["timed_out"])
+                with open(pid_file) as f:
+                    await self.wait_dead(int(f.read()))
+                after_timeout = await self.call(c, "terminal", command="echo ok", session="s")
+                self.assertEqual(after_timeout["stdout"], "ok\n")
+                self.assertTrue(after_timeout["session_reset"])
+            finally:
+                await self.call(c, "session_close", session="s")
+
+    async def test_a_session_in_use_is_never_evicted(self):
+        pool = shell_server._SessionPool(1, 600)
+        async with pool.use("c", "a") as a:
+            # Fetched but not yet locked: still not a candidate for eviction.
+            with self.assertRaisesRegex(shell_server.ToolArgumentError, "all are busy"):
+                async with pool.use("c", "b"):
+                    pass
+            await a.run("true", timeout_seconds=5)
+        self.assertTrue(a.alive)
+        async with pool.use("c", "b") as b:
+            self.assertFalse(a.alive)
+            self.assertEqual(len(pool), 1)
+        await pool.close("c", "b")
+        self.assertFalse(b.alive)
+
+    async def test_command_waiting_for_a_busy_session_holds_no_slot(self):
+        with mock.patch.object(shell_server, "scheduler", shell_server._Scheduler(2, 16, 16)):
+            async with self.client() as c:
+                try:
+                    busy = [
+                        asyncio.create_task(self.call(c, "terminal", command="sleep 0.5", session="s"))
+                        for _ in range(2)
+                    ]
+                    await asyncio.sleep(0.1)
+                    free = await self.call(c, "terminal", command="true")
+                    self.assertLess(free["queue_wait_ms"], 250)
+                    self.assertEqual([(await task)["return_code"] for task in busy], [0, 0])
+                finally:
+                    await self.call(c, "session_close", session="s")
+
+
+class TestJobs(ToolTestCase):
+    async def test_job_lifecycle(self):
+        async with self.client() as c:
+            started = await self.call(c, "job_start", command="echo one; sleep 0.3; echo two")
+            self.assertIn(started["status"], ("queued", "running"))
+            job_id = started["job_id"]
+
+            done = await self.call(c, "job_wait", job_id=job_id, timeout_seconds=10)
+            self.assertEqual((done["status"], done["return_code"], done["stdout"]), ("exited", 0, "one\ntwo\n"))
+
+            status = await self.call(c, "job_status", job_id=job_id, stdout_offset=4)
+            self.assertEqual((status["stdout"], status["stdout_offset"]), ("two\n", 8))
+
+            self.assertIn("error", await self.call(c, "job_status", job_id="nope"))
+
+    async def test_cancel_kills_the_job(self):
+        async with self.client() as c:
+            job_id = (await self.call(c, "job_start", command="echo $$; sleep 30"))["job_id"]
+            for _ in range(100):
+                status = await self.call(c, "job_status", job_id=job_id)
+                if status["stdout"]:
+                    break
+                await asyncio.sleep(0.02)
+            cancelled = await self.call(c, "job_cancel", job_id=job_id)
+            self.assertEqual(cancelled["status"], "cancelled")
+            await self.wait_dead(int(status["stdout"]))
+
+            waited = await self.call(c, "job_wait", job_id=job_id, timeout_seconds=1)
+            self.assertEqual(waited["status"], "cancelled")
+
+
+class TestFiles(ToolTestCase):
+    def path(self, *parts: str) -> str:
+        return os.path.join(self.tmp, *parts)
+
+    async def test_read_file_pages_never_split_or_stall_on_a_character(self):
+        text = "aé€😀b" * 3
+        with open(self.path("text"), "w", encoding="utf-8") as f:
+            f.write(text)
+        async with self.client() as c:
+            for limit in (1, 2, 3, 5):
+                pages, offset, eof = [], 0, False
+                while not eof:
+                    page = await self.call(c, "read_file", path=self.path("text"), offset=offset, limit=limit)
+                    self.assertTrue(page["content"])
+                    self.assertNotIn("\ufffd", page["content"])
+                    pages.append(page["content"])
+                    offset, eof = page["next_offset"], page["eof"]
+                self.assertEqual("".join(pages), text)
+            # A page shorter than its first character is extended to the whole character.
+            page = await self.call(c, "read_file", path=self.path("text"), offset=6, limit=1)
+            self.assertEqual((page["content"], page["next_offset"]), ("😀", 10))
+
+    async def test_grep_reports_line_numbers_and_skips_binary_files(self):
+        os.makedirs(self.path("sub"))
+        with open(self.path("a.txt"), "w") as f:
+            f.write("alpha\nbeta\nALPHA beta\n")
+        with open(self.path("sub", "b.txt"), "w") as f:
+            f.write("\n\nalphabet\n")
+        with open(self.path("blob"), "wb") as f:
+            f.write(b"alpha\0\n")
+        async with self.client() as c:
+            found = await self.call(c, "grep", pattern="^alpha", path=self.tmp, ignore_case=True)
+            self.assertEqual(
+                [(os.path.relpath(m["path"], self.tmp), m["line"], m["text"]) for m in found["matches"]],
+                [("a.txt", 1, "alpha"), ("a.txt", 3, "ALPHA beta"), ("sub/b.txt", 3, "alphabet")],
+            )
+            self.assertEqual((found["files_searched"], found["truncated"]), (2, False))
+            capped = await self.call(c, "grep", pattern="beta", path=self.path("a.txt"), max_matches=1)
+            self.assertEqual((len(capped["matches"]), capped["truncated"]), (1, True))
+            self.assertIn("Invalid 'pattern'", (await self.call(c, "grep", pattern="(", path=self.tmp))["error"])
+
+    async def test_list_dir_and_stat(self):
+        os.makedirs(self.path("dir"))
+        with open(self.path("file"), "w") as f:
+            f.write("12345")
+        os.symlink("file", self.path("link"))
+        async with self.client() as c:
+            listing = await self.call(c, "list_dir", path=self.tmp)
+            self.assertEqual(
+                [(e["name"], e["type"]) for e in listing["entries"]],
+                [("dir", "directory"), ("file", "file"), ("link", "symlink")],
+            )
+            self.assertEqual((listing["total"], listing["truncated"]), (3, False))
+            limited = await self.call(c, "list_dir", path=self.tmp, limit=2)
+            self.assertEqual((len(limited["entries"]), limited["total"], limited["truncated"]), (2, 3, True))
+
+            info = await self.call(c, "stat", path=self.path("file"))
+            self.assertEqual((info["type"], info["size"]), ("file", 5))
+            link = await self.call(c, "stat", path=self.path("link"))
+            self.assertEqual((link["type"], link["target"]), ("symlink", "file"))
+            missing = await self.call(c, "stat", path=self.path("nope"))
+            self.assertEqual(missing["errno"], 2)
+
+    async def test_write_file_replaces_atomically_and_keeps_the_mode(self):
+        target = self.path("out.txt")
+        with open(target, "w") as f:
+            f.write("old contents\n")
+        os.chmod(target, 0o640)
+        async with self.client() as c:
+            written = await self.call(c, "write_file", path=target, content="new ✓\n")
+            self.assertEqual((written["bytes_written"], written["size"]), (8, 8))
+            appended = await self.call(c, "write_file", path=target, content="more\n", append=True)
+            self.assertEqual(appended["size"], 13)
+            with open(target, encoding="utf-8") as f:
+                self.assertEqual(f.read(), "new ✓\nmore\n")
+            self.assertEqual(os.stat(target).st_mode & 0o777, 0o640)
+            self.assertEqual(os.listdir(self.tmp), ["out.txt"])
+
+            nested = self.path("a", "b", "c.txt")
+            missing_parent = await self.call(c, "write_file", path=nested, content="x")
+            self.assertEqual(missing_parent["errno"], 2)
+            self.assertIn(nested, missing_parent["error"])
+            self.assertEqual(os.listdir(self.tmp), ["out.txt"])
+            created = await self.call(c, "write_file", path=nested, content="x", create_dirs=True)
+            self.assertEqual(created["size"], 1)
+
+
+class TestLimits(ToolTestCase):
+    async def test_exceeded_limits_are_reported(self):
+        async with self.client() as c:
+            cpu = await self.call(c, "terminal", command="while :; do :; done", limits={"cpu_seconds": 1})
+            self.assertEqual((cpu["limit_exceeded"], cpu["limits"]), (["cpu_seconds"], {"cpu_seconds": 1}))
+            self.assertNotIn("timed_out", cpu)
+
+            files = await self.call(
+                c,
+                "terminal",
+                command=f"{sys.executable} -c \"fs = [open('/dev/null') for _ in range(64)]\"",
+                limits={"open_files": 32},
+            )
+            self.assertEqual(files["limit_exceeded"], ["open_files"])
+            self.assertIn("Too many open files", files["stderr"])
+
+            output = await self.call(c, "terminal", command="yes", limits={"output_bytes": 1000})
+            self.assertEqual(output["limit_exceeded"], ["output_bytes"])
+            self.assertEqual(output["return_code"], -9)
+
+            within = await self.call(c, "terminal", command="echo ok", limits={"open_files": 32})
+            self.assertEqual(within["stdout"], "ok\n")
+            self.assertNotIn("limit_exceeded", within)
+
+    async def test_calls_can_only_lower_the_server_defaults(self):
+        with mock.patch.object(shell_server, "DEFAULT_LIMITS", {"open_files": 64}):
+            self.assertEqual(shell_server._limits_argument({"limits": {"open_files": 1024}}), {"open_files": 64})
+            self.assertEqual(
+                shell_server._limits_argument({"limits": {"open_files": 16, "cpu_seconds": 5}}),
+                {"open_files": 16, "cpu_seconds": 5},
+            )
+        with self.assertRaisesRegex(shell_server.ToolArgumentError, "Unknown limit 'disk'"):
+            shell_server._limits_argument({"limits": {"disk": 1}})
+        async with self.client() as c:
+            session = await self.call(c, "terminal", command="true", limits={"open_files": 32}, session="s")
+            self.assertIn("cannot be combined with 'session'", session["error"])
+
+
+class TestBatch(ToolTestCase):
+    async def test_dependencies_run_in_order_and_failures_skip_dependents(self):
+        marker = os.path.join(self.tmp, "marker")
+        async with self.client() as c:
+            batch = await self.call(
+                c,
+                "terminal_batch",
+                commands=[
+                    {"id": "read", "command": f"cat {marker}", "depends_on": ["write"]},
+                    {"id": "write", "command": f"sleep 0.3; echo written > {marker}"},
+                    {"id": "fail", "command": "exit 2"},
+                    {"id": "after_fail", "command": "echo never", "depends_on": ["fail"]},
+                ],
+                stop_on_failure=False,
+            )
+        results = {r["id"]: r for r in batch["results"]}
+        self.assertFalse(batch["ok"])
+        self.assertEqual([r["id"] for r in batch["results"]], ["read", "write", "fail", "after_fail"])
+        self.assertEqual((results["read"]["status"], results["read"]["stdout"]), ("ok", "written\n"))
+        self.assertEqual(results["fail"]["status"], "failed")
+        self.assertEqual(results["after_fail"]["status"], "skipped")
+        self.assertNotIn("stdout", results["after_fail"])
+
+    async def test_invalid_graphs_are_rejected(self):
+        async with self.client() as c:
+            cycle = await self.call(
+                c,
+                "terminal_batch",
+                commands=[
+                    {"id": "a", "command": "true", "depends_on": ["b"]},
+                    {"id": "b", "command": "true", "depends_on": ["a"]},
+                ],
+            )
+            self.assertIn("Dependency cycle", cycle["error"])
+            unknown = await self.call(c, "terminal_batch", commands=[{"command": "true", "depends_on": ["x"]}])
+            self.assertIn("unknown ids", unknown["error"])
+
+
+class TestEncodings(ToolTestCase):
+    async def run_encoded(self, command: str, encoding: str, **arguments) -> dict:
+        async with self.client() as c:
+            return await self.call(c, "terminal", command=command, output_encoding=encoding, **arguments)
+
+    def assertRawFields(self, result: dict, stream: str, raw: bytes) -> None:
+        self.assertEqual(result[f"{stream}_bytes"], len(raw))
+        self.assertEqual(result[f"{stream}_sha256"], hashlib.sha256(raw).hexdigest())
+
+    async def test_text_replaces_invalid_bytes(self):
+        result = await self.run_encoded("printf 'ok\\377'", "text")
+        self.assertEqual(result["stdout"], "ok\ufffd")
+        self.assertNotIn("stdout_encoding", result)
+
+    async def test_base64_and_gzip_round_trip_the_raw_bytes(self):
+        raw = bytes(range(256))
+        command = "printf '" + "".join(f"\\{b:03o}" for b in raw) + "'"
+        encoded = await self.run_encoded(command, "base64")
+        self.assertEqual(encoded["stdout_encoding"], "base64")
+        self.assertEqual(base64.b64decode(encoded["stdout"]), raw)
+        self.assertRawFields(encoded, "stdout", raw)
+        self.assertRawFields(encoded, "stderr", b"")
+
+        packed = await self.run_encoded(command, "gzip+base64")
+        self.assertEqual(packed["stdout_encoding"], "gzip+base64")
+        self.assertEqual(gzip.decompress(base64.b64decode(packed["stdout"])), raw)
+        self.assertRawFields(packed, "stdout", raw)
+
+    async def test_auto_picks_per_stream(self):
+        with mock.patch.object(shell_server, "AUTO_COMPRESS_BYTES", 1000):
+            result = await self.run_encoded("printf 'a\\000\\377b'; echo fine >&2", "auto")
+            self.assertEqual((result["stdout_encoding"], base64.b64decode(result["stdout"])), ("base64", b"a\0\377b"))
+            self.assertRawFields(result, "stdout", b"a\0\377b")
+            self.assertEqual(result["stderr"], "fine\n")
+            self.assertNotIn("stderr_encoding", result)
+
+            large = await self.run_encoded("yes line | head -c 5000", "auto")
+            self.assertEqual(large["stdout_encoding"], "gzip+base64")
+            self.assertEqual(gzip.decompress(base64.b64decode(large["stdout"])), b"line\n" * 1000)
+            self.assertRawFields(large, "stdout", b"line\n" * 1000)
+
+    async def test_timeout_notice_is_not_part_of_the_encoded_output(self):
+        result = await self.run_encoded("echo err >&2; sleep 5", "base64", timeout_seconds=0.5)
+        self.assertTrue(result["timed_out"])
+        self.assertEqual(result["notice"], "Process timed out after 0.5 seconds")
+        self.assertEqual(base64.b64decode(result["stderr"]), b"err\n")
+        self.assertRawFields(result, "stderr", b"err\n")
+
+
+class TestStats(ToolTestCase):
+    def test_histogram_quantiles_are_bucket_bounds(self):
+        hist = shell_server._LatencyHistogram()
+        for ms in (0.5, 3, 3, 40, 120000):
+            hist.observe(ms)
+        snapshot = hist.snapshot()
+        self.assertEqual((snapshot["count"], snapshot["p50_ms"], snapshot["p99_ms"]), (5, 5.0, None))
+        self.assertEqual((snapshot["buckets"]["le_1"], snapshot["buckets"]["le_5"], snapshot["buckets"]["le_inf"]), (1, 2, 1))
+        self.assertEqual(sum(snapshot["buckets"].values()), 5)
+
+    async def test_server_stats_in_json_and_prometheus(self):
+        with mock.patch.object(shell_server, "metrics", shell_server._Metrics()):
+            async with self.client() as c:
+                await self.call(c, "terminal", command="echo hi")
+                await self.call(c, "terminal", command="sleep 5", timeout_seconds=0.2)
+                await self.call(c, "read_file", path=os.path.join(self.tmp, "missing"))
+                stats = await self.call(c, "server_stats")
+                result = await c.call_tool("server_stats", {"format": "prometheus"})
+        text = json.loads(result.content[0].text)["text"]
+
+        self.assertEqual((stats["spawns"], stats["timeouts"]), (2, 1))
+        self.assertEqual(stats["output_bytes_captured"], 3)
+        terminal = stats["tools"]["terminal"]
+        self.assertEqual((terminal["calls"], terminal["errors"], terminal["count"]), (2, 0, 2))
+        self.assertEqual((stats["tools"]["read_file"]["calls"], stats["tools"]["read_file"]["errors"]), (1, 1))
+        self.assertIn("running", stats["scheduler"])
+        self.assertGreater(stats["rss_bytes"], 0)
+
+        samples = dict(line.rsplit(" ", 1) for line in text.splitlines())
+        self.assertEqual(samples["shell_server_spawns"], "2")
+        self.assertEqual(samples["shell_server_timeouts"], "1")
+        self.assertEqual(samples['shell_server_tool_calls_total{tool="terminal"}'], "2")
+        self.assertEqual(samples['shell_server_tool_errors_total{tool="read_file"}'], "1")
+        # Buckets are cumulative and end at the call count.
+        buckets = [int(v) for k, v in samples.items() if k.startswith('shell_server_tool_latency_ms_bucket{tool="terminal"')]
+        self.assertEqual(buckets, sorted(buckets))
+        self.assertEqual(buckets[-1], 2)
+        self.assertEqual(samples['shell_server_tool_latency_ms_count{tool="terminal"}'], "2")
+
+
+_INITIALIZE = {
+    "jsonrpc": "2.0",
+    "id": 1,
+    "method": "initialize",
+    "params": {
+        "protocolVersion": "2025-06-18",
+        "capabilities": {},
+        "clientInfo": {"name": "test", "version": "0"},
+    },
+}
+_HEADERS = {"Accept": "application/json, text/event-stream"}
+
+
+async def _call(session: ClientSession, tool: str, /, **arguments) -> dict:
+    result = await session.call_tool(tool, arguments)
+    return json.loads(json.loads(result.content[0].text)["text"])
+
+
+class TestHttpTransport(unittest.IsolatedAsyncioTestCase):
+    MAX_SESSIONS = 2
+
+    async def asyncSetUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = tmp.name
+        port = _free_port()
+        self.url = f"http://127.0.0.1:{port}/mcp/"
+        config = uvicorn.Config(
+            shell_server._http_app(self.MAX_SESSIONS), host="127.0.0.1", port=port, log_level="warning"
+        )
+        self.server = uvicorn.Server(config)
+        self.serving = asyncio.create_task(self.server.serve())
+        while not self.server.started:
+            await asyncio.sleep(0.01)
+
+    async def asyncTearDown(self):
+        self.server.should_exit = True
+        await self.serving
+
+    async def _health(self) -> dict:
+        async with httpx.AsyncClient() as client:
+            return (await client.get(self.url.replace("/mcp/", "/health"))).json()
+
+    async def _wait_for_sessions(self, count: int) -> None:
+        for _ in range(200):
+            if (await self._health())["mcp_sessions"] == count:
+                return
+            await asyncio.sleep(0.01)
+        self.fail(f"expected {count} live MCP sessions")
+
+    async def test_closed_sessions_free_their_place(self):
+        for n in range(self.MAX_SESSIONS * 3):
+            async with streamablehttp_client(self.url) as (read, write, _):
+                async with ClientSession(read, write) as session:
+                    await session.initialize()
+                    result = await session.call_tool("terminal", {"command": f"echo {n}"})
+                    self.assertFalse(result.isError)
+            await self._wait_for_sessions(0)
+
+    async def test_sessions_past_the_cap_are_refused(self):
+        async with httpx.AsyncClient(timeout=10) as client:
+            session_ids = []
+            for _ in range(self.MAX_SESSIONS):
+                response = await client.post(self.url, json=_INITIALIZE, headers=_HEADERS)
+                self.assertEqual(response.status_code, 200)
+                session_ids.append(response.headers["mcp-session-id"])
+            refused = await client.post(self.url, json=_INITIALIZE, headers=_HEADERS)
+            self.assertEqual(refused.status_code, 503)
+            self.assertEqual(refused.headers["retry-after"], "1")
+
+            await client.delete(self.url, headers={**_HEADERS, "mcp-session-id": session_ids[0]})
+            await self._wait_for_sessions(self.MAX_SESSIONS - 1)
+            response = await client.post(self.url, json=_INITIALIZE, headers=_HEADERS)
+            self.assertEqual(response.status_code, 200)
+
+    async def test_concurrent_initializes_respect_the_cap(self):
+        async with httpx.AsyncClient(timeout=10) as client:
+            responses = await asyncio.gather(
+                *(client.post(self.url, json=_INITIALIZE, headers=_HEADERS) for _ in range(self.MAX_SESSIONS * 4))
+            )
+        codes = sorted(r.status_code for r in responses)
+        self.assertEqual(codes, [200] * self.MAX_SESSIONS + [503] * (self.MAX_SESSIONS * 3))
+        self.assertEqual((await self._health())["mcp_sessions"], self.MAX_SESSIONS)
+
+    async def test_shell_sessions_are_private_and_end_with_the_client(self):
+        pid_file = os.path.join(self.tmp, "pid")
+        async with streamablehttp_client(self.url) as (read_a, write_a, _):
+            async with ClientSession(read_a, write_a) as a:
+                await a.initialize()
+                await _call(a, "terminal", command=f"X=SECRET; echo $$ > {pid_file}", session="s")
+                async with streamablehttp_client(self.url) as (read_b, write_b, _):
+                    async with ClientSession(read_b, write_b) as b:
+                        await b.initialize()
+                        for client_id in (None, "local"):
+                            extra = {"client_id": client_id} if client_id else {}
+                            probe = await _call(b, "terminal", command="echo ${X:-unset}", session="s", **extra)
+                            self.assertEqual(probe["stdout"], "unset\n")
+                        closed = await _call(b, "session_close", session="s")
+                        self.assertTrue(closed["closed"])
+                own = await _call(a, "terminal", command="echo $X", session="s")
+                self.assertEqual(own["stdout"], "SECRET\n")
+                with open(pid_file) as f:
+                    pid = int(f.read())
+        await self._wait_for_sessions(0)
+        self.assertFalse(_alive(pid))
+        self.assertEqual(len(shell_server.sessions), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()